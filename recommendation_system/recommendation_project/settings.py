@@ -25,6 +25,7 @@ INSTALLED_APPS = [
     'allauth.account',
     'allauth.socialaccount',
     'allauth.socialaccount.providers.google',
+    'rest_framework',
 ]
 
 MIDDLEWARE = [
@@ -34,6 +35,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'recommendox.roles.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
@@ -101,6 +103,41 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Trained recommender artifacts (matrix factorization factors etc.)
+RECOMMENDER_MODEL_DIR = os.environ.get('RECOMMENDER_MODEL_DIR', os.path.join(BASE_DIR, 'recommender_models'))
+EMBEDDING_MODEL_NAME = os.environ.get('EMBEDDING_MODEL_NAME', 'sentence-transformers/all-MiniLM-L6-v2')
+
+# Two-tier cache: a per-process LRU in front of a cache every worker shares.
+# The default shared tier is one SQLite file with atomic add()/incr(), for all
+# the workers of a host. Point SHARED_CACHE_BACKEND/SHARED_CACHE_LOCATION at
+# Redis or Memcached when running on more than one host.
+CACHES = {
+    'default': {
+        'BACKEND': 'recommendox.tiered_cache.TieredCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': int(os.environ.get('LOCAL_CACHE_MAX_ENTRIES', 2000)),
+            'LOCAL_TIMEOUT': int(os.environ.get('LOCAL_CACHE_TIMEOUT', 5)),
+        },
+    },
+    'shared': {
+        'BACKEND': os.environ.get('SHARED_CACHE_BACKEND', 'recommendox.sqlite_cache.SQLiteCache'),
+        'LOCATION': os.environ.get('SHARED_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache', 'shared.sqlite3')),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+# Seconds between batched writes of buffered content views (0 = write every view immediately)
+VIEW_COUNTER_FLUSH_INTERVAL = int(os.environ.get('VIEW_COUNTER_FLUSH_INTERVAL', 10))
+
+# ===== API =====
+# The catalog API is public and read-only: no sessions, no CSRF, JSON only
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.AllowAny'],
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+}
+
 # ===== ALLAUTH SETTINGS =====
 SITE_ID = 1
 
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recommendation_project.settings')
 
 application = get_wsgi_application()
+
+# Start loading the semantic search encoder now, so no request waits for it
+from recommendox.embeddings import preload_encoder  # noqa: E402
+
+preload_encoder()
@@ -1,8 +1,11 @@
 # recommendox/admin.py
 from django.contrib import admin
+from .aggregates import RATING_FIELDS
+from .caching import bump_review_version, bump_role_version
 from .models import (
     Content, Season, Episode, UserProfile, GoldenUser, 
-    Watchlist, Rating, Review, Analytics, Message, Reviewer, ContentOTT, ContentCreator
+    Watchlist, Rating, Review, Analytics, Message, Reviewer, ContentOTT, ContentCreator,
+    Person, Credit
 )
 
 @admin.register(Content)
@@ -11,6 +14,14 @@ class ContentAdmin(admin.ModelAdmin):
     list_filter = ('content_type', 'genre', 'language')
     search_fields = ('title', 'description', 'director', 'cast')
     ordering = ('-created_at',)
+    # Maintained with F() updates by rating signals, the view counter and compute_popularity
+    readonly_fields = (*RATING_FIELDS, 'popularity', 'views_count')
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        # A full save() would write back the counters as they were when the form loaded
+        obj.save(update_fields=[*form.fields, 'updated_at'])
 
 @admin.register(Season)
 class SeasonAdmin(admin.ModelAdmin):
@@ -72,14 +83,21 @@ class GoldenUserAdmin(admin.ModelAdmin):
             verified_at=timezone.now(),
             verified_by=request.user
         )
+        self._roles_changed(queryset)
         self.message_user(request, f"{queryset.count()} Golden Users verified.")
     verify_selected.short_description = "Verify selected Golden Users"
     
     def reject_selected(self, request, queryset):
         queryset.update(verification_status='Rejected')
+        self._roles_changed(queryset)
         self.message_user(request, f"{queryset.count()} Golden Users rejected.")
     reject_selected.short_description = "Reject selected Golden Users"
 
+    def _roles_changed(self, queryset):
+        # update() sends no post_save, so invalidate the roles cached in sessions here
+        for user_id in queryset.values_list('user_profile__user_id', flat=True):
+            bump_role_version(user_id)
+
 @admin.register(Watchlist)
 class WatchlistAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'content', 'added_at')
@@ -99,6 +117,8 @@ class ReviewAdmin(admin.ModelAdmin):
     
     def approve_reviews(self, request, queryset):
         queryset.update(is_approved=True)
+        for content_id in set(queryset.values_list('content_id', flat=True)):
+            bump_review_version(content_id)
         self.message_user(request, f"{queryset.count()} reviews approved.")
     approve_reviews.short_description = "Approve selected reviews"
     
@@ -131,4 +151,16 @@ class ContentOTTAdmin(admin.ModelAdmin):
 class ContentCreatorAdmin(admin.ModelAdmin):
     list_display = ('id', 'user_profile', 'is_active', 'verified_at', 'total_contents_added')
     list_filter = ('is_active',)
-    search_fields = ('user_profile__user__username',)
\ No newline at end of file
+    search_fields = ('user_profile__user__username',)
+
+class CreditInline(admin.TabularInline):
+    model = Credit
+    raw_id_fields = ('content',)
+    extra = 0
+
+@admin.register(Person)
+class PersonAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'golden_user')
+    search_fields = ('name', 'normalized_name')
+    raw_id_fields = ('golden_user',)
+    inlines = [CreditInline]
@@ -0,0 +1,61 @@
+# recommendox/aggregates.py
+"""
+Rating aggregates denormalized onto Content.
+
+rating_count, rating_sum and the rating_1..rating_5 histogram are changed
+with F() expressions in a single UPDATE, so concurrent ratings never lose an
+increment and listing pages read averages from the row they already fetched.
+"""
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Q
+from django.db.models.functions import NullIf
+
+from .models import Content
+
+RATING_FIELDS = ['rating_count', 'rating_sum', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5']
+
+
+def average_rating_expression():
+    """Row-level average (NULL when unrated), usable in annotate() and order_by()"""
+    return ExpressionWrapper(
+        F('rating_sum') * 1.0 / NullIf(F('rating_count'), 0),
+        output_field=FloatField(),
+    )
+
+
+def apply_rating_change(content_id, old_value, new_value):
+    """Adjust a content's aggregates for a rating created, changed or deleted"""
+    old_value = int(old_value) if old_value is not None else None
+    new_value = int(new_value) if new_value is not None else None
+    if old_value == new_value:
+        return
+
+    updates = {}
+    if old_value is None:
+        updates['rating_count'] = F('rating_count') + 1
+    elif new_value is None:
+        updates['rating_count'] = F('rating_count') - 1
+    updates['rating_sum'] = F('rating_sum') + (new_value or 0) - (old_value or 0)
+    if old_value is not None:
+        updates[f'rating_{old_value}'] = F(f'rating_{old_value}') - 1
+    if new_value is not None:
+        updates[f'rating_{new_value}'] = F(f'rating_{new_value}') + 1
+    Content.objects.filter(id=content_id).update(**updates)
+
+
+def repair_rating_aggregates(batch_size=1000):
+    """Recompute every content's aggregates from Rating. Returns the number of rows fixed"""
+    annotations = {'actual_count': Count('ratings')}
+    for stars in range(1, 6):
+        annotations[f'actual_{stars}'] = Count('ratings', filter=Q(ratings__rating_value=stars))
+
+    fixed = []
+    for content in Content.objects.annotate(**annotations).only('id', *RATING_FIELDS).iterator(chunk_size=batch_size):
+        actual = {f'rating_{stars}': getattr(content, f'actual_{stars}') for stars in range(1, 6)}
+        actual['rating_count'] = content.actual_count
+        actual['rating_sum'] = sum(stars * actual[f'rating_{stars}'] for stars in range(1, 6))
+        if any(getattr(content, field) != value for field, value in actual.items()):
+            for field, value in actual.items():
+                setattr(content, field, value)
+            fixed.append(content)
+    Content.objects.bulk_update(fixed, RATING_FIELDS, batch_size=batch_size)
+    return len(fixed)
@@ -0,0 +1,176 @@
+# recommendox/api.py
+"""
+Read-only JSON API over the catalog: contents with their OTT availability,
+seasons and episodes.
+
+    GET api/content/?genre=&language=&content_type=&cursor=&limit=
+    GET api/content/<id>/
+    GET api/content/bulk/?ids=3,1,2
+
+Every endpoint takes ?fields=title,genre to return only those fields (id is
+always kept) and ?include=ott_platforms,seasons,seasons.episodes to nest
+related rows, loaded with one prefetch per relation. The list is keyset
+paginated with the signed cursors of pagination.py.
+
+Serialized contents are cached per include set under each content's own
+version, like the HTML cards in fragments.py, so a request only loads and serializes
+the rows that missed: the queries per page do not depend on its size.
+"""
+from django.core.cache import cache
+from django.db.models import Prefetch
+from rest_framework.decorators import api_view
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .caching import get_content_versions
+from .facets import facet_counts, matching_total
+from .models import Content, ContentOTT, Season
+from .pagination import keyset_paginate
+from .serializers import ContentOTTSerializer, ContentSerializer, EpisodeSerializer, SeasonSerializer
+
+API_TTL = 60 * 60
+PER_PAGE = 20
+MAX_PER_PAGE = 100
+ORDER_KEYS = [('release_date', True), ('id', True)]
+FILTERS = ['genre', 'language', 'content_type']
+INCLUDES = ['ott_platforms', 'seasons', 'seasons.episodes']
+PREFETCHES = {
+    'ott_platforms': [Prefetch('ott_platforms', queryset=ContentOTT.objects.order_by('platform_name'))],
+    'seasons': [Prefetch('seasons', queryset=Season.objects.order_by('season_number'))],
+    'seasons.episodes': [Prefetch('seasons', queryset=Season.objects.order_by('season_number')), 'seasons__episodes'],
+}
+
+
+def _split(value):
+    return [part.strip() for part in value.split(',') if part.strip()] if value else []
+
+
+def _parse_include(request):
+    include = set(_split(request.query_params.get('include')))
+    unknown = include - set(INCLUDES)
+    if unknown:
+        raise ValidationError({'include': f'Unknown relations: {", ".join(sorted(unknown))}. Choose from {", ".join(INCLUDES)}.'})
+    if 'seasons.episodes' in include:
+        include.discard('seasons')
+    return include
+
+
+def _parse_fields(request, include):
+    fields = _split(request.query_params.get('fields'))
+    if not fields:
+        return None
+    unknown = set(fields) - set(ContentSerializer.Meta.fields)
+    if unknown:
+        raise ValidationError({'fields': f'Unknown fields: {", ".join(sorted(unknown))}.'})
+    # Nested relations the client asked for are kept whatever the field list says
+    return {'id', *fields, *(relation.split('.')[0] for relation in include)}
+
+
+def _parse_ids(value, limit):
+    try:
+        ids = [int(part) for part in _split(value)]
+    except ValueError:
+        raise ValidationError({'ids': 'A comma separated list of content ids is required.'})
+    if not ids:
+        raise ValidationError({'ids': 'A comma separated list of content ids is required.'})
+    if len(ids) > limit:
+        raise ValidationError({'ids': f'At most {limit} ids per request.'})
+    return list(dict.fromkeys(ids))
+
+
+def _represent(content, include):
+    data = dict(ContentSerializer(content).data)
+    if 'ott_platforms' in include:
+        data['ott_platforms'] = ContentOTTSerializer(content.ott_platforms.all(), many=True).data
+    if 'seasons' in include or 'seasons.episodes' in include:
+        seasons = []
+        for season in content.seasons.all():
+            item = dict(SeasonSerializer(season).data)
+            if 'seasons.episodes' in include:
+                item['episodes'] = EpisodeSerializer(season.episodes.all(), many=True).data
+            seasons.append(item)
+        data['seasons'] = seasons
+    return data
+
+
+def serialized_contents(ids, include):
+    """{id: representation} of the contents that exist among ids, from the cache where possible"""
+    # ids come from the request: only rows that exist get a version key
+    versions = get_content_versions(ids, create=False)
+    tag = '+'.join(sorted(include)) or '-'
+
+    def key(content_id):
+        return f'api:content:{content_id}:{tag}:{versions[content_id]}'
+
+    cached = cache.get_many(key(content_id) for content_id in ids if versions[content_id] is not None)
+    missing = [content_id for content_id in ids if versions[content_id] is None or key(content_id) not in cached]
+    if missing:
+        contents = list(Content.objects.filter(id__in=missing).prefetch_related(
+            *(lookup for relation in sorted(include) for lookup in PREFETCHES[relation])
+        ))
+        versions.update(get_content_versions([content.id for content in contents if versions[content.id] is None]))
+        fresh = {key(content.id): _represent(content, include) for content in contents}
+        cache.set_many(fresh, API_TTL)
+        cached.update(fresh)
+    return {content_id: cached[key(content_id)] for content_id in ids
+            if versions[content_id] is not None and key(content_id) in cached}
+
+
+def _sparse(data, fields):
+    return data if fields is None else {name: value for name, value in data.items() if name in fields}
+
+
+@api_view(['GET'])
+def content_list(request):
+    """Contents, newest first"""
+    include = _parse_include(request)
+    fields = _parse_fields(request, include)
+    try:
+        per_page = min(max(int(request.query_params.get('limit', PER_PAGE)), 1), MAX_PER_PAGE)
+    except ValueError:
+        raise ValidationError({'limit': 'Must be a number.'})
+
+    contents = Content.objects.only('id', 'release_date')
+    filters = {name: request.query_params.get(name) for name in FILTERS}
+    for name, value in filters.items():
+        if value:
+            contents = contents.filter(**{name: value})
+    # The count comes from the cached facet rows instead of a COUNT per filter set
+    total = matching_total(facet_counts(filters), filters)
+    page = keyset_paginate(contents, ORDER_KEYS, 'newest', request.query_params.get('cursor'),
+                           per_page=per_page, total=total)
+    ids = [content.id for content in page]
+    found = serialized_contents(ids, include)
+
+    url = request.build_absolute_uri()
+    return Response({
+        'count': page.total,
+        'next': replace_query_param(url, 'cursor', page.next_cursor) if page.has_next() else None,
+        'previous': replace_query_param(url, 'cursor', page.previous_cursor) if page.has_previous() else None,
+        'first': remove_query_param(url, 'cursor') if page.has_previous() else None,
+        'results': [_sparse(found[content_id], fields) for content_id in ids if content_id in found],
+    })
+
+
+@api_view(['GET'])
+def content_detail(request, content_id):
+    include = _parse_include(request)
+    fields = _parse_fields(request, include)
+    found = serialized_contents([content_id], include)
+    if content_id not in found:
+        raise NotFound('No Content matches the given query.')
+    return Response(_sparse(found[content_id], fields))
+
+
+@api_view(['GET'])
+def content_bulk(request):
+    """Many contents by id, in the order asked for; unknown ids are listed under `missing`"""
+    include = _parse_include(request)
+    fields = _parse_fields(request, include)
+    ids = _parse_ids(request.query_params.get('ids'), MAX_PER_PAGE)
+    found = serialized_contents(ids, include)
+    return Response({
+        'results': [_sparse(found[content_id], fields) for content_id in ids if content_id in found],
+        'missing': [content_id for content_id in ids if content_id not in found],
+    })
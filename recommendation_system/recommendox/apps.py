@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class RecommendoxConfig(AppConfig):
     name = 'recommendox'
+
+    def ready(self):
+        from django.core import checks
+
+        from . import signals  # noqa: F401
+        from .tiered_cache import check_shared_backend
+
+        checks.register(check_shared_backend, checks.Tags.caches, deploy=True)
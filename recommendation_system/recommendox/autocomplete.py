@@ -0,0 +1,288 @@
+# recommendox/autocomplete.py
+"""
+In-memory autocomplete over titles, directors and cast members.
+
+Each worker keeps one AutocompleteIndex: a sorted token list for prefix
+lookups (bisect) plus a trigram -> token map for typo tolerance, where
+candidate tokens sharing trigrams with the typed word are checked with a
+bounded edit distance. Queries never touch the database.
+
+Requests never build the index. The first lookup starts one background
+thread per process, which builds it and rebuilds it every MAX_AGE_SECONDS to
+pick up changes made by other workers; until the first build finishes,
+suggestions are empty. Saves made by this worker are applied right away
+through signals (update_content / remove_content).
+"""
+import logging
+import math
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+
+from django.db import close_old_connections
+
+from .models import Content
+from .text import normalize
+
+logger = logging.getLogger(__name__)
+
+MAX_AGE_SECONDS = 60 * 10
+RETRY_SECONDS = 30          # wait after a failed build
+MAX_PREFIX_TOKENS = 500     # tokens scanned for one prefix
+MAX_FUZZY_TOKENS = 200      # trigram candidates checked with edit distance
+KIND_BONUS = {'title': 1.0, 'director': 0.5, 'cast': 0.3}
+
+
+def tokenize(text):
+    return re.findall(r'\w+', normalize(text))
+
+
+def trigrams(token):
+    padded = f'${token}'
+    return {padded[i:i + 3] for i in range(max(len(padded) - 2, 1))}
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance, or limit + 1 once it is known to exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _max_typos(word):
+    return 1 if len(word) <= 5 else 2
+
+
+class Entry:
+    __slots__ = ('label', 'kind', 'tokens', 'content_ids', 'weight')
+
+    def __init__(self, label, kind):
+        self.label = label
+        self.kind = kind
+        self.tokens = tuple(tokenize(label))
+        self.content_ids = set()
+        self.weight = 0.0
+
+
+class AutocompleteIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}                       # (kind, normalized label) -> Entry
+        self._by_content = defaultdict(set)      # content id -> entry keys
+        self._popularity = {}                    # content id -> weight
+        self._token_keys = defaultdict(set)      # token -> entry keys
+        self._tokens = []                        # sorted distinct tokens
+        self._trigrams = defaultdict(set)        # trigram -> tokens
+        self.built_at = None
+        self._thread = None
+
+    # Maintenance
+
+    def build(self):
+        """Rebuild from the database, then swap the new structures in"""
+        fresh = AutocompleteIndex()
+        for row in Content.objects.values_list(
+            'id', 'title', 'director', 'cast', 'rating_count', 'views_count'
+        ).iterator():
+            fresh._add_content(*row)
+        fresh.built_at = time.monotonic()
+        with self._lock:
+            state = dict(fresh.__dict__, _lock=self._lock, _thread=self._thread)
+            self.__dict__.update(state)
+        return len(fresh._entries)
+
+    def update_content(self, content):
+        if self.built_at is None:
+            return
+        with self._lock:
+            self._remove_content(content.id)
+            self._add_content(content.id, content.title, content.director, content.cast,
+                              content.rating_count, content.views_count)
+
+    def remove_content(self, content_id):
+        with self._lock:
+            self._remove_content(content_id)
+
+    def _add_content(self, content_id, title, director, cast, rating_count, views_count):
+        self._popularity[content_id] = math.log1p(rating_count + views_count / 10)
+        people = [('director', director)] + [('cast', name) for name in (cast or '').split(',')]
+        for kind, label in [('title', title)] + people:
+            label = (label or '').strip()
+            if not label:
+                continue
+            key = (kind, normalize(label))
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = Entry(label, kind)
+                for token in entry.tokens:
+                    self._add_token(token, key)
+            entry.content_ids.add(content_id)
+            self._reweigh(entry)
+            self._by_content[content_id].add(key)
+
+    def _remove_content(self, content_id):
+        for key in self._by_content.pop(content_id, ()):
+            entry = self._entries[key]
+            entry.content_ids.discard(content_id)
+            if entry.content_ids:
+                self._reweigh(entry)
+                continue
+            del self._entries[key]
+            for token in entry.tokens:
+                self._remove_token(token, key)
+        self._popularity.pop(content_id, None)
+
+    def _reweigh(self, entry):
+        # Titles rank by their own popularity, people by their best-known work
+        entry.weight = max(self._popularity.get(cid, 0.0) for cid in entry.content_ids)
+        if entry.kind != 'title':
+            entry.weight += math.log1p(len(entry.content_ids))
+
+    def _add_token(self, token, key):
+        if not self._token_keys[token]:
+            insort(self._tokens, token)
+            for gram in trigrams(token):
+                self._trigrams[gram].add(token)
+        self._token_keys[token].add(key)
+
+    def _remove_token(self, token, key):
+        keys = self._token_keys.get(token)
+        if keys is None:
+            return
+        keys.discard(key)
+        if keys:
+            return
+        del self._token_keys[token]
+        position = bisect_left(self._tokens, token)
+        if position < len(self._tokens) and self._tokens[position] == token:
+            del self._tokens[position]
+        for gram in trigrams(token):
+            self._trigrams[gram].discard(token)
+
+    # Lookup
+
+    def _prefix_tokens(self, word):
+        start = bisect_left(self._tokens, word)
+        matches = []
+        for token in self._tokens[start:start + MAX_PREFIX_TOKENS]:
+            if not token.startswith(word):
+                break
+            matches.append(token)
+        return matches
+
+    def _fuzzy_tokens(self, word):
+        """{token: typos} for tokens whose beginning is within a small edit distance of word"""
+        limit = _max_typos(word)
+        shared = Counter()
+        for gram in trigrams(word):
+            shared.update(self._trigrams.get(gram, ()))
+        matches = {}
+        for token, _ in shared.most_common(MAX_FUZZY_TOKENS):
+            # Compare against the token's prefix so unfinished words still match
+            typos = min(
+                edit_distance(word, token[:len(word) + delta], limit)
+                for delta in range(-limit, limit + 1) if len(word) + delta > 0
+            )
+            if typos <= limit:
+                matches[token] = typos
+        return matches
+
+    def _matches_word(self, entry, word):
+        if any(token.startswith(word) for token in entry.tokens):
+            return True
+        if len(word) < 3:
+            return False
+        limit = _max_typos(word)
+        return any(edit_distance(word, token[:len(word)], limit) <= limit for token in entry.tokens)
+
+    def suggest(self, query, limit=8):
+        """[{'label', 'kind', 'content_id'}, ...] best first; content_id is set for titles"""
+        words = tokenize(query)
+        if not words:
+            return []
+        *leading, last = words
+        with self._lock:
+            candidates = {}   # key -> typos
+            for token in self._prefix_tokens(last):
+                for key in self._token_keys[token]:
+                    candidates[key] = 0
+            if len(candidates) < limit and len(last) >= 3:
+                for token, typos in self._fuzzy_tokens(last).items():
+                    for key in self._token_keys[token]:
+                        candidates.setdefault(key, typos)
+
+            scored = []
+            for key, typos in candidates.items():
+                entry = self._entries[key]
+                if not all(self._matches_word(entry, word) for word in leading):
+                    continue
+                score = entry.weight + KIND_BONUS[entry.kind] - typos * 2
+                if entry.tokens and entry.tokens[0].startswith(words[0]):
+                    score += 1
+                if last in entry.tokens:
+                    score += 0.5
+                scored.append((score, entry))
+            scored.sort(key=lambda item: (-item[0], item[1].label))
+
+            suggestions = []
+            seen_people = set()
+            for _, entry in scored:
+                if entry.kind != 'title':
+                    # Someone who both directs and acts is suggested once
+                    if normalize(entry.label) in seen_people:
+                        continue
+                    seen_people.add(normalize(entry.label))
+                suggestions.append({
+                    'label': entry.label,
+                    'kind': entry.kind,
+                    'content_id': min(entry.content_ids) if entry.kind == 'title' and len(entry.content_ids) == 1 else None,
+                })
+                if len(suggestions) == limit:
+                    break
+            return suggestions
+
+    def is_stale(self):
+        return self.built_at is None or time.monotonic() - self.built_at > MAX_AGE_SECONDS
+
+    # Background builds
+
+    def ensure_thread(self):
+        """Start the builder thread unless this process already has one"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='autocomplete-build', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            delay = MAX_AGE_SECONDS
+            if self.is_stale():
+                close_old_connections()
+                try:
+                    self.build()
+                except Exception:
+                    logger.exception('Building the autocomplete index failed')
+                    delay = RETRY_SECONDS
+            else:
+                delay = max(MAX_AGE_SECONDS - (time.monotonic() - self.built_at), 1)
+            time.sleep(delay)
+
+
+autocomplete_index = AutocompleteIndex()
+
+
+def suggest(query, limit=8):
+    autocomplete_index.ensure_thread()
+    return autocomplete_index.suggest(query, limit=limit)
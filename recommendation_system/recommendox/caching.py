@@ -0,0 +1,203 @@
+# recommendox/caching.py
+"""
+Cache helpers shared by the views.
+
+Per-user recommendations are cached under a key that contains a per-user
+version number. Signals bump the version whenever the user's ratings,
+watchlist or reviews change, so stale entries are never read again and simply
+expire; nothing has to be deleted explicitly.
+
+The same scheme covers the catalog: a per-content version keys that title's
+card fragment and API representation and moves on any write to the title,
+its OTT rows, ratings, seasons or episodes, while the global catalog version
+keys whole cached pages and only moves when listings change (Content and
+ContentOTT writes). A per-user role version invalidates the roles cached in
+sessions. Catalog and per-content review changes also record when they
+happened, for the Last-Modified headers in conditional.py.
+
+publish() and get_published() swap whole generations of lists built by
+offline jobs, so readers never see half of a build.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+
+RECOMMENDATION_TTL = 60 * 30
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_CHANGED_KEY = 'catalog:changed'
+ACTIVITY_TTL = 60 * 60 * 48     # longer than the interval between precompute runs
+
+
+def _new_version():
+    # Time based, so an evicted counter never reuses an old version number
+    return int(time.time() * 1000)
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), None)
+
+
+def _changed_at(key):
+    # An unknown change time is taken to be now: that can only cost a full response, never a stale one
+    changed = cache.get(key)
+    if changed is None:
+        cache.add(key, time.time(), None)
+        changed = cache.get(key)
+    return changed
+
+
+def get_user_version(user_id):
+    return _get_version(f'recs:version:{user_id}')
+
+
+def bump_user_version(user_id):
+    _bump_version(f'recs:version:{user_id}')
+    cache.set(f'recs:activity:{user_id}', time.time(), ACTIVITY_TTL)
+
+
+def get_catalog_version():
+    return _get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    _bump_version(CATALOG_VERSION_KEY)
+    cache.set(CATALOG_CHANGED_KEY, time.time(), None)
+
+
+def catalog_changed_at():
+    """Unix time of the last write to any title, its OTT rows, ratings, seasons or episodes"""
+    return _changed_at(CATALOG_CHANGED_KEY)
+
+
+def get_content_versions(content_ids, create=True):
+    """
+    {content id: version} with one get_many. Missing versions are created, so
+    callers must only pass ids of existing rows; with create=False they come
+    back as None instead, for ids that came from a request.
+    """
+    keys = {content_id: f'content:version:{content_id}' for content_id in content_ids}
+    found = cache.get_many(keys.values())
+    missing = {key: _new_version() for key in keys.values() if key not in found} if create else {}
+    for key, version in missing.items():
+        cache.add(key, version, None)
+    if missing:
+        found.update(cache.get_many(missing))
+    return {content_id: found.get(key) for content_id, key in keys.items()}
+
+
+def bump_content_version(content_id):
+    """Invalidate one title's card and API representation; other titles and cached pages stay"""
+    _bump_version(f'content:version:{content_id}')
+    cache.set(CATALOG_CHANGED_KEY, time.time(), None)
+
+
+def get_review_version(content_id):
+    return _get_version(f'reviews:version:{content_id}')
+
+
+def bump_review_version(content_id):
+    _bump_version(f'reviews:version:{content_id}')
+    cache.set(f'reviews:changed:{content_id}', time.time(), None)
+
+
+def reviews_changed_at(content_id):
+    """Unix time of the last review write on a content"""
+    return _changed_at(f'reviews:changed:{content_id}')
+
+
+def get_role_version(user_id):
+    return _get_version(f'roles:version:{user_id}')
+
+
+def bump_role_version(user_id):
+    _bump_version(f'roles:version:{user_id}')
+
+
+def publish(name, values, timeout):
+    """
+    Store a new generation of {key: value} under `name` and then make it
+    current with one write, so readers see either the old or the new set,
+    never a mix. `timeout` should outlive the interval between publishes.
+
+    The generation before the previous one is deleted: the previous one is
+    kept for readers that read the pointer just before the swap, so at most
+    two generations of keys exist at a time.
+    """
+    # Never reuse the current generation, even for two publishes in the same millisecond
+    generation = max(_new_version(), cache.get(f'{name}:current', 0) + 1)
+    cache.set_many({f'{name}:{generation}:{key}': value for key, value in values.items()}, timeout)
+    cache.set(f'{name}:current', generation, None)
+    history = [(generation, list(values)), *cache.get(f'{name}:generations', [])]
+    cache.set(f'{name}:generations', history[:2], None)
+    cache.delete_many([f'{name}:{old}:{key}' for old, keys in history[2:] for key in keys])
+    return generation
+
+
+def get_published(name, keys):
+    """{key: value} of the current generation of `name`; empty before the first publish"""
+    generation = cache.get(f'{name}:current')
+    if generation is None:
+        return {}
+    prefix = f'{name}:{generation}:'
+    found = cache.get_many([prefix + key for key in keys])
+    return {key[len(prefix):]: value for key, value in found.items()}
+
+
+def last_activity(user_id):
+    """Unix time of the user's last rating/watchlist/review change, if recent"""
+    return cache.get(f'recs:activity:{user_id}')
+
+
+# Hit/miss counts of this process, like TieredCache.stats(): a shared counter
+# would cost a cache write per dashboard read
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def cached_recommendations(user, compute, limit=6):
+    """Return compute(user, limit) from cache, recomputing only after the user's signals changed"""
+    key = f'recs:{user.id}:{get_user_version(user.id)}:{limit}'
+    recommendations = cache.get(key)
+    if recommendations is not None:
+        _count('hits')
+        return recommendations
+    _count('misses')
+    recommendations = list(compute(user, limit=limit))
+    cache.set(key, recommendations, RECOMMENDATION_TTL)
+    return recommendations
+
+
+def recommendation_cache_stats():
+    """Recommendation cache hits and misses of this worker"""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0,
+    }
+
+
+def cache_stats():
+    """Per key prefix hit/recompute counters of this worker, when the backend keeps them"""
+    stats = getattr(cache, 'stats', None)
+    return stats() if stats else {}
@@ -0,0 +1,88 @@
+# recommendox/coldstart.py
+"""
+Precomputed top lists for users without ratings.
+
+Every title is ranked by a Bayesian average of its ratings (read from the
+denormalized aggregates on Content) and filed into
+(genre, language, content_type) buckets, including '*' wildcards for each
+dimension. The lists are stored in the cache, so recommending for a new user
+is a single get_many over the buckets matching their UserProfile preferences.
+
+Only the refresh_top_lists command (run it from cron, e.g. hourly) builds
+the lists; requests never do. Each build is published as a whole with
+caching.publish, so requests keep reading the previous lists while a build
+runs. Before the first build the lists are empty and the pipeline's other
+generators fill in.
+"""
+from collections import defaultdict
+from itertools import product
+
+from .caching import get_published, publish
+from .models import Content
+
+TOP_LIST_SIZE = 50
+TOP_LIST_TTL = 60 * 60 * 48     # longer than the interval between refresh_top_lists runs
+PRIOR_WEIGHT = 5          # ratings' worth of pull towards the catalog mean
+LISTS_NAME = 'toplist'
+ANY = '*'
+
+
+def bucket_key(genre=ANY, language=ANY, content_type=ANY):
+    return f'{genre}:{language}:{content_type}'.replace(' ', '_')
+
+
+def build_top_lists(size=TOP_LIST_SIZE):
+    """Recompute every bucket in one pass over the catalog. Returns the bucket count"""
+    rows = list(Content.objects.values_list(
+        'id', 'genre', 'language', 'content_type', 'rating_sum', 'rating_count'
+    ))
+
+    total = sum(row[5] for row in rows)
+    prior = sum(row[4] for row in rows) / total if total else 3.0
+
+    buckets = defaultdict(list)
+    for content_id, genre, language, content_type, rating_sum, rating_count in rows:
+        score = (PRIOR_WEIGHT * prior + rating_sum) / (PRIOR_WEIGHT + rating_count)
+        for key in product((genre, ANY), (language, ANY), (content_type, ANY)):
+            buckets[bucket_key(*key)].append((content_id, score))
+
+    lists = {
+        key: sorted(items, key=lambda item: item[1], reverse=True)[:size]
+        for key, items in buckets.items()
+    }
+    publish(LISTS_NAME, lists, TOP_LIST_TTL)
+    return len(lists)
+
+
+def get_top_lists(keys):
+    """{key: [(content_id, score), ...]} for the requested buckets from the last published build"""
+    found = get_published(LISTS_NAME, keys)
+    return {key: found.get(key, []) for key in keys}
+
+
+def _split_preferences(value, choices):
+    valid = {choice.lower(): choice for choice, _ in choices}
+    return [valid[item.strip().lower()] for item in (value or '').split(',') if item.strip().lower() in valid]
+
+
+def profile_buckets(favorite_genres, preferred_languages):
+    """Bucket keys matching a profile's comma-separated preferences"""
+    genres = _split_preferences(favorite_genres, Content.GENRE_CHOICES) or [ANY]
+    languages = _split_preferences(preferred_languages, Content.LANGUAGE_CHOICES) or [ANY]
+    return [bucket_key(genre, language) for genre, language in product(genres, languages)]
+
+
+def cold_start_recommendations(favorite_genres, preferred_languages, limit=10, exclude_ids=()):
+    """Merge the matching buckets into one ranked [(content_id, score), ...] list"""
+    keys = profile_buckets(favorite_genres, preferred_languages)
+    best = {}
+    for items in get_top_lists(keys).values():
+        for content_id, score in items:
+            if content_id not in exclude_ids and score > best.get(content_id, 0):
+                best[content_id] = score
+    if len(best) < limit and keys != [bucket_key()]:
+        # Narrow preferences: pad with the catalog-wide list
+        for content_id, score in get_top_lists([bucket_key()])[bucket_key()]:
+            if content_id not in exclude_ids and content_id not in best:
+                best[content_id] = score * 0.5
+    return sorted(best.items(), key=lambda item: item[1], reverse=True)[:limit]
@@ -0,0 +1,236 @@
+# recommendox/content_similarity.py
+"""
+Content-based "similar titles" index.
+
+Every Content is turned into a TF-IDF vector over its description, cast,
+director, genre and language. The top-N cosine neighbors of each title are
+stored as ItemNeighbor rows of kind 'text', so the detail page can fetch its
+similar titles by primary key.
+
+The build_content_neighbors command fits the vectorizer over the whole
+catalog and saves it, with the catalog matrix, to RECOMMENDER_MODEL_DIR.
+When one title changes, refresh_content_neighbors only transforms that
+title's document with the saved vectorizer and scores it against the saved
+matrix: it rewrites the title's own list and adds or drops the title in the
+lists of the titles it is close to. Words the vectorizer has not seen and
+edits to other titles since the build count from the next offline build.
+
+Saving a title never refreshes it in the web worker: the post_save signal
+only marks it with a NeighborRefresh row, and refresh_marked_neighbors
+(build_content_neighbors --marked, run every few minutes) refreshes the
+marked titles in one batch, loading the saved model once.
+"""
+import os
+import pickle
+import re
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from .models import Content, ItemNeighbor, NeighborRefresh
+
+MODEL_FILENAME = 'content_tfidf.pkl'
+DEFAULT_TOP_N = 20
+BLOCK_ROWS = 1000
+REVERSE_CANDIDATES = 10     # x top_n closest titles whose lists may gain a changed title
+
+
+def _name_tokens(value):
+    """'Tom Hanks, Meryl Streep' -> 'person_tom_hanks person_meryl_streep'"""
+    if not value:
+        return ''
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    return ' '.join('person_' + re.sub(r'\W+', '_', name.lower()) for name in names)
+
+
+def content_document(title_fields):
+    """Build the text indexed for one content from its metadata fields"""
+    description, cast, director, genre, language = title_fields
+    # Names and categorical fields become single tokens so "Tom Hanks" only
+    # matches Tom Hanks, and are repeated to weigh more than plain description words.
+    people = f'{_name_tokens(cast)} {_name_tokens(director)}'
+    tags = f'genre_{genre} lang_{language}'.lower().replace('-', '_')
+    return f'{description or ""} {people} {people} {tags} {tags}'
+
+
+def _corpus():
+    rows = Content.objects.values_list(
+        'id', 'description', 'cast', 'director', 'genre', 'language'
+    ).order_by('id')
+    ids = [row[0] for row in rows]
+    documents = [content_document(row[1:]) for row in rows]
+    return np.array(ids, dtype=np.int64), documents
+
+
+def _vectorize(documents):
+    vectorizer = TfidfVectorizer(stop_words='english', sublinear_tf=True)
+    return vectorizer, vectorizer.fit_transform(documents)
+
+
+def model_path():
+    return os.path.join(settings.RECOMMENDER_MODEL_DIR, MODEL_FILENAME)
+
+
+def _save_model(vectorizer, ids, matrix, path=None):
+    path = path or model_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as handle:
+        pickle.dump({'vectorizer': vectorizer, 'ids': ids, 'matrix': matrix.tocsr()}, handle,
+                    pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+_model_lock = threading.Lock()
+_loaded = {'path': None, 'mtime': None, 'model': None}
+
+
+def load_model(path=None):
+    """The fitted vectorizer, ids and matrix of the last build, reloaded only when the file changed"""
+    path = path or model_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _model_lock:
+        if _loaded['path'] != path or _loaded['mtime'] != mtime:
+            with open(path, 'rb') as handle:
+                _loaded['model'] = pickle.load(handle)
+            _loaded['path'] = path
+            _loaded['mtime'] = mtime
+        return _loaded['model']
+
+
+def _top_neighbors(similarities, ids, exclude_index, top_n):
+    similarities[exclude_index] = 0.0
+    keep = min(top_n, len(similarities) - 1)
+    if keep <= 0:
+        return []
+    top = np.argpartition(-similarities, keep - 1)[:keep]
+    top = top[np.argsort(-similarities[top])]
+    return [(int(ids[i]), float(similarities[i])) for i in top if similarities[i] > 0]
+
+
+def mark_for_refresh(content_id):
+    """Queue a content for the next refresh batch; marking it again moves its mark forward"""
+    NeighborRefresh.objects.bulk_create(
+        [NeighborRefresh(content_id=content_id, marked_at=timezone.now())],
+        update_conflicts=True, unique_fields=['content'], update_fields=['marked_at'],
+    )
+
+
+def _clear_marks(marks):
+    # A title saved again while its batch ran keeps its newer mark
+    for content_id, marked_at in marks:
+        NeighborRefresh.objects.filter(content_id=content_id, marked_at__lte=marked_at).delete()
+
+
+def build_content_neighbors(top_n=DEFAULT_TOP_N, batch_size=1000, path=None):
+    """Rebuild all 'text' neighbors and save the fitted model. Returns the number of rows written"""
+    marks = list(NeighborRefresh.objects.values_list('content_id', 'marked_at'))
+    ids, documents = _corpus()
+    if len(ids) < 2:
+        return 0
+    vectorizer, matrix = _vectorize(documents)
+    _save_model(vectorizer, ids, matrix, path)
+
+    written = 0
+    with transaction.atomic():
+        ItemNeighbor.objects.filter(kind='text').delete()
+        for start in range(0, len(ids), BLOCK_ROWS):
+            stop = min(start + BLOCK_ROWS, len(ids))
+            block = (matrix[start:stop] @ matrix.T).toarray()
+            rows = []
+            for offset, similarities in enumerate(block):
+                content_id = int(ids[start + offset])
+                rows.extend(
+                    ItemNeighbor(kind='text', content_id=content_id, neighbor_id=neighbor_id, score=score)
+                    for neighbor_id, score in _top_neighbors(similarities, ids, start + offset, top_n)
+                )
+            ItemNeighbor.objects.bulk_create(rows, batch_size=batch_size)
+            written += len(rows)
+    _clear_marks(marks)
+    return written
+
+
+def refresh_marked_neighbors(top_n=DEFAULT_TOP_N, limit=None):
+    """Refresh the titles marked since the last batch, oldest mark first. Returns the number refreshed"""
+    marks = list(NeighborRefresh.objects.order_by('marked_at').values_list('content_id', 'marked_at')[:limit])
+    if load_model() is None:
+        return 0
+    for content_id, _ in marks:
+        refresh_content_neighbors(content_id, top_n=top_n)
+    _clear_marks(marks)
+    return len(marks)
+
+
+def refresh_content_neighbors(content_id, top_n=DEFAULT_TOP_N):
+    """
+    Recompute the 'text' neighbors of one changed content against the saved
+    model, in its own list and in the lists of its closest titles. Returns
+    the number of rows written; nothing happens before the first build.
+    """
+    model = load_model()
+    row = Content.objects.filter(id=content_id).values_list(
+        'description', 'cast', 'director', 'genre', 'language'
+    ).first()
+    if model is None or row is None:
+        return 0
+    ids = model['ids']
+    vector = model['vectorizer'].transform([content_document(row)])
+    similarities = (model['matrix'] @ vector.T).toarray().ravel()
+    # The saved row of this content is out of date; score it out
+    similarities[ids == content_id] = 0.0
+
+    keep = min(top_n * REVERSE_CANDIDATES, len(ids))
+    closest = np.argpartition(-similarities, keep - 1)[:keep] if keep else []
+    scores = {int(ids[i]): float(similarities[i]) for i in closest if similarities[i] > 0}
+    listing = set(
+        ItemNeighbor.objects.filter(kind='text', neighbor_id=content_id).values_list('content_id', flat=True)
+    )
+    for other_id in listing - scores.keys():
+        position = np.flatnonzero(ids == other_id)
+        scores[other_id] = float(similarities[position[0]]) if len(position) else 0.0
+    # Titles deleted since the build
+    live = set(Content.objects.filter(id__in=list(scores)).values_list('id', flat=True))
+    scores = {other_id: score for other_id, score in scores.items() if other_id in live}
+
+    own = sorted(((score, other_id) for other_id, score in scores.items() if score > 0), reverse=True)[:top_n]
+    rows = [
+        ItemNeighbor(kind='text', content_id=content_id, neighbor_id=other_id, score=score)
+        for score, other_id in own
+    ]
+
+    # Re-rank each close title's list with this content's new score in it
+    current = {}
+    for row_id, other_id, neighbor_id, score in ItemNeighbor.objects.filter(
+        kind='text', content_id__in=list(scores)
+    ).exclude(neighbor_id=content_id).values_list('id', 'content_id', 'neighbor_id', 'score'):
+        current.setdefault(other_id, []).append((score, row_id))
+    displaced = []
+    for other_id, score in scores.items():
+        entries = sorted(current.get(other_id, []), reverse=True)
+        if score <= 0 or (len(entries) >= top_n and score <= entries[top_n - 1][0]):
+            continue
+        rows.append(ItemNeighbor(kind='text', content_id=other_id, neighbor_id=content_id, score=score))
+        displaced.extend(row_id for _, row_id in entries[top_n - 1:])
+
+    with transaction.atomic():
+        ItemNeighbor.objects.filter(kind='text', content_id=content_id).delete()
+        ItemNeighbor.objects.filter(kind='text', neighbor_id=content_id).delete()
+        ItemNeighbor.objects.filter(id__in=displaced).delete()
+        ItemNeighbor.objects.bulk_create(rows)
+    return len(rows)
+
+
+def similar_content_ids(content_id, limit=4):
+    """Neighbor ids for the detail page, best first"""
+    return list(
+        ItemNeighbor.objects.filter(kind='text', content_id=content_id)
+        .order_by('-score')
+        .values_list('neighbor_id', flat=True)[:limit]
+    )
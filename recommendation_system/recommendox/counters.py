@@ -0,0 +1,107 @@
+# recommendox/counters.py
+"""
+Write-behind buffer for Content.views_count.
+
+Page views only bump an in-process counter; requests never write it out.
+A background thread flushes the buffer every VIEW_COUNTER_FLUSH_INTERVAL
+seconds, or as soon as a request signals that MAX_PENDING_CONTENT titles
+are waiting, and atexit flushes what is left on interpreter exit, with one
+`views_count = views_count + n` UPDATE per content; the same batch is added
+to the current hour's engagement buckets. Increments are applied
+with F() so concurrent workers never overwrite each other, and a worker that
+dies loses at most one interval of views.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import F
+
+from .models import Content
+from .engagement import record_events
+
+logger = logging.getLogger(__name__)
+
+MAX_PENDING_CONTENT = 1000   # flush early once this many titles are waiting
+
+
+class ViewCounterBuffer:
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._flushed_total = 0
+        self._thread = None
+        self._wake = threading.Event()
+
+    def increment(self, content_id, count=1):
+        if self.flush_interval <= 0:
+            self._write({content_id: count})
+            return
+        with self._lock:
+            self._pending[content_id] += count
+            full = len(self._pending) >= MAX_PENDING_CONTENT
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+
+    def depth(self):
+        """Views counted but not yet written to the database"""
+        with self._lock:
+            return sum(self._pending.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending_views': sum(self._pending.values()),
+                'pending_content': len(self._pending),
+                'flushed_views': self._flushed_total,
+            }
+
+    def flush(self):
+        """Write every pending increment. Returns the number of views written"""
+        with self._lock:
+            batch, self._pending = self._pending, Counter()
+        if not batch:
+            return 0
+        try:
+            self._write(batch)
+        except DatabaseError:
+            logger.exception('Flushing %d buffered views failed; keeping them for the next flush', sum(batch.values()))
+            with self._lock:
+                self._pending.update(batch)
+            return 0
+        return sum(batch.values())
+
+    def _write(self, batch):
+        with transaction.atomic():
+            for content_id, count in batch.items():
+                Content.objects.filter(id=content_id).update(views_count=F('views_count') + count)
+            record_events(batch, 'view')
+        with self._lock:
+            self._flushed_total += sum(batch.values())
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='view-counter-flush', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Background view counter flush failed')
+
+
+view_counter = ViewCounterBuffer(settings.VIEW_COUNTER_FLUSH_INTERVAL)
+atexit.register(view_counter.flush)
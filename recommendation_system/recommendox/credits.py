@@ -0,0 +1,150 @@
+# recommendox/credits.py
+"""
+Person / Credit index extracted from Content.
+
+Directors and the comma-separated cast become Credit rows pointing at one
+Person per normalized name. Producers and writers are picked up from
+"produced by X" / "written by X" phrases in the description, which is where
+the catalog records them. Filmography lookups are then indexed joins on
+Credit instead of substring scans over every title.
+
+A signal re-syncs a title's credits after it is saved; rebuild_credits
+backfills the whole catalog and prunes the people left without credits.
+Syncs and the prune lock the Person rows they work on (in id order), so the
+prune never deletes someone a concurrent sync is about to credit, and a sync
+re-creates anyone pruned between its insert and its lock. On SQLite the
+database write lock already serializes them.
+"""
+import re
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .models import Content, Credit, Person
+from .text import normalize
+
+# A name is one or more capitalized words (or initials) following the phrase
+_WORD = r"[A-Z](?:\.|[\w'-]*)"
+_NAME = rf"({_WORD}(?: {_WORD})*)"
+DESCRIPTION_ROLES = [
+    ('producer', re.compile(r'(?i:produced by|producer)\s+' + _NAME)),
+    ('writer', re.compile(r'(?i:written by|writer)\s+' + _NAME)),
+]
+
+SYNC_ROUNDS = 3     # insert-and-lock attempts per sync against concurrent prunes
+
+PROFESSION_ROLES = {
+    'Actor': ['cast'],
+    'Actress': ['cast'],
+    'Director': ['director'],
+    'Producer': ['producer', 'director'],
+    'Writer': ['writer', 'director'],
+}
+
+
+def normalize_name(name):
+    return ' '.join(normalize(name).split())
+
+
+def extract_credits(content):
+    """{(normalized name, role): display name} for one content"""
+    found = {}
+
+    def add(name, role):
+        name = ' '.join((name or '').split())
+        if name:
+            found.setdefault((normalize_name(name), role), name)
+
+    add(content.director, 'director')
+    for name in (content.cast or '').split(','):
+        add(name, 'cast')
+    for role, pattern in DESCRIPTION_ROLES:
+        for name in pattern.findall(content.description or ''):
+            add(name, role)
+    return found
+
+
+def sync_credits(contents):
+    """Replace the credits of the given content with freshly extracted ones"""
+    extracted = {content.id: extract_credits(content) for content in contents}
+    names = {}
+    for credits in extracted.values():
+        for (normalized, _), name in credits.items():
+            names.setdefault(normalized, name)
+
+    with transaction.atomic():
+        person_ids = {}
+        for _ in range(SYNC_ROUNDS):
+            # A second round only happens when a concurrent prune deleted people before they were locked
+            Person.objects.bulk_create(
+                [Person(name=name, normalized_name=normalized) for normalized, name in names.items()
+                 if normalized not in person_ids],
+                ignore_conflicts=True, batch_size=1000,
+            )
+            person_ids = dict(
+                Person.objects.select_for_update().filter(normalized_name__in=list(names))
+                .order_by('id').values_list('normalized_name', 'id')
+            )
+            if len(person_ids) == len(names):
+                break
+        Credit.objects.filter(content_id__in=list(extracted)).delete()
+        Credit.objects.bulk_create(
+            [
+                Credit(person_id=person_ids[normalized], content_id=content_id, role=role)
+                for content_id, credits in extracted.items()
+                for normalized, role in credits
+            ],
+            ignore_conflicts=True, batch_size=1000,
+        )
+
+
+def rebuild_credits(batch_size=1000, prune=True):
+    """Backfill credits for the whole catalog. Returns (titles, people)"""
+    contents = Content.objects.only('id', 'director', 'cast', 'description').order_by('id')
+    batch = []
+    titles = 0
+    for content in contents.iterator(chunk_size=batch_size):
+        batch.append(content)
+        if len(batch) >= batch_size:
+            sync_credits(batch)
+            titles += len(batch)
+            batch = []
+    if batch:
+        sync_credits(batch)
+        titles += len(batch)
+    if prune:
+        prune_people()
+    return titles, Person.objects.count()
+
+
+def prune_people():
+    """Delete the people no longer credited anywhere, unless a golden user is linked to them"""
+    uncredited = ~Exists(Credit.objects.filter(person_id=OuterRef('pk')))
+    with transaction.atomic():
+        locked = list(
+            Person.objects.select_for_update().filter(uncredited, golden_user__isnull=True)
+            .order_by('id').values_list('id', flat=True)
+        )
+        # Checked again after the lock: a sync that held some of these rows may have credited them
+        deleted, _ = Person.objects.filter(uncredited, id__in=locked).delete()
+    return deleted
+
+
+def person_for_golden(golden, name):
+    """The Person a golden user is linked to, linking by exact name on first use"""
+    person = Person.objects.filter(golden_user=golden).first()
+    if person is None:
+        person = Person.objects.filter(normalized_name=normalize_name(name), golden_user__isnull=True).first()
+        if person is not None:
+            person.golden_user = golden
+            person.save(update_fields=['golden_user'])
+    return person
+
+
+def filmography(person, roles):
+    """Content credited to a person in any of the given roles"""
+    if person is None:
+        return Content.objects.none()
+    return Content.objects.filter(
+        id__in=Credit.objects.filter(person=person, role__in=roles).values('content_id')
+    )
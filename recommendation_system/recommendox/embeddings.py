@@ -0,0 +1,249 @@
+# recommendox/embeddings.py
+"""
+Semantic index over Content descriptions.
+
+encode_catalog (run offline by the build_embeddings command) encodes every
+title with a sentence-transformers model and writes a flat float16/float32
+matrix to RECOMMENDER_MODEL_DIR. Web workers open that file with np.memmap in
+read-only mode, so every gunicorn worker shares the same page-cache copy of
+the vectors and none of them has to import torch unless it encodes a query.
+
+Workers load the query encoder once, in a background thread started at boot
+(wsgi.py) or by the first semantic query; a request never waits for it.
+semantic_search returns None until the encoder is ready and the view falls
+back to keyword search meanwhile.
+
+Each build writes its vectors, ids and meta to a new version directory and
+then swaps the CURRENT pointer file in one os.replace, so a worker always
+opens the three files of one build. The previous KEEP_VERSIONS builds stay
+on disk for workers that still have them mapped.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .models import Content
+
+VECTORS_FILENAME = 'content_embeddings.bin'
+IDS_FILENAME = 'content_embedding_ids.npy'
+META_FILENAME = 'content_embeddings.json'
+STORE_DIRNAME = 'embeddings'
+CURRENT_FILENAME = 'CURRENT'
+KEEP_VERSIONS = 2
+ENCODE_CHUNK_ROWS = 4096     # titles encoded before each write to the memmap
+SEARCH_BLOCK_ROWS = 16384    # rows scored per block during brute-force search
+ENCODER_RETRY_SECONDS = 300  # wait before loading again after a failed load
+
+logger = logging.getLogger(__name__)
+
+
+def _root():
+    return os.path.join(settings.RECOMMENDER_MODEL_DIR, STORE_DIRNAME)
+
+
+def current_version():
+    """Name of the published build, or None before the first one"""
+    try:
+        with open(os.path.join(_root(), CURRENT_FILENAME)) as handle:
+            return handle.read().strip() or None
+    except OSError:
+        return None
+
+
+def _publish(version):
+    pointer = os.path.join(_root(), CURRENT_FILENAME)
+    with open(pointer + '.tmp', 'w') as handle:
+        handle.write(version)
+    os.replace(pointer + '.tmp', pointer)
+    versions = sorted(name for name in os.listdir(_root()) if name != CURRENT_FILENAME and not name.endswith('.tmp'))
+    for old in versions[:-KEEP_VERSIONS]:
+        if old != version:
+            shutil.rmtree(os.path.join(_root(), old), ignore_errors=True)
+
+
+_encoder_lock = threading.Lock()
+_encoder = {'model': None, 'thread': None, 'failed_at': None}
+
+
+def _load_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(settings.EMBEDDING_MODEL_NAME, device='cpu')
+
+
+def get_encoder():
+    """Load the sentence-transformers model on first use (CPU only). Blocks: for offline commands"""
+    with _encoder_lock:
+        if _encoder['model'] is None:
+            _encoder['model'] = _load_model()
+        return _encoder['model']
+
+
+def _load_in_background():
+    try:
+        model = _load_model()
+    except Exception:
+        logger.exception('Loading the embedding model %s failed', settings.EMBEDDING_MODEL_NAME)
+        _encoder['failed_at'] = time.monotonic()
+    else:
+        _encoder['model'] = model
+
+
+def preload_encoder():
+    """Start loading the encoder in a background thread unless this process has it or is loading it"""
+    with _encoder_lock:
+        if _encoder['model'] is not None or (_encoder['thread'] is not None and _encoder['thread'].is_alive()):
+            return
+        failed_at = _encoder['failed_at']
+        if failed_at is not None and time.monotonic() - failed_at < ENCODER_RETRY_SECONDS:
+            return
+        _encoder['thread'] = threading.Thread(target=_load_in_background, name='embedding-encoder', daemon=True)
+        _encoder['thread'].start()
+
+
+def loaded_encoder():
+    """The encoder if this process has finished loading it, else None (and make sure it is loading)"""
+    if _encoder['model'] is None:
+        preload_encoder()
+    return _encoder['model']
+
+
+def embedding_text(title, description, genre):
+    return f'{title}. {genre}. {description or ""}'
+
+
+def encode_catalog(batch_size=64, workers=1, dtype='float16'):
+    """Encode every Content into a new version of the store and publish it. Returns the row count"""
+    rows = list(Content.objects.values_list('id', 'title', 'description', 'genre').order_by('id'))
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    texts = [embedding_text(*row[1:]) for row in rows]
+
+    model = get_encoder()
+    dim = model.get_sentence_embedding_dimension()
+    version = f'{time.strftime("%Y%m%d%H%M%S")}-{os.getpid()}'
+    directory = os.path.join(_root(), version)
+    os.makedirs(directory)
+
+    pool = model.start_multi_process_pool(['cpu'] * workers) if workers > 1 else None
+    try:
+        vectors = np.memmap(os.path.join(directory, VECTORS_FILENAME), dtype=dtype, mode='w+', shape=(max(len(ids), 1), dim))
+        for start in range(0, len(texts), ENCODE_CHUNK_ROWS):
+            chunk = texts[start:start + ENCODE_CHUNK_ROWS]
+            vectors[start:start + len(chunk)] = model.encode(
+                chunk, batch_size=batch_size, pool=pool,
+                normalize_embeddings=True, convert_to_numpy=True,
+            )
+        vectors.flush()
+        del vectors
+    finally:
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+
+    np.save(os.path.join(directory, IDS_FILENAME), ids)
+    with open(os.path.join(directory, META_FILENAME), 'w') as handle:
+        json.dump({
+            'model': settings.EMBEDDING_MODEL_NAME,
+            'dtype': dtype,
+            'dim': dim,
+            'count': len(ids),
+        }, handle)
+    _publish(version)
+    return len(ids)
+
+
+class EmbeddingStore:
+    """Read-only, memory-mapped view of the encoded catalog"""
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, META_FILENAME)) as handle:
+            self.meta = json.load(handle)
+        self.ids = np.load(os.path.join(directory, IDS_FILENAME))
+        self.vectors = np.memmap(
+            os.path.join(directory, VECTORS_FILENAME), dtype=self.meta['dtype'], mode='r',
+            shape=(max(self.meta['count'], 1), self.meta['dim']),
+        )[:self.meta['count']]
+        self.index = {cid: i for i, cid in enumerate(self.ids.tolist())}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def vector(self, content_id):
+        row = self.index.get(content_id)
+        return None if row is None else np.asarray(self.vectors[row], dtype=np.float32)
+
+    def search(self, query_vector, limit=10, exclude_ids=()):
+        """Brute-force cosine search in blocks. Returns [(content_id, score), ...] best first"""
+        if limit <= 0:
+            raise ValueError('limit must be positive')
+        query = np.asarray(query_vector, dtype=np.float32).ravel()
+        excluded = [self.index[cid] for cid in exclude_ids if cid in self.index]
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+
+        for start in range(0, len(self.ids), SEARCH_BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+            scores = block @ query
+            for row in excluded:
+                if start <= row < start + len(block):
+                    scores[row - start] = -np.inf
+            rows = np.arange(start, start + len(block))
+            # Merge this block into the running top-k
+            best_rows = np.concatenate([best_rows, rows])
+            best_scores = np.concatenate([best_scores, scores])
+            if len(best_scores) > limit:
+                keep = np.argpartition(-best_scores, limit - 1)[:limit]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+
+        order = np.argsort(-best_scores)
+        return [
+            (int(self.ids[best_rows[i]]), float(best_scores[i]))
+            for i in order if np.isfinite(best_scores[i])
+        ]
+
+
+_store_lock = threading.Lock()
+_store = {'version': None, 'store': None}
+
+
+def get_store():
+    """Return the shared EmbeddingStore, reopening it once a new build is published"""
+    version = current_version()
+    if version is None:
+        return None
+    with _store_lock:
+        if _store['version'] != version:
+            _store['store'] = EmbeddingStore(os.path.join(_root(), version))
+            _store['version'] = version
+        return _store['store']
+
+
+def more_like_this(content_id, limit=10):
+    """Semantic neighbors of a title, without loading the encoder"""
+    if limit <= 0:
+        raise ValueError('limit must be positive')
+    store = get_store()
+    if store is None:
+        return []
+    vector = store.vector(content_id)
+    if vector is None:
+        return []
+    return store.search(vector, limit=limit, exclude_ids=[content_id])
+
+
+def semantic_search(query, limit=10):
+    """Free-text search against the catalog embeddings, or None while the encoder is still loading"""
+    if limit <= 0:
+        raise ValueError('limit must be positive')
+    store = get_store()
+    if store is None or not query:
+        return []
+    encoder = loaded_encoder()
+    if encoder is None:
+        return None
+    vector = encoder.encode([query], normalize_embeddings=True, convert_to_numpy=True)[0]
+    return store.search(vector, limit=limit)
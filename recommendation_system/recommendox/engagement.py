@@ -0,0 +1,161 @@
+# recommendox/engagement.py
+"""
+Time-bucketed engagement counts.
+
+Views, ratings, reviews and watchlist adds are counted into one
+EngagementBucket row per (content, event, hour). Recording is an
+UPDATE ... count = count + n on the current hour's row, with an INSERT only
+for the first event of that hour, so the table grows with active titles per
+hour rather than with raw events. Views arrive pre-batched from the
+ViewCounterBuffer flush. Every recorded event also feeds the decayed
+trending scores in trending.py.
+
+rollup() compacts complete days of hourly rows into daily rows and prunes
+hourly rows older than the retention window, so long-range charts read one
+row per content per day.
+"""
+import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import EngagementBucket
+from .trending import record_trending
+
+HOURLY_RETENTION_HOURS = 72
+DAILY_RETENTION_DAYS = 400
+EVENTS = [event for event, _ in EngagementBucket.EVENT_CHOICES]
+
+
+def _hour_start(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _day_start(moment):
+    return moment.astimezone(datetime.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add(content_id, event, granularity, bucket_start, count):
+    updated = EngagementBucket.objects.filter(
+        content_id=content_id, event=event, granularity=granularity, bucket_start=bucket_start
+    ).update(count=F('count') + count)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            EngagementBucket.objects.create(
+                content_id=content_id, event=event, granularity=granularity,
+                bucket_start=bucket_start, count=count,
+            )
+    except IntegrityError:
+        # Another worker created the row between our UPDATE and INSERT
+        EngagementBucket.objects.filter(
+            content_id=content_id, event=event, granularity=granularity, bucket_start=bucket_start
+        ).update(count=F('count') + count)
+
+
+def record_event(content_id, event, count=1, at=None):
+    """Count `count` events for a content in the hourly bucket containing `at` (default now)"""
+    at = at or timezone.now()
+    _add(content_id, event, 'hour', _hour_start(at), count)
+    record_trending({content_id: count}, event, at)
+
+
+def record_events(counts, event, at=None):
+    """Batch form of record_event for {content_id: count}"""
+    at = at or timezone.now()
+    counts = {content_id: count for content_id, count in counts.items() if count}
+    with transaction.atomic():
+        for content_id, count in counts.items():
+            _add(content_id, event, 'hour', _hour_start(at), count)
+        record_trending(counts, event, at)
+
+
+def rollup(now=None, hourly_retention_hours=HOURLY_RETENTION_HOURS,
+           daily_retention_days=DAILY_RETENTION_DAYS):
+    """Compact complete days into daily buckets and prune old rows. Returns a summary dict"""
+    now = now or timezone.now()
+    today = _day_start(now)
+    # Hourly rows are only pruned a whole day at a time, in the same transaction
+    # that rolled that day up, so any day that still has hourly rows has all of
+    # them and its daily total can safely be rebuilt (overwritten) from them
+    prune_before = _day_start(now - datetime.timedelta(hours=hourly_retention_hours))
+
+    totals = {}
+    for content_id, event, bucket_start, count in EngagementBucket.objects.filter(
+        granularity='hour', bucket_start__lt=today
+    ).values_list('content_id', 'event', 'bucket_start', 'count').iterator():
+        key = (content_id, event, _day_start(bucket_start))
+        totals[key] = totals.get(key, 0) + count
+
+    with transaction.atomic():
+        if totals:
+            EngagementBucket.objects.bulk_create(
+                [
+                    EngagementBucket(content_id=content_id, event=event, granularity='day',
+                                     bucket_start=day, count=count)
+                    for (content_id, event, day), count in totals.items()
+                ],
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['content', 'granularity', 'bucket_start', 'event'],
+                update_fields=['count'],
+            )
+        pruned_hours, _ = EngagementBucket.objects.filter(
+            granularity='hour', bucket_start__lt=prune_before
+        ).delete()
+        pruned_days, _ = EngagementBucket.objects.filter(
+            granularity='day', bucket_start__lt=today - datetime.timedelta(days=daily_retention_days)
+        ).delete()
+    return {'daily_rows': len(totals), 'pruned_hourly': pruned_hours, 'pruned_daily': pruned_days}
+
+
+def _day_series(rows, days, now):
+    """Fill {(day, event): count} into one dict per day, oldest first"""
+    today = _day_start(now)
+    series = []
+    for offset in range(days - 1, -1, -1):
+        day = today - datetime.timedelta(days=offset)
+        point = {'day': day}
+        point.update({event: rows.get((day, event), 0) for event in EVENTS})
+        series.append(point)
+    return series
+
+
+def daily_series(content_id=None, days=14, now=None):
+    """
+    Per-day event counts for the last `days` days (one content, or the whole
+    catalog when content_id is None). Days not rolled up yet are summed from
+    their hourly rows.
+    """
+    now = now or timezone.now()
+    since = _day_start(now) - datetime.timedelta(days=days - 1)
+    buckets = EngagementBucket.objects.filter(bucket_start__gte=since)
+    if content_id is not None:
+        buckets = buckets.filter(content_id=content_id)
+
+    totals = list(buckets.values_list(
+        'granularity', 'bucket_start', 'event'
+    ).annotate(total=Sum('count')).order_by())
+
+    rows = {}
+    rolled_up = {_day_start(bucket_start) for granularity, bucket_start, _, _ in totals if granularity == 'day'}
+    for granularity, bucket_start, event, count in totals:
+        day = _day_start(bucket_start)
+        if granularity == 'day' or day not in rolled_up:
+            rows[(day, event)] = rows.get((day, event), 0) + count
+    return _day_series(rows, days, now)
+
+
+def recent_counts(content_id=None, hours=24, now=None):
+    """{event: count} over the trailing `hours` hours, read from hourly buckets"""
+    now = now or timezone.now()
+    buckets = EngagementBucket.objects.filter(
+        granularity='hour', bucket_start__gte=_hour_start(now) - datetime.timedelta(hours=hours - 1)
+    )
+    if content_id is not None:
+        buckets = buckets.filter(content_id=content_id)
+    counts = dict.fromkeys(EVENTS, 0)
+    counts.update(buckets.values_list('event').annotate(total=Sum('count')).order_by())
+    return counts
@@ -0,0 +1,190 @@
+# recommendox/evaluation.py
+"""
+Offline evaluation of the recommendation pipeline.
+
+Used by the evaluate_recommender command, always against a throwaway test
+database: it seeds interactions (a fixture or a synthetic set), holds out the
+most recent ratings, retrains every model on the rest and then measures both
+ranking quality and per-call latency / query count of run_pipeline.
+"""
+import datetime
+import math
+import random
+import time
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import Content, Rating, Watchlist
+from .pipeline import run_pipeline
+from .recommender import build_item_neighbors
+from .content_similarity import build_content_neighbors
+from .factorization import train_factors
+from .aggregates import repair_rating_aggregates
+
+RELEVANT_RATING = 4
+
+
+def generate_synthetic_interactions(users=500, contents=1000, ratings_per_user=30,
+                                    watchlist_per_user=5, days=180, seed=0):
+    """Seed users whose ratings follow hidden genre tastes, so quality metrics mean something"""
+    rng = random.Random(seed)
+    genres = [g for g, _ in Content.GENRE_CHOICES]
+    languages = [l for l, _ in Content.LANGUAGE_CHOICES]
+    types = [t for t, _ in Content.CONTENT_TYPES]
+    words = ['heist', 'family', 'space', 'ghost', 'school', 'war', 'love', 'island', 'robot', 'city']
+
+    Content.objects.bulk_create([
+        Content(
+            title=f'Synthetic {i}',
+            description=' '.join(rng.sample(words, 4)),
+            genre=rng.choice(genres),
+            language=rng.choice(languages),
+            content_type=rng.choice(types),
+            release_date=datetime.date(1990 + i % 35, 1 + i % 12, 1),
+            director=f'Director {i % 97}',
+            cast=', '.join(f'Actor {rng.randrange(300)}' for _ in range(3)),
+        )
+        for i in range(contents)
+    ], batch_size=1000)
+    catalog = list(Content.objects.values_list('id', 'genre'))
+    quality = {cid: rng.gauss(0, 0.7) for cid, _ in catalog}
+
+    User.objects.bulk_create([
+        User(username=f'synthetic_{i}', email=f'synthetic_{i}@example.com')
+        for i in range(users)
+    ], batch_size=1000)
+    user_ids = list(User.objects.filter(username__startswith='synthetic_').values_list('id', flat=True))
+
+    now = timezone.now()
+    ratings, saved = [], []
+    for user_id in user_ids:
+        taste = {g: rng.gauss(0, 1) for g in genres}
+        liked_genres = sorted(genres, key=taste.get, reverse=True)[:3]
+        # Users mostly interact with titles from genres they like
+        pool = [c for c in catalog if c[1] in liked_genres]
+        picks = rng.sample(pool, min(len(pool), int(ratings_per_user * 0.7)))
+        picks += rng.sample(catalog, ratings_per_user - len(picks))
+        seen = set()
+        for cid, genre in picks:
+            if cid in seen:
+                continue
+            seen.add(cid)
+            value = 3 + taste[genre] + quality[cid] + rng.gauss(0, 0.5)
+            rated_at = now - datetime.timedelta(seconds=rng.uniform(0, days * 86400))
+            ratings.append(Rating(
+                user_id=user_id, content_id=cid,
+                rating_value=int(min(5, max(1, round(value)))), rating_date=rated_at,
+            ))
+        for cid, _ in rng.sample(pool, min(len(pool), watchlist_per_user)):
+            if cid not in seen:
+                saved.append(Watchlist(user_id=user_id, content_id=cid))
+
+    dates = [r.rating_date for r in ratings]
+    created = Rating.objects.bulk_create(ratings, batch_size=2000)
+    # auto_now_add overwrote the generated dates; put them back
+    for rating, rated_at in zip(created, dates):
+        rating.rating_date = rated_at
+    Rating.objects.bulk_update(created, ['rating_date'], batch_size=2000)
+    Watchlist.objects.bulk_create(saved, batch_size=2000, ignore_conflicts=True)
+    # bulk_create skips the signals that maintain the denormalized aggregates
+    repair_rating_aggregates()
+
+
+def time_split(test_fraction=0.2):
+    """Delete the newest ratings and return them as {user_id: {relevant content_ids}}"""
+    total = Rating.objects.count()
+    test_count = int(total * test_fraction)
+    if not test_count:
+        return {}
+    cutoff = Rating.objects.order_by('-rating_date').values_list('rating_date', flat=True)[test_count - 1]
+    held_out = Rating.objects.filter(rating_date__gte=cutoff)
+
+    relevant = {}
+    for user_id, content_id, value in held_out.values_list('user_id', 'content_id', 'rating_value'):
+        if value >= RELEVANT_RATING:
+            relevant.setdefault(user_id, set()).add(content_id)
+    held_out.delete()
+    return relevant
+
+
+def train_models():
+    """Rebuild every offline artifact from the training ratings"""
+    timings = {}
+    for name, step in [
+        ('item_neighbors', build_item_neighbors),
+        ('content_neighbors', build_content_neighbors),
+        ('factors', lambda: train_factors(warm_start=False)),
+    ]:
+        started = time.perf_counter()
+        step()
+        timings[name] = time.perf_counter() - started
+    return timings
+
+
+def _ndcg(recommended, relevant, k):
+    dcg = sum(1 / math.log2(i + 2) for i, cid in enumerate(recommended[:k]) if cid in relevant)
+    ideal = sum(1 / math.log2(i + 2) for i in range(min(len(relevant), k)))
+    return dcg / ideal if ideal else 0.0
+
+
+def _percentiles(values):
+    if not values:
+        return {'p50': None, 'p95': None, 'p99': None, 'mean': None}
+    array = np.array(values)
+    return {
+        'p50': float(np.percentile(array, 50)),
+        'p95': float(np.percentile(array, 95)),
+        'p99': float(np.percentile(array, 99)),
+        'mean': float(array.mean()),
+    }
+
+
+def evaluate(relevant, k=10, max_users=None, seed=0):
+    """Run the pipeline for every held-out user and aggregate quality and speed metrics"""
+    user_ids = sorted(relevant)
+    if max_users and len(user_ids) > max_users:
+        user_ids = sorted(random.Random(seed).sample(user_ids, max_users))
+
+    precisions, recalls, ndcgs = [], [], []
+    latencies, query_counts = [], []
+    stage_timings = {}
+    recommended_items = set()
+
+    for user_id in user_ids:
+        user = User(id=user_id)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            result = run_pipeline(user, limit=k)
+            latencies.append((time.perf_counter() - started) * 1000)
+        query_counts.append(len(queries))
+        for stage, took in result.timings.items():
+            stage_timings.setdefault(stage, []).append(took)
+
+        recommended = [content.id for content in result.content]
+        recommended_items.update(recommended)
+        hits = len(set(recommended) & relevant[user_id])
+        precisions.append(hits / k)
+        recalls.append(hits / len(relevant[user_id]))
+        ndcgs.append(_ndcg(recommended, relevant[user_id], k))
+
+    catalog_size = Content.objects.count()
+    return {
+        'users_evaluated': len(user_ids),
+        'k': k,
+        'quality': {
+            f'precision@{k}': float(np.mean(precisions)) if precisions else 0.0,
+            f'recall@{k}': float(np.mean(recalls)) if recalls else 0.0,
+            f'ndcg@{k}': float(np.mean(ndcgs)) if ndcgs else 0.0,
+            'catalog_coverage': len(recommended_items) / catalog_size if catalog_size else 0.0,
+        },
+        'latency_ms': _percentiles(latencies),
+        'queries': {
+            'mean': float(np.mean(query_counts)) if query_counts else 0.0,
+            'max': max(query_counts) if query_counts else 0,
+        },
+        'stage_latency_ms': {stage: _percentiles(values) for stage, values in stage_timings.items()},
+    }
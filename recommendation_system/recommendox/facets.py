@@ -0,0 +1,96 @@
+# recommendox/facets.py
+"""
+Facet counts for the browse filters.
+
+The catalog is summarized by two grouped queries - titles per
+(genre, language, content_type) and per (genre, language, content_type,
+platform) - which are cached until a Content or ContentOTT change. Counts for
+any combination of those filters are then summed in Python from the cached
+rows without touching the database. Only a text search, which narrows the
+catalog to an arbitrary id set, needs the two grouped queries run for that set.
+
+Each facet is counted with every other active filter applied but not its
+own, so a dropdown still shows how many titles each alternative would give.
+The same counts give the number of titles matching all the filters, which
+the browse pager shows instead of running its own COUNT.
+"""
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Content, ContentOTT
+
+FACETS = ['genre', 'language', 'content_type', 'platform']
+CONTENT_FACETS = ['genre', 'language', 'content_type']
+FACETS_CACHE_KEY = 'facets:catalog'
+FACETS_CACHE_TTL = 60 * 60
+
+
+def _grouped_rows(content_ids=None):
+    """([(genre, language, type, count)], [(genre, language, type, platform, count)])"""
+    content = Content.objects.all()
+    ott = ContentOTT.objects.all()
+    if content_ids is not None:
+        content = content.filter(id__in=content_ids)
+        ott = ott.filter(content_id__in=content_ids)
+    titles = list(
+        content.values_list(*CONTENT_FACETS).annotate(count=Count('id')).order_by()
+    )
+    platforms = list(
+        ott.values_list(*(f'content__{facet}' for facet in CONTENT_FACETS), 'platform_name')
+        .annotate(count=Count('id')).order_by()
+    )
+    return titles, platforms
+
+
+def catalog_rows():
+    return cache.get_or_set(FACETS_CACHE_KEY, _grouped_rows, FACETS_CACHE_TTL)
+
+
+def invalidate_facets():
+    cache.delete(FACETS_CACHE_KEY)
+
+
+def _matches(row, filters, skip):
+    return all(
+        row[position] == filters[facet]
+        for position, facet in enumerate(FACETS[:len(row) - 1])
+        if facet != skip and filters.get(facet)
+    )
+
+
+def facet_counts(filters, content_ids=None):
+    """
+    {facet: [(value, count), ...]} for the browse filters, most common first.
+    `filters` maps facet names to the selected values; content_ids (ids or an
+    id subquery) restricts the counts to a search result.
+    """
+    titles, platforms = catalog_rows() if content_ids is None else _grouped_rows(content_ids)
+    counts = {}
+    for position, facet in enumerate(FACETS):
+        counter = Counter()
+        if facet == 'platform':
+            for row in platforms:
+                if _matches(row, filters, facet):
+                    counter[row[position]] += row[-1]
+        elif filters.get('platform'):
+            # Titles on the selected platform: each (content, platform) row is one title
+            for row in platforms:
+                if row[3] == filters['platform'] and _matches(row[:3] + row[4:], filters, facet):
+                    counter[row[position]] += row[-1]
+        else:
+            for row in titles:
+                if _matches(row, filters, facet):
+                    counter[row[position]] += row[-1]
+        if filters.get(facet) and filters[facet] not in counter:
+            # Keep the current selection listed even when nothing matches it
+            counter[filters[facet]] = 0
+        counts[facet] = sorted(counter.items(), key=lambda item: (-item[1], item[0]))
+    return counts
+
+
+def matching_total(counts, filters):
+    """Titles matching every filter, read off facet_counts(filters): each title has one genre"""
+    genres = dict(counts['genre'])
+    return genres.get(filters['genre'], 0) if filters.get('genre') else sum(genres.values())
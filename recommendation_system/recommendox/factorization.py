@@ -0,0 +1,220 @@
+# recommendox/factorization.py
+"""
+Implicit-feedback matrix factorization (ALS).
+
+train_factors learns user and item factor matrices from Rating and Watchlist
+and writes them to a single .npz file. Training warm-starts from the previous
+file so nightly retrains only need a few sweeps.
+
+Serving loads the file once per process (and again only when it changes on
+disk); scoring a user is one matrix-vector product plus an argpartition.
+"""
+import os
+import threading
+
+import numpy as np
+from scipy import sparse
+from django.conf import settings
+
+from .models import Rating, Watchlist
+
+MODEL_FILENAME = 'mf_factors.npz'
+DEFAULT_FACTORS = 32
+DEFAULT_ITERATIONS = 10
+DEFAULT_REGULARIZATION = 0.05
+DEFAULT_ALPHA = 10.0
+WATCHLIST_CONFIDENCE = 1.0   # a saved title counts like a 3-star rating
+LIKE_THRESHOLD = 3           # ratings at or above this are positive preferences
+
+
+def model_path():
+    return os.path.join(settings.RECOMMENDER_MODEL_DIR, MODEL_FILENAME)
+
+
+def _confidence_matrix(alpha):
+    """Return (C - 1 as csr users x items, preference csr, user_ids, item_ids)"""
+    ratings = list(Rating.objects.values_list('user_id', 'content_id', 'rating_value'))
+    rated_pairs = {(u, c) for u, c, _ in ratings}
+    saved = [
+        pair for pair in Watchlist.objects.values_list('user_id', 'content_id')
+        if pair not in rated_pairs
+    ]
+    if not ratings and not saved:
+        return None
+
+    users = np.array([u for u, _, _ in ratings] + [u for u, _ in saved], dtype=np.int64)
+    items = np.array([c for _, c, _ in ratings] + [c for _, c in saved], dtype=np.int64)
+    values = np.array([v for _, _, v in ratings], dtype=np.float64)
+
+    # Liked titles are positives weighted by how much they were liked; disliked
+    # titles are confident negatives rather than missing data.
+    liked = values >= LIKE_THRESHOLD
+    strength = np.where(liked, values - LIKE_THRESHOLD + 1, LIKE_THRESHOLD - values)
+    strength = np.concatenate([strength, np.full(len(saved), WATCHLIST_CONFIDENCE)])
+    preference = np.concatenate([liked, np.ones(len(saved), dtype=bool)]).astype(np.float64)
+
+    user_ids, user_idx = np.unique(users, return_inverse=True)
+    item_ids, item_idx = np.unique(items, return_inverse=True)
+    shape = (len(user_ids), len(item_ids))
+    confidence = sparse.csr_matrix((alpha * strength, (user_idx, item_idx)), shape=shape)
+    preference = sparse.csr_matrix((preference, (user_idx, item_idx)), shape=shape)
+    return confidence, preference, user_ids, item_ids
+
+
+def _solve_rows(confidence, preference, fixed, regularization):
+    """One ALS half-step: solve every row of `confidence` against `fixed`"""
+    n_factors = fixed.shape[1]
+    gram = fixed.T @ fixed + regularization * np.eye(n_factors)
+    solved = np.zeros((confidence.shape[0], n_factors))
+    for row in range(confidence.shape[0]):
+        start, stop = confidence.indptr[row], confidence.indptr[row + 1]
+        if start == stop:
+            continue
+        cols = confidence.indices[start:stop]
+        conf = confidence.data[start:stop]
+        pref = preference.data[start:stop]
+        factors = fixed[cols]
+        lhs = gram + (factors.T * conf) @ factors
+        rhs = factors.T @ ((1.0 + conf) * pref)
+        solved[row] = np.linalg.solve(lhs, rhs)
+    return solved
+
+
+def _warm_start(ids, previous_ids, previous_factors, n_factors, rng):
+    factors = rng.normal(scale=0.01, size=(len(ids), n_factors))
+    if previous_factors is not None and previous_factors.shape[1] == n_factors:
+        positions = {pid: i for i, pid in enumerate(previous_ids.tolist())}
+        for i, pid in enumerate(ids.tolist()):
+            if pid in positions:
+                factors[i] = previous_factors[positions[pid]]
+    return factors
+
+
+def train_factors(factors=DEFAULT_FACTORS, iterations=DEFAULT_ITERATIONS,
+                  regularization=DEFAULT_REGULARIZATION, alpha=DEFAULT_ALPHA,
+                  warm_start=True, seed=0, path=None):
+    """Train and save user/item factors. Returns the trained FactorModel or None"""
+    data = _confidence_matrix(alpha)
+    if data is None:
+        return None
+    confidence, preference, user_ids, item_ids = data
+
+    previous = load_model(path) if warm_start else None
+    rng = np.random.default_rng(seed)
+    user_factors = _warm_start(
+        user_ids, previous.user_ids if previous else None,
+        previous.user_factors if previous else None, factors, rng,
+    )
+    item_factors = _warm_start(
+        item_ids, previous.item_ids if previous else None,
+        previous.item_factors if previous else None, factors, rng,
+    )
+
+    confidence_t = confidence.T.tocsr()
+    preference_t = preference.T.tocsr()
+    for _ in range(iterations):
+        user_factors = _solve_rows(confidence, preference, item_factors, regularization)
+        item_factors = _solve_rows(confidence_t, preference_t, user_factors, regularization)
+
+    model = FactorModel(user_ids, item_ids, user_factors, item_factors, regularization)
+    model.save(path or model_path())
+    return model
+
+
+class FactorModel:
+    """Learned factors plus the lookups needed to score a user"""
+
+    def __init__(self, user_ids, item_ids, user_factors, item_factors, regularization):
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.item_ids = np.asarray(item_ids, dtype=np.int64)
+        self.user_factors = np.asarray(user_factors, dtype=np.float32)
+        self.item_factors = np.asarray(item_factors, dtype=np.float32)
+        self.regularization = float(regularization)
+        self.user_index = {uid: i for i, uid in enumerate(self.user_ids.tolist())}
+        self.item_index = {cid: i for i, cid in enumerate(self.item_ids.tolist())}
+        self._gram = None
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp.npz'
+        np.savez(
+            tmp_path, user_ids=self.user_ids, item_ids=self.item_ids,
+            user_factors=self.user_factors, item_factors=self.item_factors,
+            regularization=np.array(self.regularization),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data['user_ids'], data['item_ids'], data['user_factors'],
+                data['item_factors'], float(data['regularization']),
+            )
+
+    def fold_in(self, ratings, saved, alpha=DEFAULT_ALPHA):
+        """Compute a factor vector for a user the model was not trained on"""
+        cols, conf, pref = [], [], []
+        for content_id, value in ratings.items():
+            if content_id in self.item_index:
+                cols.append(self.item_index[content_id])
+                liked = value >= LIKE_THRESHOLD
+                conf.append(alpha * (value - LIKE_THRESHOLD + 1 if liked else LIKE_THRESHOLD - value))
+                pref.append(1.0 if liked else 0.0)
+        for content_id in saved:
+            if content_id in self.item_index and content_id not in ratings:
+                cols.append(self.item_index[content_id])
+                conf.append(alpha * WATCHLIST_CONFIDENCE)
+                pref.append(1.0)
+        if not cols:
+            return None
+        if self._gram is None:
+            factors = self.item_factors.astype(np.float64)
+            self._gram = factors.T @ factors + self.regularization * np.eye(factors.shape[1])
+        factors = self.item_factors[cols].astype(np.float64)
+        conf = np.array(conf)
+        lhs = self._gram + (factors.T * conf) @ factors
+        rhs = factors.T @ ((1.0 + conf) * np.array(pref))
+        return np.linalg.solve(lhs, rhs).astype(np.float32)
+
+    def recommend(self, user_id, limit=10, exclude_ids=(), ratings=None, saved=None):
+        """Top-`limit` (content_id, score) pairs for a user, best first"""
+        row = self.user_index.get(user_id)
+        if row is not None:
+            vector = self.user_factors[row]
+        elif ratings or saved:
+            vector = self.fold_in(ratings or {}, saved or set())
+            if vector is None:
+                return []
+        else:
+            return []
+
+        scores = self.item_factors @ vector
+        excluded = [self.item_index[cid] for cid in exclude_ids if cid in self.item_index]
+        if excluded:
+            scores[excluded] = -np.inf
+        limit = min(limit, len(scores) - len(excluded))
+        if limit <= 0:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(int(self.item_ids[i]), float(scores[i])) for i in top]
+
+
+_model_lock = threading.Lock()
+_loaded = {'path': None, 'mtime': None, 'model': None}
+
+
+def load_model(path=None):
+    """Return the FactorModel on disk, reloading only when the file changed"""
+    path = path or model_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _model_lock:
+        if _loaded['path'] != path or _loaded['mtime'] != mtime:
+            _loaded['model'] = FactorModel.load(path)
+            _loaded['path'] = path
+            _loaded['mtime'] = mtime
+        return _loaded['model']
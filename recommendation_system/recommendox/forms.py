@@ -31,6 +31,16 @@ class ContentForm(forms.ModelForm):
         
         return cleaned_data
     
+    def save(self, commit=True):
+        # An edit writes only the form's fields: a full save would put back the rating
+        # aggregates and views_count loaded with the form, undoing F() updates made since
+        if not commit or self.instance._state.adding:
+            return super().save(commit)
+        content = super().save(commit=False)
+        content.save(update_fields=[*self._meta.fields, 'updated_at'])
+        self._save_m2m()
+        return content
+
     def clean_poster_url(self):
         url = self.cleaned_data.get('poster_url')
         return url
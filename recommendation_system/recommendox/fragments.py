@@ -0,0 +1,54 @@
+# recommendox/fragments.py
+"""
+Cached HTML for whole pages and content cards.
+
+Page keys embed the catalog version from caching.py, so a Content or
+ContentOTT write makes them all unreachable at once and they expire on their
+own. Card keys embed their title's own version instead, so a rating only
+re-renders the card it changed. Content cards are shared by the home page,
+browse and OTT browse: a list render fetches every card on the page with one
+get_many and only renders (and loads OTT platforms for) the ones that missed.
+"""
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from .caching import get_catalog_version, get_content_versions
+
+CARD_TEMPLATE = 'recommendox/_content_card.html'
+CARD_TTL = 60 * 60
+PAGE_TTL = 60 * 5       # also bounds how stale the trending row and ratings on a cached page can be
+
+
+def page_key(name):
+    return f'page:{name}:{get_catalog_version()}'
+
+
+def card_key(content_id, version):
+    return f'card:{content_id}:{version}'
+
+
+def _render_card(content):
+    return render_to_string(CARD_TEMPLATE, {
+        'content': content,
+        'is_new_release': content.release_date.year == timezone.now().year,
+    })
+
+
+def render_cards(contents):
+    """Attach the cached card HTML to each content as `card_html`. Returns the list"""
+    contents = list(contents)
+    versions = get_content_versions([content.id for content in contents])
+    keys = {content.id: card_key(content.id, versions[content.id]) for content in contents}
+    cached = cache.get_many(keys.values())
+    missing = [content for content in contents if keys[content.id] not in cached]
+    if missing:
+        prefetch_related_objects(missing, 'ott_platforms')
+        rendered = {keys[content.id]: _render_card(content) for content in missing}
+        cache.set_many(rendered, CARD_TTL)
+        cached.update(rendered)
+    for content in contents:
+        content.card_html = mark_safe(cached[keys[content.id]])
+    return contents
@@ -0,0 +1,29 @@
+# recommendox/management/commands/build_content_neighbors.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from recommendox.content_similarity import DEFAULT_TOP_N, build_content_neighbors, refresh_marked_neighbors
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the TF-IDF "similar content" index for every title, or refresh the titles edited since'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-n', type=int, default=DEFAULT_TOP_N,
+                            help='Neighbors to keep per content')
+        parser.add_argument('--marked', action='store_true',
+                            help='Only refresh the titles saved since the last run (run every few minutes)')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['marked']:
+            refreshed = refresh_marked_neighbors(top_n=options['top_n'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Refreshed the neighbors of {refreshed} titles in {time.monotonic() - started:.1f}s'
+            ))
+            return
+        written = build_content_neighbors(top_n=options['top_n'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {written} neighbor rows in {time.monotonic() - started:.1f}s'
+        ))
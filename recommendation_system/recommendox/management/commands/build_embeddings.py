@@ -0,0 +1,29 @@
+# recommendox/management/commands/build_embeddings.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recommendox.embeddings import encode_catalog
+
+
+class Command(BaseCommand):
+    help = 'Encode every content description into the shared memory-mapped embedding store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=64)
+        parser.add_argument('--workers', type=int, default=1,
+                            help='CPU encoder processes to run in parallel')
+        parser.add_argument('--dtype', choices=['float16', 'float32'], default='float16')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = encode_catalog(
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            dtype=options['dtype'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Encoded {count} titles with {settings.EMBEDDING_MODEL_NAME} '
+            f'in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,21 @@
+# recommendox/management/commands/build_item_neighbors.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from recommendox.recommender import DEFAULT_TOP_N, build_item_neighbors
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the item-item similarity index used for personalized recommendations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-n', type=int, default=DEFAULT_TOP_N,
+                            help='Neighbors to keep per content')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = build_item_neighbors(top_n=options['top_n'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {written} neighbor rows in {time.monotonic() - started:.1f}s'
+        ))
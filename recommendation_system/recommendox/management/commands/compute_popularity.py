@@ -0,0 +1,16 @@
+# recommendox/management/commands/compute_popularity.py
+from django.core.management.base import BaseCommand
+
+from recommendox.popularity import VIEW_WEIGHT, compute_popularity
+
+
+class Command(BaseCommand):
+    help = 'Compute Bayesian-weighted popularity scores into Analytics.popularity_score'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view-weight', type=float, default=VIEW_WEIGHT,
+                            help='Share of the score coming from view counts (0-1)')
+
+    def handle(self, *args, **options):
+        count = compute_popularity(view_weight=options['view_weight'])
+        self.stdout.write(self.style.SUCCESS(f'Scored {count} titles'))
@@ -0,0 +1,73 @@
+# recommendox/management/commands/evaluate_recommender.py
+import json
+import sys
+import tempfile
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from recommendox.evaluation import evaluate, generate_synthetic_interactions, time_split, train_models
+
+
+class Command(BaseCommand):
+    help = ('Evaluate recommendation quality (precision/recall/NDCG@k, coverage) and latency '
+            'on a throwaway test database and write the report as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fixture', help='Load interactions from a dumpdata fixture (e.g. data.json)')
+        parser.add_argument('--users', type=int, default=500, help='Synthetic users')
+        parser.add_argument('--contents', type=int, default=1000, help='Synthetic titles')
+        parser.add_argument('--ratings-per-user', type=int, default=30)
+        parser.add_argument('--test-fraction', type=float, default=0.2,
+                            help='Share of the newest ratings held out for testing')
+        parser.add_argument('-k', type=int, default=10, help='Cut-off for the ranking metrics')
+        parser.add_argument('--max-users', type=int, help='Evaluate a random sample of test users')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        # Private model dir and cache, so nothing built from the test data leaks into production
+        isolated = override_settings(
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                'LOCATION': 'evaluate-recommender'}},
+        )
+        with tempfile.TemporaryDirectory() as model_dir, isolated, override_settings(RECOMMENDER_MODEL_DIR=model_dir):
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                started = time.perf_counter()
+                if options['fixture']:
+                    call_command('loaddata', options['fixture'], verbosity=0)
+                else:
+                    generate_synthetic_interactions(
+                        users=options['users'],
+                        contents=options['contents'],
+                        ratings_per_user=options['ratings_per_user'],
+                        seed=options['seed'],
+                    )
+                seed_seconds = time.perf_counter() - started
+
+                relevant = time_split(options['test_fraction'])
+                training = train_models()
+                report = evaluate(relevant, k=options['k'], max_users=options['max_users'], seed=options['seed'])
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report['config'] = {
+            key: options[key] for key in
+            ('fixture', 'users', 'contents', 'ratings_per_user', 'test_fraction', 'k', 'max_users', 'seed')
+        }
+        report['training_seconds'] = {'seed': seed_seconds, **training}
+        report['created_at'] = timezone.now().isoformat()
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            sys.stdout.write(output + '\n')
@@ -0,0 +1,35 @@
+# recommendox/management/commands/precompute_recommendations.py
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from recommendox.precompute import run_precompute
+
+
+class Command(BaseCommand):
+    help = 'Precompute top-N recommendations for all active users and activate the new snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Worker processes (default: all cores)')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Users handed to a worker at a time')
+        parser.add_argument('--limit', type=int, default=12,
+                            help='Recommendations stored per user')
+        parser.add_argument('--keep', type=int, default=2,
+                            help='Snapshots to keep, including the new one')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        snapshot = run_precompute(
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            limit=options['limit'],
+            keep=options['keep'],
+            stdout=self.stdout if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Snapshot {snapshot.id}: {snapshot.user_count} users '
+            f'in {time.monotonic() - started:.1f}s'
+        ))
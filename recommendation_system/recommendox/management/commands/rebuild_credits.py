@@ -0,0 +1,17 @@
+# recommendox/management/commands/rebuild_credits.py
+from django.core.management.base import BaseCommand
+
+from recommendox.credits import rebuild_credits
+
+
+class Command(BaseCommand):
+    help = 'Backfill the Person/Credit index from Content cast, director and description'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--no-prune', action='store_true',
+                            help='Keep people who are no longer credited on any title')
+
+    def handle(self, *args, **options):
+        titles, people = rebuild_credits(batch_size=options['batch_size'], prune=not options['no_prune'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed credits for {titles} titles ({people} people)'))
@@ -0,0 +1,15 @@
+# recommendox/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+
+from recommendox.search import rebuild_search_index, search_backend
+
+
+class Command(BaseCommand):
+    help = 'Re-index every title in the full-text search table'
+
+    def handle(self, *args, **options):
+        if search_backend() is None:
+            self.stdout.write(self.style.WARNING('No full-text index on this database; search uses icontains'))
+            return
+        count = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} titles'))
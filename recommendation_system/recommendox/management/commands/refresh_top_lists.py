@@ -0,0 +1,12 @@
+# recommendox/management/commands/refresh_top_lists.py
+from django.core.management.base import BaseCommand
+
+from recommendox.coldstart import build_top_lists
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the cached per-(genre, language, type) top lists used for cold-start users (schedule it)'
+
+    def handle(self, *args, **options):
+        buckets = build_top_lists()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {buckets} top lists'))
@@ -0,0 +1,19 @@
+# recommendox/management/commands/refresh_trending.py
+from django.core.management.base import BaseCommand
+
+from recommendox.trending import build_trending_lists, rebase, rebase_due
+
+
+class Command(BaseCommand):
+    help = 'Rebase the decayed trending scores when due and publish the trending lists (run every few minutes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebase', action='store_true',
+                            help='Rebase now instead of once the epoch is a day old')
+
+    def handle(self, *args, **options):
+        if options['rebase'] or rebase_due():
+            if not rebase():
+                self.stdout.write('Another run rebased first')
+        count = build_trending_lists()
+        self.stdout.write(self.style.SUCCESS(f'{count} trending titles'))
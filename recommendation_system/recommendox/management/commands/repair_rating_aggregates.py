@@ -0,0 +1,12 @@
+# recommendox/management/commands/repair_rating_aggregates.py
+from django.core.management.base import BaseCommand
+
+from recommendox.aggregates import repair_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized rating count/sum/histogram on every content'
+
+    def handle(self, *args, **options):
+        fixed = repair_rating_aggregates()
+        self.stdout.write(self.style.SUCCESS(f'Repaired rating aggregates on {fixed} titles'))
@@ -0,0 +1,24 @@
+# recommendox/management/commands/rollup_engagement.py
+from django.core.management.base import BaseCommand
+
+from recommendox.engagement import DAILY_RETENTION_DAYS, HOURLY_RETENTION_HOURS, rollup
+
+
+class Command(BaseCommand):
+    help = 'Compact hourly engagement buckets into daily ones and prune old buckets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hourly-retention-hours', type=int, default=HOURLY_RETENTION_HOURS,
+                            help='How long raw hourly buckets are kept (rounded down to whole days)')
+        parser.add_argument('--daily-retention-days', type=int, default=DAILY_RETENTION_DAYS,
+                            help='How long daily buckets are kept')
+
+    def handle(self, *args, **options):
+        summary = rollup(
+            hourly_retention_hours=options['hourly_retention_hours'],
+            daily_retention_days=options['daily_retention_days'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {summary['daily_rows']} daily buckets, pruned {summary['pruned_hourly']} hourly "
+            f"and {summary['pruned_daily']} daily buckets"
+        ))
@@ -0,0 +1,39 @@
+# recommendox/management/commands/train_factors.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from recommendox.factorization import (
+    DEFAULT_ALPHA, DEFAULT_FACTORS, DEFAULT_ITERATIONS, DEFAULT_REGULARIZATION,
+    model_path, train_factors,
+)
+
+
+class Command(BaseCommand):
+    help = 'Train implicit-feedback ALS factors from ratings and watchlists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--factors', type=int, default=DEFAULT_FACTORS)
+        parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS)
+        parser.add_argument('--regularization', type=float, default=DEFAULT_REGULARIZATION)
+        parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA,
+                            help='Confidence scaling for observed interactions')
+        parser.add_argument('--cold', action='store_true',
+                            help='Ignore the previous factors and start from random')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        model = train_factors(
+            factors=options['factors'],
+            iterations=options['iterations'],
+            regularization=options['regularization'],
+            alpha=options['alpha'],
+            warm_start=not options['cold'],
+        )
+        if model is None:
+            self.stdout.write(self.style.WARNING('No interactions to train on.'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Trained {len(model.user_ids)} users x {len(model.item_ids)} items '
+            f'in {time.monotonic() - started:.1f}s -> {model_path()}'
+        ))
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendox', '0006_alter_review_is_approved'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemNeighbor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('content', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='recommendox.content')),
+                ('neighbor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recommendox.content')),
+            ],
+            options={
+                'ordering': ['content', '-score'],
+                'unique_together': {('content', 'neighbor')},
+            },
+        ),
+    ]
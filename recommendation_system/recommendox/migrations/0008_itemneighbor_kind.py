@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendox', '0007_itemneighbor'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='itemneighbor',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='itemneighbor',
+            name='kind',
+            field=models.CharField(choices=[('cf', 'Collaborative (ratings & watchlists)'), ('text', 'Content (TF-IDF over metadata)')], default='cf', max_length=10),
+        ),
+        migrations.AlterUniqueTogether(
+            name='itemneighbor',
+            unique_together={('kind', 'content', 'neighbor')},
+        ),
+    ]
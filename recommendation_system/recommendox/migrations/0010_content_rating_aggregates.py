@@ -0,0 +1,67 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:45
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Content = apps.get_model('recommendox', 'Content')
+    annotations = {f'actual_{stars}': Count('ratings', filter=Q(ratings__rating_value=stars)) for stars in range(1, 6)}
+    fixed = []
+    for content in Content.objects.annotate(**annotations).iterator():
+        counts = {stars: getattr(content, f'actual_{stars}') for stars in range(1, 6)}
+        for stars, count in counts.items():
+            setattr(content, f'rating_{stars}', count)
+        content.rating_count = sum(counts.values())
+        content.rating_sum = sum(stars * count for stars, count in counts.items())
+        fixed.append(content)
+    Content.objects.bulk_update(
+        fixed, ['rating_count', 'rating_sum', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5'],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendox', '0009_recommendation_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='content',
+            name='rating_1',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='content',
+            name='rating_2',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='content',
+            name='rating_3',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='content',
+            name='rating_4',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='content',
+            name='rating_5',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='content',
+            name='rating_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='content',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
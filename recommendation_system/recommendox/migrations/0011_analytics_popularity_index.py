@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendox', '0010_content_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='analytics',
+            name='popularity_score',
+            field=models.FloatField(db_index=True, default=0.0),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendox', '0012_engagementbucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingEpoch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(default='current', max_length=20, unique=True)),
+                ('started_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='analytics',
+            name='trending_score',
+            field=models.FloatField(db_index=True, default=0.0),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:31
+
+from django.db import migrations, transaction, DatabaseError
+
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE recommendox_content_fts USING fts5("
+    "title, people, description, tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO recommendox_content_fts (rowid, title, people, description) "
+    "SELECT id, title, coalesce(director, '') || ' ' || coalesce(\"cast\", ''), description "
+    "FROM recommendox_content",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE TABLE recommendox_content_search ("
+    "content_id bigint PRIMARY KEY REFERENCES recommendox_content (id) ON DELETE CASCADE, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX recommendox_content_search_document ON recommendox_content_search USING GIN (document)",
+    "INSERT INTO recommendox_content_search (content_id, document) "
+    "SELECT id, "
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(director, '') || ' ' || coalesce(\"cast\", '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'C') "
+    "FROM recommendox_content",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}.get(vendor)
+    if statements is None:
+        # Other databases keep using icontains search
+        return
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            for statement in statements:
+                schema_editor.execute(statement)
+    except DatabaseError:
+        if vendor != 'sqlite':
+            raise
+        # SQLite compiled without FTS5: search falls back to icontains
+
+
+def drop_search_index(apps, schema_editor):
+    table = {
+        'sqlite': 'recommendox_content_fts',
+        'postgresql': 'recommendox_content_search',
+    }.get(schema_editor.connection.vendor)
+    if table:
+        schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendox', '0013_trending'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendox', '0014_content_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Person',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('normalized_name', models.CharField(max_length=200, unique=True)),
+                ('golden_user', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='person', to='recommendox.goldenuser')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Credit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('cast', 'Cast'), ('director', 'Director'), ('producer', 'Producer'), ('writer', 'Writer')], max_length=10)),
+                ('content', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='credits', to='recommendox.content')),
+                ('person', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='credits', to='recommendox.person')),
+            ],
+            options={
+                'unique_together': {('person', 'role', 'content')},
+            },
+        ),
+    ]
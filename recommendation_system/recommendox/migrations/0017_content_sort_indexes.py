@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:46
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_popularity(apps, schema_editor):
+    Content = apps.get_model('recommendox', 'Content')
+    Analytics = apps.get_model('recommendox', 'Analytics')
+    scores = Analytics.objects.filter(content_id=OuterRef('id')).values('popularity_score')[:1]
+    Content.objects.filter(content_analytics__isnull=False).update(popularity=Subquery(scores))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendox', '0015_person_credit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='content',
+            name='popularity',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(copy_popularity, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['release_date', 'id'], name='recommendox_release_53516c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['title', 'id'], name='recommendox_title_1f87e3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['popularity', 'id'], name='recommendox_popular_24c88f_idx'),
+        ),
+    ]
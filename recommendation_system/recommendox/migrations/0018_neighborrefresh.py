@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 21:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendox', '0017_content_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NeighborRefresh',
+            fields=[
+                ('content', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='recommendox.content')),
+                ('marked_at', models.DateTimeField()),
+            ],
+        ),
+    ]
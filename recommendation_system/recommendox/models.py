@@ -49,13 +49,37 @@ class Content(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     views_count = models.IntegerField(default=0, help_text="Number of times content details viewed")
     
+    # Denormalized rating aggregates, maintained by signals on Rating
+    rating_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_1 = models.IntegerField(default=0)
+    rating_2 = models.IntegerField(default=0)
+    rating_3 = models.IntegerField(default=0)
+    rating_4 = models.IntegerField(default=0)
+    rating_5 = models.IntegerField(default=0)
+    # Copy of Analytics.popularity_score written by compute_popularity, so the
+    # "rating" sort seeks on an index instead of a join
+    popularity = models.FloatField(default=0.0)
+    
+    class Meta:
+        # One per browse sort: keyset pagination seeks on (sort column, id)
+        indexes = [
+            models.Index(fields=['release_date', 'id']),
+            models.Index(fields=['title', 'id']),
+            models.Index(fields=['popularity', 'id']),
+        ]
+    
     @property
     def avg_rating(self):
-        ratings = self.ratings.all()
-        if ratings:
-            return sum([r.rating_value for r in ratings]) / len(ratings)
+        if self.rating_count:
+            return self.rating_sum / self.rating_count
         return 0
     
+    @property
+    def rating_histogram(self):
+        """[(stars, count), ...] from 1 to 5"""
+        return [(stars, getattr(self, f'rating_{stars}')) for stars in range(1, 6)]
+    
     def __str__(self):
         return f"{self.title} ({self.release_date.year})"
     
@@ -191,13 +215,14 @@ class GoldenUser(models.Model):
             return '<span class="badge bg-success"><i class="fas fa-check-circle"></i> Verified Professional</span>'
         return '<span class="badge bg-warning"><i class="fas fa-clock"></i> Pending Verification</span>'
     
+    # Counter bumps are UPDATEs: a save() would fire the role invalidation signal on every page view
     def increment_content_views(self):
+        GoldenUser.objects.filter(id=self.id).update(total_content_views=models.F('total_content_views') + 1)
         self.total_content_views += 1
-        self.save()
     
     def increment_reviews_given(self):
+        GoldenUser.objects.filter(id=self.id).update(total_reviews_given=models.F('total_reviews_given') + 1)
         self.total_reviews_given += 1
-        self.save()
     
     class Meta:
         permissions = [
@@ -230,6 +255,13 @@ class Rating(models.Model):
         unique_together = ['user', 'content']
         ordering = ['-rating_date']  
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored value so a change can be applied to the aggregates
+        instance._stored_rating_value = instance.__dict__.get('rating_value')
+        return instance
+    
     def __str__(self):
         return f"{self.user.username} rated {self.content.title}: {self.rating_value}/5"
 
@@ -272,7 +304,9 @@ class Reviewer(models.Model):
 class Analytics(models.Model):
     content = models.OneToOneField(Content, on_delete=models.CASCADE, related_name='content_analytics')
     total_views = models.IntegerField(default=0)
-    popularity_score = models.FloatField(default=0.0)
+    popularity_score = models.FloatField(default=0.0, db_index=True)
+    # Decayed engagement, stored relative to the current TrendingEpoch (see trending.py)
+    trending_score = models.FloatField(default=0.0, db_index=True)
     last_updated = models.DateTimeField(auto_now=True)
     
     def __str__(self):
@@ -283,6 +317,17 @@ class Analytics(models.Model):
         self.save()
 
 
+class TrendingEpoch(models.Model):
+    """Reference time that Analytics.trending_score values are scaled against; a single row"""
+    CURRENT = 'current'
+
+    name = models.CharField(max_length=20, unique=True, default=CURRENT)
+    started_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"Trending epoch {self.started_at:%Y-%m-%d %H:%M}"
+
+
 class ContentOTT(models.Model):
     """Simple OTT availability for content"""
     OTT_CHOICES = [
@@ -342,4 +387,117 @@ class ContentCreator(models.Model):
     class Meta:
         permissions = [
             ("can_manage_content", "Can add, edit, delete content"),
-        ]
\ No newline at end of file
+        ]
+
+class ItemNeighbor(models.Model):
+    """Precomputed item-item similarity - top-N neighbors per content"""
+    KIND_CHOICES = [
+        ('cf', 'Collaborative (ratings & watchlists)'),
+        ('text', 'Content (TF-IDF over metadata)'),
+    ]
+    
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='cf')
+    content = models.ForeignKey(Content, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(Content, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    
+    class Meta:
+        unique_together = ['kind', 'content', 'neighbor']
+        ordering = ['content', '-score']
+    
+    def __str__(self):
+        return f"[{self.kind}] {self.content_id} -> {self.neighbor_id} ({self.score:.3f})"
+
+
+class NeighborRefresh(models.Model):
+    """A content whose 'text' neighbors are out of date, until the next refresh batch"""
+    content = models.OneToOneField(Content, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    marked_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Refresh neighbors of {self.content_id}"
+
+
+class RecommendationSnapshot(models.Model):
+    """One batch run of precomputed recommendations; only one is active at a time"""
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    is_active = models.BooleanField(default=False, db_index=True)
+    user_count = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Snapshot {self.id} ({'active' if self.is_active else 'inactive'})"
+
+
+class UserRecommendation(models.Model):
+    snapshot = models.ForeignKey(RecommendationSnapshot, on_delete=models.CASCADE, related_name='recommendations')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='precomputed_recommendations')
+    content = models.ForeignKey(Content, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        unique_together = ['snapshot', 'user', 'rank']
+        ordering = ['snapshot', 'user', 'rank']
+    
+    def __str__(self):
+        return f"#{self.rank} for {self.user_id}: {self.content_id}"
+
+
+class EngagementBucket(models.Model):
+    """Per-content event counts aggregated into hourly or daily time buckets"""
+    EVENT_CHOICES = [
+        ('view', 'Views'),
+        ('rating', 'Ratings'),
+        ('review', 'Reviews'),
+        ('watchlist', 'Watchlist adds'),
+    ]
+    
+    GRANULARITY_CHOICES = [
+        ('hour', 'Hourly'),
+        ('day', 'Daily'),
+    ]
+    
+    content = models.ForeignKey(Content, on_delete=models.CASCADE, related_name='engagement_buckets')
+    event = models.CharField(max_length=10, choices=EVENT_CHOICES)
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['content', 'granularity', 'bucket_start', 'event']
+        indexes = [models.Index(fields=['granularity', 'bucket_start'])]
+    
+    def __str__(self):
+        return f"{self.content_id} {self.event} {self.granularity} {self.bucket_start:%Y-%m-%d %H:00}: {self.count}"
+
+
+class Person(models.Model):
+    """A cast member or crew name extracted from Content (see credits.py)"""
+    name = models.CharField(max_length=200)
+    normalized_name = models.CharField(max_length=200, unique=True)
+    golden_user = models.OneToOneField(GoldenUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='person')
+    
+    def __str__(self):
+        return self.name
+
+
+class Credit(models.Model):
+    ROLE_CHOICES = [
+        ('cast', 'Cast'),
+        ('director', 'Director'),
+        ('producer', 'Producer'),
+        ('writer', 'Writer'),
+    ]
+    
+    person = models.ForeignKey(Person, on_delete=models.CASCADE, related_name='credits')
+    content = models.ForeignKey(Content, on_delete=models.CASCADE, related_name='credits')
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    
+    class Meta:
+        unique_together = ['person', 'role', 'content']
+    
+    def __str__(self):
+        return f"{self.person.name} ({self.role}) in {self.content.title}"
@@ -0,0 +1,186 @@
+# recommendox/pagination.py
+"""
+Keyset (seek) pagination.
+
+Pages are addressed by an opaque, signed cursor holding the sort key values
+of the first or last row on the neighbouring page instead of an OFFSET, so
+page 5000 costs the same as page 1: `WHERE (release_date, id) < (...)
+ORDER BY release_date DESC, id DESC LIMIT n + 1`. The sort always ends in id
+to make the key unique.
+
+Each sort needs a (sort column, id) index on the table (see Content.Meta)
+for the seek to be a range scan.
+
+The total shown next to the pager is passed in by callers that already know
+it (the browse views read it off the cached facet counts); otherwise it
+comes from a COUNT cached per filter set for COUNT_CACHE_TTL seconds, so it
+is approximate by design.
+
+Ranked search results have no sort key to seek on; offset_paginate pages
+them with a LIMIT/OFFSET in the ranking query instead.
+
+page_cursor translates the ?page=N links of the old OFFSET pager into a
+cursor, with a single OFFSET query, so those links keep working.
+"""
+import hashlib
+import math
+
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Q
+
+PER_PAGE = 12
+COUNT_CACHE_TTL = 60 * 5
+CURSOR_SALT = 'recommendox.pagination'
+
+
+class KeysetPage:
+    """One page of results; iterable like a Paginator page"""
+
+    def __init__(self, object_list, number, total, per_page, next_cursor=None, previous_cursor=None,
+                 last_cursor=None):
+        self.object_list = object_list
+        self.number = number
+        self.total = total
+        self.num_pages = max(math.ceil(total / per_page), 1)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.last_cursor = last_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def encode_cursor(sort, direction, values, number):
+    return signing.dumps({'s': sort, 'd': direction, 'v': values, 'n': number}, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token, sort):
+    """(direction, values, page number), or None for a missing, forged or foreign cursor"""
+    if not token:
+        return None
+    try:
+        data = signing.loads(token, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        return None
+    if data.get('s') != sort:
+        return None
+    return data['d'], data['v'], data['n']
+
+
+def cached_count(queryset):
+    """COUNT(*) of a queryset, cached by its SQL"""
+    sql, params = queryset.query.sql_with_params()
+    key = 'count:' + hashlib.md5(f'{sql}|{params}'.encode()).hexdigest()
+    return cache.get_or_set(key, queryset.count, COUNT_CACHE_TTL)
+
+
+def _seek(keys, values, forward):
+    """Q for rows strictly after (forward) or before the given key values"""
+    condition = Q()
+    for position in range(len(keys) - 1, -1, -1):
+        field, descending = keys[position]
+        lookup = 'lt' if descending == forward else 'gt'
+        step = Q(**{f'{field}__{lookup}': values[position]})
+        if position < len(keys) - 1:
+            step |= Q(**{field: values[position]}) & condition
+        condition = step
+    return condition
+
+
+def _order(keys, reverse=False):
+    return [f'{"-" if descending != reverse else ""}{field}' for field, descending in keys]
+
+
+def _key_values(obj, keys):
+    values = []
+    for field, _ in keys:
+        value = getattr(obj, field)
+        values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+    return values
+
+
+def page_cursor(queryset, keys, sort, number, per_page=PER_PAGE):
+    """Cursor to page `number` of an old ?page= link, or None for the first page or one past the end"""
+    if number <= 1:
+        return None
+    offset = (number - 1) * per_page - 1
+    rows = list(queryset.order_by(*_order(keys))[offset:offset + 1])
+    if not rows:
+        return None
+    return encode_cursor(sort, 'next', _key_values(rows[0], keys), number)
+
+
+def keyset_paginate(queryset, keys, sort, cursor=None, per_page=PER_PAGE, total=None):
+    """
+    Page through `queryset` ordered by `keys`, a list of (field, descending)
+    ending in a unique field. `sort` names the ordering so cursors from
+    another ordering are ignored. `total` skips the cached COUNT when the
+    caller already knows how many rows match.
+    """
+    if total is None:
+        total = cached_count(queryset)
+    decoded = decode_cursor(cursor, sort)
+    direction, values, number = decoded if decoded else ('first', None, 1)
+
+    if direction == 'next':
+        rows = list(queryset.filter(_seek(keys, values, forward=True)).order_by(*_order(keys))[:per_page + 1])
+        more_before, more_after = True, len(rows) > per_page
+        rows = rows[:per_page]
+    elif direction == 'prev':
+        rows = list(queryset.filter(_seek(keys, values, forward=False)).order_by(*_order(keys, reverse=True))[:per_page + 1])
+        more_before, more_after = len(rows) > per_page, True
+        rows = rows[:per_page][::-1]
+    elif direction == 'last':
+        remainder = total % per_page or per_page
+        rows = list(queryset.order_by(*_order(keys, reverse=True))[:remainder])[::-1]
+        more_before, more_after = total > len(rows), False
+    else:
+        rows = list(queryset.order_by(*_order(keys))[:per_page + 1])
+        more_before, more_after = False, len(rows) > per_page
+        rows = rows[:per_page]
+        number = 1
+
+    if not rows:
+        return KeysetPage([], number, total, per_page)
+    # Page numbers come from the cached count, so they are only a hint
+    number = max(min(number, math.ceil(total / per_page)), 1) if more_before else 1
+    return KeysetPage(
+        rows, number, total, per_page,
+        next_cursor=encode_cursor(sort, 'next', _key_values(rows[-1], keys), number + 1) if more_after else None,
+        previous_cursor=encode_cursor(sort, 'prev', _key_values(rows[0], keys), number - 1) if more_before else None,
+        last_cursor=encode_cursor(sort, 'last', None, math.ceil(total / per_page)) if more_after else None,
+    )
+
+
+def offset_paginate(fetch, total, sort, cursor=None, per_page=PER_PAGE):
+    """
+    Same interface over rows that can only be addressed by position, such as
+    ranked search results: fetch(offset, limit) loads one page of them, with
+    the LIMIT and OFFSET in its query. `total` is the caller's count.
+    """
+    decoded = decode_cursor(cursor, sort)
+    last_start = (max(total - 1, 0) // per_page) * per_page
+    start = min(max(decoded[1] if decoded else 0, 0), last_start)
+    rows = list(fetch(start, per_page + 1))
+    more_after = len(rows) > per_page
+    rows = rows[:per_page]
+    number = start // per_page + 1
+    return KeysetPage(
+        rows, number, max(total, start + len(rows)), per_page,
+        next_cursor=encode_cursor(sort, 'next', start + per_page, number + 1) if more_after else None,
+        previous_cursor=encode_cursor(sort, 'prev', max(start - per_page, 0), number - 1) if start > 0 else None,
+        last_cursor=encode_cursor(sort, 'last', last_start, last_start // per_page + 1) if more_after else None,
+    )
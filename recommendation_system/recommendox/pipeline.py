@@ -0,0 +1,274 @@
+# recommendox/pipeline.py
+"""
+Multi-stage recommendation pipeline.
+
+1. generate - every CandidateGenerator proposes (content_id, score) pairs
+2. merge    - candidates are deduplicated into one feature row per content,
+              one column per generator (scores normalized to 0..1)
+3. score    - a single matrix-vector product blends the columns with the
+              generator weights
+4. top-K    - argpartition picks the best `limit`, then one query loads them
+
+Every stage is timed. Generators have their own latency budget and the whole
+generation stage has a total budget: once it is spent and there are enough
+candidates, the remaining (lower priority) generators are skipped. A
+generator that overruns its own budget SLOW_RUNS_TO_BENCH times in a row is
+benched: this process skips it for BENCH_SECONDS, then gives it one more
+run. Per-generator timings are kept for generator_stats().
+"""
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Content, Rating, UserProfile
+from .recommender import get_user_history, score_items_for_user
+from .factorization import load_model
+from .aggregates import average_rating_expression
+from .coldstart import bucket_key, cold_start_recommendations, get_top_lists
+
+logger = logging.getLogger(__name__)
+
+GENERATION_BUDGET_MS = 150
+CANDIDATES_PER_GENERATOR = 50
+RECENT_HALF_LIFE_DAYS = 30
+SLOW_RUNS_TO_BENCH = 3
+BENCH_SECONDS = 60
+
+
+class UserContext:
+    """What the generators know about the user being recommended for"""
+
+    def __init__(self, user, limit):
+        self.user = user
+        self.limit = limit
+        self.ratings, self.saved = get_user_history(user)
+        self.exclude_ids = set(self.ratings) | self.saved
+        self._preferences = None
+
+    @property
+    def preferences(self):
+        """(favorite_genres, preferred_languages) from the user's profile"""
+        if self._preferences is None:
+            self._preferences = UserProfile.objects.filter(user=self.user).values_list(
+                'favorite_genres', 'preferred_languages'
+            ).first() or (None, None)
+        return self._preferences
+
+
+class CandidateGenerator:
+    def __init__(self, name, func, weight, budget_ms):
+        self.name = name
+        self.func = func
+        self.weight = weight
+        self.budget_ms = budget_ms
+
+    def __repr__(self):
+        return f'<CandidateGenerator {self.name}>'
+
+
+def factorization_candidates(ctx):
+    model = load_model()
+    if model is None:
+        return []
+    return model.recommend(
+        ctx.user.id, limit=CANDIDATES_PER_GENERATOR, exclude_ids=ctx.exclude_ids,
+        ratings=ctx.ratings, saved=ctx.saved,
+    )
+
+
+def neighbor_candidates(ctx):
+    return score_items_for_user(
+        ctx.ratings, ctx.saved, limit=CANDIDATES_PER_GENERATOR, exclude_ids=ctx.exclude_ids
+    )
+
+
+def genre_affinity_candidates(ctx):
+    liked = [content_id for content_id, value in ctx.ratings.items() if value >= 4]
+    if not liked:
+        return []
+    genre_counter = Counter()
+    for genre, value in Rating.objects.filter(
+        user=ctx.user, content_id__in=liked
+    ).values_list('content__genre', 'rating_value'):
+        genre_counter[genre] += value
+    total = sum(genre_counter.values())
+    affinity = {genre: count / total for genre, count in genre_counter.most_common(3)}
+
+    rows = Content.objects.filter(
+        genre__in=list(affinity)
+    ).exclude(
+        id__in=ctx.exclude_ids
+    ).annotate(
+        rating_avg=average_rating_expression()
+    ).order_by(F('rating_avg').desc(nulls_last=True)).values_list(
+        'id', 'genre', 'rating_avg'
+    )[:CANDIDATES_PER_GENERATOR]
+    return [(cid, affinity[genre] * ((rating_avg or 0) / 5)) for cid, genre, rating_avg in rows]
+
+
+def popular_candidates(ctx):
+    return [
+        (cid, score) for cid, score in get_top_lists([bucket_key()])[bucket_key()]
+        if cid not in ctx.exclude_ids
+    ]
+
+
+def cold_start_candidates(ctx):
+    if ctx.ratings:
+        return []
+    favorite_genres, preferred_languages = ctx.preferences
+    return cold_start_recommendations(
+        favorite_genres, preferred_languages,
+        limit=CANDIDATES_PER_GENERATOR, exclude_ids=ctx.exclude_ids,
+    )
+
+
+def recent_candidates(ctx):
+    now = timezone.now()
+    rows = Content.objects.exclude(
+        id__in=ctx.exclude_ids
+    ).order_by('-created_at').values_list('id', 'created_at')[:CANDIDATES_PER_GENERATOR]
+    return [
+        (cid, 0.5 ** ((now - created_at).total_seconds() / 86400 / RECENT_HALF_LIFE_DAYS))
+        for cid, created_at in rows
+    ]
+
+
+# Ordered by priority: the budget cut-off skips from the end of the list
+GENERATORS = [
+    CandidateGenerator('factorization', factorization_candidates, weight=1.0, budget_ms=20),
+    CandidateGenerator('neighbors', neighbor_candidates, weight=1.0, budget_ms=30),
+    CandidateGenerator('cold_start', cold_start_candidates, weight=0.8, budget_ms=10),
+    CandidateGenerator('genre', genre_affinity_candidates, weight=0.6, budget_ms=40),
+    CandidateGenerator('popular', popular_candidates, weight=0.3, budget_ms=40),
+    CandidateGenerator('recent', recent_candidates, weight=0.2, budget_ms=20),
+]
+
+
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: {'runs': 0, 'slow': 0, 'total_ms': 0.0, 'slow_streak': 0, 'benched_until': 0.0})
+
+
+def _benched(generator):
+    with _stats_lock:
+        return _stats[generator.name]['benched_until'] > time.monotonic()
+
+
+def _record(generator, took):
+    with _stats_lock:
+        stats = _stats[generator.name]
+        stats['runs'] += 1
+        stats['total_ms'] += took
+        if took <= generator.budget_ms:
+            stats['slow_streak'] = 0
+            return
+        stats['slow'] += 1
+        stats['slow_streak'] += 1
+        if stats['slow_streak'] >= SLOW_RUNS_TO_BENCH:
+            stats['slow_streak'] = 0
+            stats['benched_until'] = time.monotonic() + BENCH_SECONDS
+            logger.warning('Benching candidate generator %s for %ds: %d runs in a row over its %dms budget',
+                           generator.name, BENCH_SECONDS, SLOW_RUNS_TO_BENCH, generator.budget_ms)
+    logger.debug('Candidate generator %s took %.1fms (budget %dms)', generator.name, took, generator.budget_ms)
+
+
+def generator_stats():
+    """{name: runs, over-budget runs, mean ms, benched} for this process"""
+    now = time.monotonic()
+    with _stats_lock:
+        return {
+            name: {
+                'runs': stats['runs'],
+                'slow': stats['slow'],
+                'mean_ms': stats['total_ms'] / stats['runs'] if stats['runs'] else 0.0,
+                'benched': stats['benched_until'] > now,
+            }
+            for name, stats in sorted(_stats.items())
+        }
+
+
+class PipelineResult:
+    def __init__(self, content, scores, timings, skipped):
+        self.content = content
+        self.scores = scores
+        self.timings = timings
+        self.skipped = skipped
+
+
+def _elapsed_ms(started):
+    return (time.perf_counter() - started) * 1000
+
+
+def run_pipeline(user, limit=6, generators=None):
+    """Run all stages for a user and return a PipelineResult"""
+    generators = GENERATORS if generators is None else generators
+    timings = {}
+    skipped = []
+
+    started = time.perf_counter()
+    ctx = UserContext(user, limit)
+    timings['context'] = _elapsed_ms(started)
+
+    # Generate
+    generated = []
+    stage_started = time.perf_counter()
+    for generator in generators:
+        candidate_count = sum(len(items) for _, items in generated)
+        if (_elapsed_ms(stage_started) > GENERATION_BUDGET_MS and candidate_count >= limit) or _benched(generator):
+            skipped.append(generator.name)
+            continue
+        gen_started = time.perf_counter()
+        items = generator.func(ctx)
+        took = _elapsed_ms(gen_started)
+        timings[f'generate.{generator.name}'] = took
+        _record(generator, took)
+        generated.append((generator, items))
+    timings['generate'] = _elapsed_ms(stage_started)
+
+    # Merge / dedup: one row per content, one column per generator
+    stage_started = time.perf_counter()
+    rows = {}
+    features = np.zeros((sum(len(items) for _, items in generated), len(generated)))
+    for column, (generator, items) in enumerate(generated):
+        if not items:
+            continue
+        top = max(score for _, score in items)
+        for content_id, score in items:
+            if content_id in ctx.exclude_ids:
+                continue
+            row = rows.setdefault(content_id, len(rows))
+            features[row, column] = max(features[row, column], score / top if top > 0 else 0.0)
+    features = features[:len(rows)]
+    timings['merge'] = _elapsed_ms(stage_started)
+
+    # Score
+    stage_started = time.perf_counter()
+    weights = np.array([generator.weight for generator, _ in generated])
+    scores = features @ weights if len(rows) else np.zeros(0)
+    timings['score'] = _elapsed_ms(stage_started)
+
+    # Top-K
+    stage_started = time.perf_counter()
+    content_ids = np.fromiter(rows, dtype=np.int64, count=len(rows))
+    keep = min(limit, len(content_ids))
+    if keep:
+        top = np.argpartition(-scores, keep - 1)[:keep]
+        top = top[np.argsort(-scores[top], kind='stable')]
+    else:
+        top = np.zeros(0, dtype=np.int64)
+    chosen = [int(content_ids[i]) for i in top]
+    by_id = Content.objects.in_bulk(chosen)
+    content = [by_id[cid] for cid in chosen if cid in by_id]
+    timings['top_k'] = _elapsed_ms(stage_started)
+    timings['total'] = _elapsed_ms(started)
+
+    return PipelineResult(content, [float(scores[i]) for i in top], timings, skipped)
+
+
+def recommend(user, limit=6):
+    return run_pipeline(user, limit=limit).content
@@ -0,0 +1,130 @@
+# recommendox/precompute.py
+"""
+Offline batch of recommendations for every active user.
+
+run_precompute fans the users out over a process pool, writes the results to
+UserRecommendation in chunks under a new RecommendationSnapshot and only
+flips that snapshot to active once every row is in, so the dashboard never
+reads a half-written batch. Cleanup only deletes completed snapshots, so a
+run never removes the one another run is still filling; incomplete ones are
+deleted once they are older than ABANDONED_AFTER (their run died).
+"""
+import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.contrib.auth.models import User
+
+from .models import RecommendationSnapshot, UserRecommendation
+from .caching import last_activity
+
+SNAPSHOT_CACHE_KEY = 'recs:snapshot'
+SNAPSHOT_CACHE_TTL = 60 * 5
+ABANDONED_AFTER = datetime.timedelta(days=1)
+
+
+def _init_worker():
+    # Forked workers inherit the configured app registry, but must not reuse the parent's database connection
+    connections.close_all()
+
+
+def _compute_chunk(user_ids, limit):
+    from .views import get_personalized_recommendations
+
+    results = []
+    for user_id in user_ids:
+        recommendations = get_personalized_recommendations(User(id=user_id), limit=limit)
+        results.append((user_id, [content.id for content in recommendations]))
+    return results
+
+
+def active_user_ids():
+    """Users worth precomputing: active accounts with at least one signal"""
+    return list(
+        User.objects.filter(is_active=True)
+        .filter(Q(ratings__isnull=False) | Q(watchlists__isnull=False))
+        .distinct()
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+
+
+def run_precompute(workers=None, chunk_size=500, limit=12, keep=2, batch_size=5000, stdout=None):
+    """Build and activate a new snapshot. Returns the snapshot"""
+    user_ids = active_user_ids()
+    snapshot = RecommendationSnapshot.objects.create()
+    chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+
+    pending = []
+    done = 0
+    connections.close_all()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('fork'),
+        initializer=_init_worker,
+    ) as executor:
+        futures = [executor.submit(_compute_chunk, chunk, limit) for chunk in chunks]
+        for future in as_completed(futures):
+            for user_id, content_ids in future.result():
+                pending.extend(
+                    UserRecommendation(snapshot=snapshot, user_id=user_id, content_id=content_id, rank=rank)
+                    for rank, content_id in enumerate(content_ids)
+                )
+                done += 1
+            if len(pending) >= batch_size:
+                UserRecommendation.objects.bulk_create(pending, batch_size=batch_size)
+                pending = []
+            if stdout:
+                stdout.write(f'{done}/{len(user_ids)} users')
+    if pending:
+        UserRecommendation.objects.bulk_create(pending, batch_size=batch_size)
+
+    with transaction.atomic():
+        RecommendationSnapshot.objects.filter(is_active=True).update(is_active=False)
+        snapshot.is_active = True
+        snapshot.completed_at = timezone.now()
+        snapshot.user_count = len(user_ids)
+        snapshot.save()
+    cache.delete(SNAPSHOT_CACHE_KEY)
+
+    delete_stale_snapshots(keep)
+    return snapshot
+
+
+def delete_stale_snapshots(keep=2):
+    """Keep the newest `keep` completed snapshots (the active one included) and any run still in progress"""
+    completed = RecommendationSnapshot.objects.filter(is_active=False, completed_at__isnull=False)
+    stale = [s.id for s in completed.order_by('-completed_at')[max(keep - 1, 0):]]
+    abandoned = RecommendationSnapshot.objects.filter(
+        completed_at__isnull=True, created_at__lt=timezone.now() - ABANDONED_AFTER,
+    ).values_list('id', flat=True)
+    RecommendationSnapshot.objects.filter(id__in=[*stale, *abandoned]).delete()
+
+
+def _active_snapshot():
+    """(snapshot id, created_at timestamp) of the active snapshot, or None"""
+    def load():
+        active = RecommendationSnapshot.objects.filter(is_active=True).values_list('id', 'created_at').first()
+        return (active[0], active[1].timestamp()) if active else ()
+
+    return cache.get_or_set(SNAPSHOT_CACHE_KEY, load, SNAPSHOT_CACHE_TTL) or None
+
+
+def get_precomputed_recommendations(user, limit=6):
+    """Content from the active snapshot, or None when the user must use the live path"""
+    snapshot = _active_snapshot()
+    if snapshot is None:
+        return None
+    snapshot_id, created_at = snapshot
+    activity = last_activity(user.id)
+    if activity is not None and activity > created_at:
+        return None
+    rows = UserRecommendation.objects.filter(
+        snapshot_id=snapshot_id, user=user
+    ).select_related('content').order_by('rank')[:limit]
+    recommendations = [row.content for row in rows]
+    return recommendations or None
@@ -0,0 +1,157 @@
+# recommendox/recommender.py
+"""
+Item-item collaborative filtering.
+
+The offline half (build_item_neighbors) turns Rating and Watchlist rows into a
+sparse user x item matrix, computes adjusted-cosine similarity between items
+and stores the top-N neighbors of every content in ItemNeighbor.
+
+The online half (score_items_for_user) only reads the neighbor lists of the
+items a user has interacted with, so its cost depends on the size of the
+user's history and not on the size of the catalog.
+"""
+import heapq
+from collections import defaultdict
+
+import numpy as np
+from scipy import sparse
+from django.db import transaction
+
+from .models import Rating, Watchlist, ItemNeighbor
+
+DEFAULT_TOP_N = 50         # neighbors stored per content
+MIN_SUPPORT = 3            # co-interactions needed before a similarity is fully trusted
+WATCHLIST_WEIGHT = 0.5     # implicit signal for titles saved but not rated
+RATING_PIVOT = 3           # a 3-star rating is neutral, below pushes neighbors down
+SHRINKAGE = 1.0            # damps candidates backed by only one or two neighbors
+BLOCK_CELLS = 2_000_000    # dense similarity cells held in memory at once
+
+
+def _interaction_matrix():
+    """Build the centered user x item matrix. Returns (matrix, item_ids)"""
+    ratings = list(Rating.objects.values_list('user_id', 'content_id', 'rating_value'))
+    saved = list(Watchlist.objects.values_list('user_id', 'content_id'))
+
+    rated_pairs = {(u, c) for u, c, _ in ratings}
+    saved = [(u, c) for u, c in saved if (u, c) not in rated_pairs]
+    if not ratings and not saved:
+        return None, np.array([], dtype=np.int64)
+
+    users = np.array([u for u, _, _ in ratings] + [u for u, _ in saved], dtype=np.int64)
+    items = np.array([c for _, c, _ in ratings] + [c for _, c in saved], dtype=np.int64)
+    values = np.array([v for _, _, v in ratings], dtype=np.float64)
+
+    user_ids, user_idx = np.unique(users, return_inverse=True)
+    item_ids, item_idx = np.unique(items, return_inverse=True)
+
+    # Adjusted cosine: remove each user's rating bias before comparing items
+    n_rated = len(ratings)
+    if n_rated:
+        rated_users = user_idx[:n_rated]
+        sums = np.bincount(rated_users, weights=values, minlength=len(user_ids))
+        counts = np.bincount(rated_users, minlength=len(user_ids))
+        means = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+        values = values - means[rated_users]
+    values = np.concatenate([values, np.full(len(saved), WATCHLIST_WEIGHT)])
+
+    matrix = sparse.csr_matrix(
+        (values, (user_idx, item_idx)), shape=(len(user_ids), len(item_ids))
+    )
+    return matrix, item_ids
+
+
+def compute_item_neighbors(top_n=DEFAULT_TOP_N):
+    """Yield (content_id, [(neighbor_id, score), ...]) for every interacted item"""
+    matrix, item_ids = _interaction_matrix()
+    if matrix is None:
+        return
+
+    n_items = len(item_ids)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0))).ravel()
+    inv_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    normalized = (matrix @ sparse.diags(inv_norms)).tocsc()
+    binary = (matrix != 0).astype(np.float64).tocsc()
+
+    block = max(1, BLOCK_CELLS // n_items)
+    keep = min(top_n, n_items - 1)
+    if keep <= 0:
+        return
+
+    for start in range(0, n_items, block):
+        stop = min(start + block, n_items)
+        sims = (normalized[:, start:stop].T @ normalized).toarray()
+        support = (binary[:, start:stop].T @ binary).toarray()
+        sims *= np.minimum(support, MIN_SUPPORT) / MIN_SUPPORT
+        sims[np.arange(stop - start), np.arange(start, stop)] = 0.0
+
+        top = np.argpartition(-sims, keep - 1, axis=1)[:, :keep]
+        for row, candidates in enumerate(top):
+            scores = sims[row, candidates]
+            order = np.argsort(-scores)
+            neighbors = [
+                (int(item_ids[candidates[i]]), float(scores[i]))
+                for i in order if scores[i] > 0
+            ]
+            if neighbors:
+                yield int(item_ids[start + row]), neighbors
+
+
+def build_item_neighbors(top_n=DEFAULT_TOP_N, batch_size=1000):
+    """Rebuild the ItemNeighbor table. Returns the number of rows written"""
+    written = 0
+    with transaction.atomic():
+        ItemNeighbor.objects.filter(kind='cf').delete()
+        pending = []
+        for content_id, neighbors in compute_item_neighbors(top_n):
+            pending.extend(
+                ItemNeighbor(kind='cf', content_id=content_id, neighbor_id=neighbor_id, score=score)
+                for neighbor_id, score in neighbors
+            )
+            if len(pending) >= batch_size:
+                ItemNeighbor.objects.bulk_create(pending, batch_size=batch_size)
+                written += len(pending)
+                pending = []
+        if pending:
+            ItemNeighbor.objects.bulk_create(pending, batch_size=batch_size)
+            written += len(pending)
+    return written
+
+
+def get_user_history(user):
+    """Return ({content_id: rating_value}, {saved content_ids}) for a user"""
+    ratings = dict(Rating.objects.filter(user=user).values_list('content_id', 'rating_value'))
+    saved = set(Watchlist.objects.filter(user=user).values_list('content_id', flat=True))
+    return ratings, saved
+
+
+def score_items_for_user(ratings, saved, limit=10, exclude_ids=()):
+    """Rank unseen content from the neighbor lists of the user's items.
+
+    Returns a list of (content_id, score) sorted by descending score.
+    """
+    weights = {cid: (value - RATING_PIVOT) / 2 for cid, value in ratings.items()}
+    for cid in saved:
+        weights.setdefault(cid, WATCHLIST_WEIGHT)
+    weights = {cid: w for cid, w in weights.items() if w}
+    if not weights:
+        return []
+
+    seen = set(ratings) | set(saved) | set(exclude_ids)
+    numerator = defaultdict(float)
+    denominator = defaultdict(float)
+    rows = ItemNeighbor.objects.filter(
+        kind='cf', content_id__in=list(weights)
+    ).values_list('content_id', 'neighbor_id', 'score')
+    for content_id, neighbor_id, score in rows:
+        if neighbor_id in seen:
+            continue
+        numerator[neighbor_id] += score * weights[content_id]
+        denominator[neighbor_id] += abs(score)
+
+    scored = (
+        (cid, numerator[cid] / (denominator[cid] + SHRINKAGE))
+        for cid in numerator
+    )
+    return heapq.nlargest(
+        limit, (item for item in scored if item[1] > 0), key=lambda item: item[1]
+    )
@@ -0,0 +1,89 @@
+# recommendox/roles.py
+"""
+Reviewer / creator / golden roles of the current user.
+
+RoleMiddleware sets `request.roles`, resolved lazily with one query across
+UserProfile, Reviewer, ContentCreator and GoldenUser and then kept in the
+session. The session copy carries the user's role version from caching.py;
+signals bump that version whenever one of the role rows changes, so every
+session of the user re-resolves on its next request.
+
+annotate_roles() computes the same flags for a whole User queryset in the
+query that lists it.
+"""
+from collections import namedtuple
+
+from django.db.models import BooleanField, F, Value
+from django.db.models.functions import Coalesce
+from django.utils.functional import SimpleLazyObject
+
+from .caching import get_role_version
+from .models import UserProfile
+
+ROLES_SESSION_KEY = '_recommendox_roles'
+
+
+class Roles(namedtuple('Roles', 'is_reviewer is_creator golden_status profession')):
+    __slots__ = ()
+
+    @property
+    def is_golden(self):
+        """Has a golden profile, whatever its verification status"""
+        return self.golden_status is not None
+
+    @property
+    def is_verified_golden(self):
+        return self.golden_status == 'Verified'
+
+
+NO_ROLES = Roles(False, False, None, None)
+
+
+def resolve_roles(user):
+    """Roles of a user straight from the database, in one query"""
+    if not user.is_authenticated:
+        return NO_ROLES
+    row = UserProfile.objects.filter(user_id=user.id).values_list(
+        'reviewer_profile__is_active',
+        'creator_profile__is_active',
+        'golden_profile__verification_status',
+        'golden_profile__profession',
+    ).first()
+    if row is None:
+        return NO_ROLES
+    reviewer, creator, golden_status, profession = row
+    return Roles(bool(reviewer), bool(creator), golden_status, profession)
+
+
+def roles_for_request(request):
+    """Roles of request.user, from the session while the user's role version is unchanged"""
+    user = request.user
+    if not user.is_authenticated:
+        return NO_ROLES
+    version = get_role_version(user.id)
+    stored = request.session.get(ROLES_SESSION_KEY)
+    if stored and stored[0] == user.id and stored[1] == version:
+        return Roles(*stored[2])
+    roles = resolve_roles(user)
+    request.session[ROLES_SESSION_KEY] = [user.id, version, list(roles)]
+    return roles
+
+
+def annotate_roles(users):
+    """Annotate a User queryset with is_reviewer, is_creator and golden_status"""
+    return users.annotate(
+        is_reviewer=Coalesce(F('profile__reviewer_profile__is_active'), Value(False), output_field=BooleanField()),
+        is_creator=Coalesce(F('profile__creator_profile__is_active'), Value(False), output_field=BooleanField()),
+        golden_status=F('profile__golden_profile__verification_status'),
+    )
+
+
+class RoleMiddleware:
+    """Expose request.roles; nothing is looked up unless a view or template reads it"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.roles = SimpleLazyObject(lambda: roles_for_request(request))
+        return self.get_response(request)
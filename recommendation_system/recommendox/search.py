@@ -0,0 +1,159 @@
+# recommendox/search.py
+"""
+Full-text search over the catalog.
+
+The index is a side table created by migration 0014: an FTS5 virtual table on
+SQLite, a tsvector column with a GIN index on PostgreSQL. Both index three
+weighted fields - title, people (director + cast) and description - and rank
+with bm25 / ts_rank so title matches beat cast matches beat plot matches.
+Every query term is prefix-matched, so partially typed words still hit.
+
+search_filter returns a Q that keeps the matching titles, so the browse
+filters and the match are one query with no cap on the number of matches;
+search_content_ids ranks the matches of an already filtered queryset. Both
+return None when no index exists (another database, or SQLite built without
+FTS5); callers then fall back to icontains filters.
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+SQLITE_TABLE = 'recommendox_content_fts'
+POSTGRES_TABLE = 'recommendox_content_search'
+SQLITE_WEIGHTS = (10.0, 4.0, 1.0)                 # title, people, description
+POSTGRES_WEIGHTS = '{0.1, 0.2, 0.4, 1.0}'          # D, C (description), B (people), A (title)
+
+POSTGRES_DOCUMENT = """
+    setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(director, '') || ' ' || coalesce("cast", '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+"""
+
+_backend = {}
+
+
+def search_backend():
+    """'sqlite', 'postgresql' or None, checked once per process"""
+    if 'name' not in _backend:
+        table = {'sqlite': SQLITE_TABLE, 'postgresql': POSTGRES_TABLE}.get(connection.vendor)
+        available = table is not None and table in connection.introspection.table_names()
+        _backend['name'] = connection.vendor if available else None
+    return _backend['name']
+
+
+def _terms(query):
+    return re.findall(r'\w+', query.lower())[:10]
+
+
+def _match(backend, terms):
+    if backend == 'sqlite':
+        return ' '.join(f'"{term}"*' for term in terms)
+    return ' & '.join(f'{term}:*' for term in terms)
+
+
+def search_filter(query):
+    """Q keeping the contents that match every term of the query"""
+    backend = search_backend()
+    if backend is None:
+        return None
+    terms = _terms(query)
+    if not terms:
+        return Q(pk__in=[])
+    if backend == 'sqlite':
+        matches = RawSQL(f'SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s', [_match(backend, terms)])
+    else:
+        matches = RawSQL(
+            f'SELECT content_id FROM {POSTGRES_TABLE} WHERE document @@ to_tsquery(%s, %s)',
+            ['simple', _match(backend, terms)],
+        )
+    return Q(id__in=matches)
+
+
+def search_content_ids(query, within=None, limit=None, offset=0):
+    """
+    Ids of the contents in `within` (a Content queryset) matching every term
+    of the query, best match first; `limit` and `offset` select one page
+    """
+    backend = search_backend()
+    if backend is None:
+        return None
+    terms = _terms(query)
+    if not terms:
+        return []
+    # The filters run inside the ranking query, so no match is cut off before them
+    within_sql, within_params = '', []
+    if within is not None:
+        sql, within_params = within.order_by().values('id').query.sql_with_params()
+        within_sql = f'AND {"rowid" if backend == "sqlite" else "content_id"} IN ({sql}) '
+    limit_sql, limit_params = ('LIMIT %s OFFSET %s', [limit, offset]) if limit is not None else ('', [])
+    with connection.cursor() as cursor:
+        if backend == 'sqlite':
+            cursor.execute(
+                f'SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s {within_sql}'
+                f'ORDER BY bm25({SQLITE_TABLE}, %s, %s, %s), rowid {limit_sql}',
+                [_match(backend, terms), *within_params, *SQLITE_WEIGHTS, *limit_params],
+            )
+        else:
+            cursor.execute(
+                f'SELECT content_id FROM {POSTGRES_TABLE}, to_tsquery(%s, %s) query '
+                f'WHERE document @@ query {within_sql}'
+                f'ORDER BY ts_rank(%s::float4[], document, query) DESC, content_id {limit_sql}',
+                ['simple', _match(backend, terms), *within_params, POSTGRES_WEIGHTS, *limit_params],
+            )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def index_content(content_ids):
+    """Insert or refresh the index rows of the given content"""
+    backend = search_backend()
+    if backend is None or not content_ids:
+        return
+    content_ids = list(content_ids)
+    with connection.cursor() as cursor:
+        if backend == 'sqlite':
+            placeholders = ', '.join(['%s'] * len(content_ids))
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid IN ({placeholders})', content_ids)
+            cursor.execute(
+                f'INSERT INTO {SQLITE_TABLE} (rowid, title, people, description) '
+                f"SELECT id, title, coalesce(director, '') || ' ' || coalesce(\"cast\", ''), description "
+                f'FROM recommendox_content WHERE id IN ({placeholders})',
+                content_ids,
+            )
+        else:
+            cursor.execute(
+                f'INSERT INTO {POSTGRES_TABLE} (content_id, document) '
+                f'SELECT id, {POSTGRES_DOCUMENT} FROM recommendox_content WHERE id = ANY(%s) '
+                f'ON CONFLICT (content_id) DO UPDATE SET document = EXCLUDED.document',
+                [content_ids],
+            )
+
+
+def remove_content(content_id):
+    # PostgreSQL rows go with the content through ON DELETE CASCADE
+    if search_backend() == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [content_id])
+
+
+def rebuild_search_index():
+    """Re-index the whole catalog. Returns the number of indexed titles"""
+    backend = search_backend()
+    if backend is None:
+        return 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        if backend == 'sqlite':
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {SQLITE_TABLE} (rowid, title, people, description) '
+                f"SELECT id, title, coalesce(director, '') || ' ' || coalesce(\"cast\", ''), description "
+                f'FROM recommendox_content'
+            )
+        else:
+            cursor.execute(f'TRUNCATE {POSTGRES_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {POSTGRES_TABLE} (content_id, document) '
+                f'SELECT id, {POSTGRES_DOCUMENT} FROM recommendox_content'
+            )
+        return cursor.rowcount
@@ -0,0 +1,43 @@
+# recommendox/serializers.py
+"""
+Read-only serializers for the catalog API in api.py.
+
+Nested rows are not declared here: api.py adds OTT platforms, seasons and
+episodes to a content only when the client asks for them with ?include=.
+"""
+from rest_framework import serializers
+
+from .models import Content, ContentOTT, Episode, Season
+
+
+class ContentSerializer(serializers.ModelSerializer):
+    # From the denormalized rating columns, no Rating rows are read
+    avg_rating = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Content
+        fields = [
+            'id', 'title', 'description', 'genre', 'language', 'content_type', 'release_date',
+            'duration', 'director', 'cast', 'poster_url', 'trailer_url', 'avg_rating', 'rating_count',
+            'updated_at',
+        ]
+
+
+class ContentOTTSerializer(serializers.ModelSerializer):
+    platform = serializers.CharField(source='get_platform_name_display', read_only=True)
+
+    class Meta:
+        model = ContentOTT
+        fields = ['platform_name', 'platform', 'watch_url', 'is_free']
+
+
+class EpisodeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Episode
+        fields = ['id', 'episode_number', 'title', 'duration', 'description']
+
+
+class SeasonSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Season
+        fields = ['id', 'season_number', 'title', 'description']
@@ -0,0 +1,174 @@
+# recommendox/signals.py
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import (
+    Content, ContentCreator, ContentOTT, Episode, GoldenUser, Rating, Review, Reviewer, Season, UserProfile, Watchlist,
+)
+from .content_similarity import mark_for_refresh
+from .caching import (
+    bump_catalog_version, bump_content_version, bump_review_version, bump_role_version, bump_user_version,
+)
+from .aggregates import apply_rating_change
+from .engagement import record_event
+from .search import index_content, remove_content
+from .autocomplete import autocomplete_index
+from .facets import invalidate_facets
+from .credits import sync_credits
+
+
+@receiver(post_save, sender=Content)
+def refresh_similar_content(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Queue the TF-IDF neighbors of a content for the next refresh batch when its metadata changes"""
+    if raw:
+        return
+    if update_fields and not {'description', 'cast', 'director', 'genre', 'language'} & set(update_fields):
+        return
+    mark_for_refresh(instance.id)
+
+
+@receiver(post_save, sender=Content)
+def update_search_index(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Re-index a content's searchable text after it is saved"""
+    if raw:
+        return
+    if update_fields and not {'title', 'description', 'cast', 'director'} & set(update_fields):
+        return
+    transaction.on_commit(lambda: index_content([instance.id]))
+
+
+@receiver(post_delete, sender=Content)
+def remove_from_search_index(sender, instance, **kwargs):
+    content_id = instance.id
+    # A rolled back delete must keep its index rows
+    transaction.on_commit(lambda: remove_content(content_id))
+
+
+@receiver(post_save, sender=Content)
+def update_autocomplete(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Apply this worker's saves to its in-memory autocomplete index"""
+    if raw:
+        return
+    if update_fields and not {'title', 'director', 'cast'} & set(update_fields):
+        return
+    transaction.on_commit(lambda: autocomplete_index.update_content(instance))
+
+
+@receiver(post_delete, sender=Content)
+def remove_from_autocomplete(sender, instance, **kwargs):
+    content_id = instance.id
+    transaction.on_commit(lambda: autocomplete_index.remove_content(content_id))
+
+
+@receiver(post_save, sender=Content)
+def refresh_credits(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Re-extract a content's cast, director and crew credits"""
+    if raw:
+        return
+    if update_fields and not {'cast', 'director', 'description'} & set(update_fields):
+        return
+    transaction.on_commit(lambda: sync_credits([instance]))
+
+
+@receiver([post_save, post_delete], sender=Content)
+@receiver([post_save, post_delete], sender=ContentOTT)
+def refresh_facets(sender, instance, update_fields=None, **kwargs):
+    """Cached browse facet counts depend on content attributes and OTT availability"""
+    if sender is Content and update_fields and not {'genre', 'language', 'content_type'} & set(update_fields):
+        return
+    invalidate_facets()
+
+
+# Content fields that decide which listings a title appears in and where
+LISTING_FIELDS = {'title', 'genre', 'language', 'content_type', 'release_date'}
+
+
+@receiver([post_save, post_delete], sender=Content)
+@receiver([post_save, post_delete], sender=ContentOTT)
+def invalidate_catalog_pages(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Cached pages list titles and filter by OTT platform"""
+    if raw:
+        return
+    if sender is Content and update_fields and not LISTING_FIELDS & set(update_fields):
+        return
+    bump_catalog_version()
+
+
+@receiver([post_save, post_delete], sender=Content)
+@receiver([post_save, post_delete], sender=ContentOTT)
+@receiver([post_save, post_delete], sender=Rating)
+@receiver([post_save, post_delete], sender=Season)
+@receiver([post_save, post_delete], sender=Episode)
+def invalidate_content(sender, instance, raw=False, **kwargs):
+    """A title's card shows its OTT badges and average rating; its API representation also nests seasons and episodes"""
+    if raw:
+        return
+    if sender is Content:
+        content_id = instance.id
+    elif sender is Episode:
+        content_id = Season.objects.filter(id=instance.season_id).values_list('content_id', flat=True).first()
+    else:
+        content_id = instance.content_id
+    if content_id is not None:
+        bump_content_version(content_id)
+
+
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_content_reviews(sender, instance, raw=False, **kwargs):
+    """The detail page lists every review of its content"""
+    if raw:
+        return
+    bump_review_version(instance.content_id)
+
+
+@receiver([post_save, post_delete], sender=Rating)
+@receiver([post_save, post_delete], sender=Watchlist)
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_user_recommendations(sender, instance, **kwargs):
+    """A user's cached recommendations are stale once their activity changes"""
+    bump_user_version(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Reviewer)
+@receiver([post_save, post_delete], sender=ContentCreator)
+@receiver([post_save, post_delete], sender=GoldenUser)
+def invalidate_roles(sender, instance, raw=False, **kwargs):
+    """Roles cached in the user's sessions are stale once a role row changes"""
+    if raw:
+        return
+    user_id = UserProfile.objects.filter(id=instance.user_profile_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        bump_role_version(user_id)
+
+
+@receiver(post_save, sender=Rating)
+def rating_saved(sender, instance, created, raw=False, **kwargs):
+    """Apply a new or changed rating to the content's denormalized aggregates"""
+    if raw:
+        return
+    old_value = None if created else getattr(instance, '_stored_rating_value', None)
+    if not created and old_value is None:
+        # Instance was not loaded from the database; nothing reliable to diff against
+        return
+    apply_rating_change(instance.content_id, old_value, instance.rating_value)
+    instance._stored_rating_value = int(instance.rating_value)
+
+
+@receiver(post_delete, sender=Rating)
+def rating_deleted(sender, instance, **kwargs):
+    old_value = getattr(instance, '_stored_rating_value', None) or instance.rating_value
+    apply_rating_change(instance.content_id, old_value, None)
+
+
+ENGAGEMENT_EVENTS = {Rating: 'rating', Review: 'review', Watchlist: 'watchlist'}
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_save, sender=Review)
+@receiver(post_save, sender=Watchlist)
+def record_engagement(sender, instance, created, raw=False, **kwargs):
+    """Count new ratings, reviews and watchlist adds in the hourly engagement buckets"""
+    if raw or not created:
+        return
+    record_event(instance.content_id, ENGAGEMENT_EVENTS[sender])
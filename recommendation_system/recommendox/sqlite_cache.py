@@ -0,0 +1,184 @@
+# recommendox/sqlite_cache.py
+"""
+Single-host shared cache backend in one SQLite file.
+
+Every worker process on the host opens the same database (WAL mode, so
+readers never block the writer). Unlike FileBasedCache, add() and incr()
+are atomic across processes: add() is a single upsert that only replaces an
+expired row, and incr() reads and writes inside a BEGIN IMMEDIATE
+transaction, which holds the database's write lock. That is what the
+recompute leases in tiered_cache.py and the version counters in caching.py
+need. Use Redis or Memcached instead once workers run on more than one host.
+
+Culling runs every CULL_EVERY writes: expired rows go first, then, above
+MAX_ENTRIES, the rows closest to expiry. Rows stored without a timeout (the
+version counters) are culled last.
+
+    'shared': {
+        'BACKEND': 'recommendox.sqlite_cache.SQLiteCache',
+        'LOCATION': '/var/cache/recommendox/shared.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+"""
+import os
+import pickle
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+BUSY_TIMEOUT = 5.0      # seconds a writer waits for another process's transaction
+CULL_EVERY = 200        # writes between culls, per backend instance
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+]
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._connection = None
+        self._pid = None
+        self._writes = 0
+
+    def _db(self):
+        # Django keeps one backend instance per thread; a forked worker opens its own connection
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self._path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    @contextmanager
+    def _transaction(self):
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def _dump(self, value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _wrote(self, count=1):
+        self._writes += count
+        if self._writes >= CULL_EVERY:
+            self._writes = 0
+            self._cull()
+
+    def _cull(self):
+        now = time.time()
+        with self._transaction() as db:
+            db.execute('DELETE FROM cache WHERE expires <= ?', [now])
+            (count,) = db.execute('SELECT COUNT(*) FROM cache').fetchone()
+            if count > self._max_entries:
+                excess = count - self._max_entries + count // self._cull_frequency
+                db.execute(
+                    'DELETE FROM cache WHERE key IN '
+                    '(SELECT key FROM cache ORDER BY expires IS NULL, expires LIMIT ?)',
+                    [excess],
+                )
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._db().execute(
+            'SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', [key, time.time()],
+        ).fetchone()
+        return default if row is None else pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not keys:
+            return {}
+        placeholders = ', '.join(['?'] * len(keys))
+        rows = self._db().execute(
+            f'SELECT key, value FROM cache WHERE key IN ({placeholders}) AND (expires IS NULL OR expires > ?)',
+            [*keys, time.time()],
+        ).fetchall()
+        return {keys[key]: pickle.loads(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self._expires(timeout)
+        rows = [(self.make_and_validate_key(key, version=version), self._dump(value), expires)
+                for key, value in data.items()]
+        with self._transaction() as db:
+            db.executemany('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)', rows)
+        self._wrote(len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        # One statement: insert, or take over the row only if it has expired
+        cursor = self._db().execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            [key, self._dump(value), self._expires(timeout), time.time()],
+        )
+        self._wrote()
+        return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._db().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            [self._expires(timeout), key, time.time()],
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._db().execute('DELETE FROM cache WHERE key = ?', [key]).rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if keys:
+            self._db().execute(f'DELETE FROM cache WHERE key IN ({", ".join(["?"] * len(keys))})', keys)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._db().execute(
+            'SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', [key, time.time()],
+        ).fetchone()
+        return row is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        # The write lock is held from the read to the write, so concurrent increments never get lost
+        with self._transaction() as db:
+            row = db.execute(
+                'SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', [key, time.time()],
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            db.execute('UPDATE cache SET value = ? WHERE key = ?', [self._dump(value), key])
+        return value
+
+    def clear(self):
+        self._db().execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Called at the end of every request; the connection is kept for the next one
+        pass
@@ -1,3 +1,1409 @@
-from django.test import TestCase
+import datetime
+import importlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from allauth.socialaccount.models import SocialApp
+from django.apps import apps as django_apps
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sites.models import Site
+from django.core.cache import cache, caches
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from . import caching, tiered_cache, urls
+from .aggregates import RATING_FIELDS, repair_rating_aggregates
+from .api import serialized_contents
+from .autocomplete import autocomplete_index, suggest
+from .caching import (
+    cached_recommendations, get_catalog_version, get_content_versions, get_published, publish,
+    recommendation_cache_stats,
+)
+from .coldstart import bucket_key, build_top_lists, cold_start_recommendations, get_top_lists
+from .content_similarity import (
+    build_content_neighbors, refresh_content_neighbors, refresh_marked_neighbors, similar_content_ids,
+)
+from .counters import ViewCounterBuffer, view_counter
+from .credits import extract_credits, filmography, person_for_golden, prune_people, rebuild_credits, sync_credits
+from .embeddings import IDS_FILENAME, META_FILENAME, VECTORS_FILENAME, _publish, _root, get_store, more_like_this
+from .engagement import daily_series, record_event, recent_counts, rollup
+from .evaluation import _ndcg, evaluate, time_split
+from .facets import facet_counts, matching_total
+from .factorization import load_model, train_factors
+from .forms import ContentForm
+from .fragments import render_cards
+from .models import (
+    Analytics, Content, ContentCreator, ContentOTT, Episode, GoldenUser, ItemNeighbor, NeighborRefresh, Person,
+    Rating, RecommendationSnapshot, Review, Reviewer, Season, TrendingEpoch, UserProfile, UserRecommendation,
+    Watchlist,
+)
+from .pagination import encode_cursor, keyset_paginate
+from .pipeline import SLOW_RUNS_TO_BENCH, CandidateGenerator, PipelineResult, generator_stats, run_pipeline
+from .popularity import compute_popularity
+from .precompute import delete_stale_snapshots, get_precomputed_recommendations, run_precompute
+from .recommender import build_item_neighbors, score_items_for_user
+from .roles import NO_ROLES, Roles, annotate_roles, roles_for_request
+from .search import search_content_ids, search_filter
+from .sqlite_cache import SQLiteCache
+from .trending import HALF_LIFE_HOURS, build_trending_lists, current_epoch, get_trending, rebase, record_trending
+
+ROLES = ['anonymous', 'regular', 'reviewer', 'creator', 'golden', 'staff']
+
+# Query strings for routes that do nothing interesting on a bare GET
+QUERY_STRINGS = {
+    'content_list': 'genre=Action&sort=rating',
+    'autocomplete': 'q=titl',
+    'semantic_search': 'q=bank+heist',
+    'api_content_list': 'limit=100&include=ott_platforms,seasons.episodes',
+    'api_content_bulk': 'ids=1,2,3,4,5&include=ott_platforms,seasons.episodes',
+}
+
+# Maximum queries per request, per route. A number applies to every role; a
+# dict gives per-role budgets, with '*' for the roles it does not name.
+# Budgets are measured with a cold cache, so they include rebuilding whatever
+# the page caches, and must not depend on how many rows the page lists.
+#
+# Each budget is the view's own query plan on top of the fixed cost of the
+# request, so a new query fails the test even when it stays constant per page.
+# Logged-in requests load the session and the user (AUTH). Rendering a page or
+# passing a role check also resolves the roles once per session in one query
+# (ROLE_LOOKUP) and writes them back to the session (SESSION_WRITE).
+# Anonymous visitors of login-only pages are redirected without a query.
+AUTH = 2
+ROLE_LOOKUP = 1
+SESSION_WRITE = 3
+PAGE = AUTH + ROLE_LOOKUP + SESSION_WRITE
+
+QUERY_BUDGETS = {
+    # Newest and recently added rows with their OTT badges, the title count and the top genres
+    'home': {'anonymous': 6, '*': PAGE + 6},
+    # Two facet counts, the page and its OTT badges
+    'content_list': {'anonymous': 4, '*': PAGE + 4},
+    # Served from the in-memory index and the embedding store
+    'autocomplete': 0,
+    'semantic_search': 0,
+    'more_like_this': 0,
+    # ETag check, the title, its neighbors, similar titles, reviews and OTT rows;
+    # logged-in users also get their rating and watchlist state
+    'content_detail': {'anonymous': 6, '*': PAGE + 8},
+    # The Google login button
+    'register': {'anonymous': 1, '*': PAGE + 1},
+    'login': {'anonymous': 1, '*': PAGE + 1},
+    # Reload and delete the session
+    'logout': {'anonymous': 0, '*': AUTH + 2},
+    # Profile, active snapshot and its one indexed recommendation query,
+    # watchlist, ratings and reviews with their three counts
+    'user_dashboard': {'anonymous': 0, '*': PAGE + 9},
+    # A GET only redirects; see POST_BUDGETS for the writes
+    'manage_watchlist': {'anonymous': 0, '*': AUTH},
+    'rate_content': {'anonymous': 0, '*': AUTH + 1},
+    'add_review': {'anonymous': 0, '*': AUTH + 1},
+    # Eight totals, two engagement queries, recent titles and reviews
+    'admin_dashboard': {'anonymous': 0, 'staff': PAGE + 12, '*': AUTH},
+    'manage_content': {'anonymous': 0, 'staff': PAGE + 1, '*': PAGE},
+    # One annotated role query for the whole page
+    'manage_users': {'anonymous': 0, 'staff': PAGE + 1, '*': AUTH},
+    # The title and its OTT rows
+    'edit_content': {'anonymous': 0, 'staff': PAGE + 2, '*': AUTH},
+    'delete_content': {'anonymous': 0, 'staff': AUTH, '*': PAGE},
+    # Four status counts and the page
+    'verify_golden_users': {'anonymous': 0, 'staff': PAGE + 5, '*': AUTH},
+    # The review, its author and its title; others are turned away after the ownership check
+    'edit_review': {'anonymous': 0, 'regular': PAGE + 3, '*': AUTH + 3},
+    'delete_review': {'anonymous': 0, 'regular': PAGE + 3, 'staff': PAGE + 3, '*': AUTH + 3},
+    # The target user and profile, the role row and its insert, and the role version bump
+    'make_reviewer': {'anonymous': 0, 'staff': AUTH + 5, '*': AUTH},
+    'make_creator': {'anonymous': 0, 'staff': AUTH + 5, '*': AUTH},
+    'fix_admin_reviewer': {'anonymous': 0, 'staff': AUTH + 7, '*': AUTH},
+    'remove_reviewer': {'anonymous': 0, 'staff': AUTH + 2, '*': AUTH},
+    'remove_creator': {'anonymous': 0, 'staff': AUTH + 2, '*': AUTH},
+    # Three counts and the page
+    'admin_manage_reviews': {'anonymous': 0, 'staff': PAGE + 4, '*': AUTH},
+    # The creator row, two counts and recent titles
+    'creator_dashboard': {'anonymous': 0, 'creator': PAGE + 4, 'staff': PAGE + 4, '*': PAGE},
+    # Count, page and OTT badges
+    'ott_browse': {'anonymous': 3, '*': PAGE + 3},
+    'become_golden': {'anonymous': 0, '*': PAGE},
+    # Golden row, linked person, filmography with badges, its stats and genre trends
+    'golden_dashboard': {'anonymous': 0, 'golden': PAGE + 12, '*': PAGE},
+    # The title, review count and list, two engagement queries, OTT rows and similar titles;
+    # golden users also count a view on their own row
+    'golden_content_analytics': {'anonymous': 0, 'golden': PAGE + 9, 'staff': PAGE + 7, '*': PAGE},
+    # Constant in the page size: facets, page, rows and one query per included relation
+    'api_content_list': 7,
+    'api_content_bulk': 4,
+    'api_content_detail': 1,
+}
+
+# Form posts for the routes that write, with their budgets. Every write looks
+# up the title and records the event: an hourly engagement bucket upsert (an
+# UPDATE, then an INSERT under a savepoint in a new hour) and a trending score
+# bump in the current epoch. Anonymous posts are redirected to the login page.
+ENGAGEMENT = 4
+TRENDING = 2
+
+POST_BUDGETS = {
+    # update_or_create of the rating (a lookup and the write, each under a savepoint) and the aggregate UPDATE
+    'rate_content': {'anonymous': 0, '*': AUTH + 1 + 6 + 1 + ENGAGEMENT + TRENDING},
+    # The insert; reviewers' reviews are marked verified, so the roles are resolved
+    'add_review': {'anonymous': 0, '*': PAGE + 1 + 1 + ENGAGEMENT + TRENDING},
+    # get_or_create of the watchlist row
+    'manage_watchlist': {'anonymous': 0, '*': AUTH + 1 + 4 + ENGAGEMENT + TRENDING},
+}
+
+# Tests never touch the developer's file cache in BASE_DIR/cache
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'recommendox-tests'},
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'recommendox-tests-shared'},
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class QueryBudgetTests(TestCase):
+    """Render every recommendox route as every kind of user within a query budget"""
+
+    CONTENT_COUNT = 40
+    FAN_COUNT = 12
+    timings = []
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # No trained models or embedding store: every route takes its fallback path
+        cls.enterClassContext(override_settings(RECOMMENDER_MODEL_DIR=cls.enterClassContext(tempfile.TemporaryDirectory())))
+        # Keep view counts buffered so a timed flush cannot land inside a measurement
+        cls._flush_interval = view_counter.flush_interval
+        view_counter.flush_interval = 10 ** 9
+
+    @classmethod
+    def tearDownClass(cls):
+        # Write the buffered views while the test database still exists; the rollback discards them
+        view_counter.flush()
+        view_counter.flush_interval = cls._flush_interval
+        if os.environ.get('RECOMMENDOX_PERF_REPORT'):
+            print('\nSlowest renders (ms, queries):')
+            for name, role, took, queries in sorted(cls.timings, key=lambda row: -row[2])[:15]:
+                print(f'  {took:8.1f} {queries:4d}  {name} as {role}')
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        genres = [genre for genre, _ in Content.GENRE_CHOICES]
+        languages = [language for language, _ in Content.LANGUAGE_CHOICES]
+        types = [content_type for content_type, _ in Content.CONTENT_TYPES]
+        platforms = [platform for platform, _ in ContentOTT.OTT_CHOICES]
+        cls.contents = [
+            Content.objects.create(
+                title=f'Title {i}',
+                description=f'Story number {i}. Produced by Karan Johar.',
+                genre=genres[i % len(genres)],
+                language=languages[i % len(languages)],
+                content_type=types[i % len(types)],
+                release_date=datetime.date(2000 + i % 25, 1 + i % 12, 1 + i % 28),
+                director='Chris Nolan' if i % 3 == 0 else 'Greta Gerwig',
+                cast='Deepika Padukone, Meryl Streep, Aamir Khan',
+            )
+            for i in range(cls.CONTENT_COUNT)
+        ]
+        for i, content in enumerate(cls.contents):
+            for platform in platforms[i % 3:i % 3 + 2]:
+                ContentOTT.objects.create(
+                    content=content, platform_name=platform, is_free=i % 2 == 0,
+                    watch_url='https://example.com/watch',
+                )
+            if content.content_type != 'Movie':
+                for number in (1, 2):
+                    season = Season.objects.create(content=content, season_number=number)
+                    for episode in (1, 2, 3):
+                        Episode.objects.create(season=season, episode_number=episode, title=f'Episode {episode}',
+                                               duration=45)
+
+        def make_user(username, **extra):
+            user = User.objects.create_user(username=username, password='password', **extra)
+            UserProfile.objects.create(user=user, favorite_genres='Action,Drama', preferred_languages='English')
+            return user
+
+        fans = [make_user(f'fan{i}') for i in range(cls.FAN_COUNT)]
+        for i, fan in enumerate(fans):
+            for content in cls.contents[i::3]:
+                Rating.objects.create(user=fan, content=content, rating_value=1 + (i + content.id) % 5)
+            for content in cls.contents[i:i + 4]:
+                Review.objects.create(user=fan, content=content, comment='Worth watching', is_approved=True,
+                                      is_verified=i % 2 == 0)
+            Watchlist.objects.create(user=fan, content=cls.contents[-1 - i])
+
+        cls.users = {
+            'regular': fans[0],
+            'reviewer': make_user('reviewer'),
+            'creator': make_user('creator'),
+            'golden': make_user('golden', first_name='Chris', last_name='Nolan'),
+            'staff': make_user('admin', is_staff=True, is_superuser=True),
+        }
+        Reviewer.objects.create(user_profile=cls.users['reviewer'].profile, is_active=True)
+        ContentCreator.objects.create(user_profile=cls.users['creator'].profile, is_active=True)
+        GoldenUser.objects.create(user_profile=cls.users['golden'].profile, profession='Director',
+                                  verification_status='Verified')
+        Review.objects.create(user=cls.users['reviewer'], content=cls.contents[0], comment='Reviewer take',
+                              is_approved=True, is_verified=True)
+        rebuild_credits()
+        # Built by a background thread in production; its queries are not part of any request
+        autocomplete_index.build()
+        google = SocialApp.objects.create(provider='google', name='Google', client_id='test', secret='test')
+        google.sites.add(Site.objects.get_current())
+        # Steady state of the nightly jobs: every user has precomputed recommendations,
+        # and the golden user was linked to their credits on a first dashboard visit
+        snapshot = RecommendationSnapshot.objects.create(completed_at=timezone.now(), is_active=True)
+        users = {user.id: user for user in [*fans, *cls.users.values()]}.values()
+        UserRecommendation.objects.bulk_create([
+            UserRecommendation(snapshot=snapshot, user=user, content=content, rank=rank)
+            for user in users for rank, content in enumerate(cls.contents[-6:], 1)
+        ])
+        person_for_golden(cls.users['golden'].profile.golden_profile, 'Chris Nolan')
+
+    def setUp(self):
+        cache.clear()
+
+    def route_kwargs(self, pattern):
+        target = self.users['regular']
+        review = Review.objects.filter(user=self.users['regular']).first()
+        values = {'content_id': self.contents[0].id, 'user_id': target.id, 'review_id': review.id}
+        return {name: values[name] for name in pattern.pattern.converters}
+
+    def measure(self, name, role, url, data=None):
+        """GET url, or POST data to it, as role with a cold cache, undoing whatever the request changed"""
+        if role != 'anonymous':
+            self.client.force_login(self.users[role])
+        cache.clear()
+        try:
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = self.client.get(url) if data is None else self.client.post(url, data)
+                    took = (time.perf_counter() - started) * 1000
+                transaction.set_rollback(True)
+        finally:
+            self.client.logout()
+        self.timings.append((name, role, took, len(queries)))
+        return response, len(queries)
+
+    def test_every_route_has_a_budget(self):
+        names = {pattern.name for pattern in urls.urlpatterns if isinstance(pattern, URLPattern)}
+        self.assertEqual(sorted(names - set(QUERY_BUDGETS)), [])
+
+    def test_cached_pages(self):
+        """Anonymous home and repeat list renders come from the page and card caches"""
+        self.client.get(reverse('recommendox:home'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('recommendox:home'))
+        browse = reverse('recommendox:content_list')
+        self.client.get(browse)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(browse)
+        self.assertFalse([query for query in queries if 'recommendox_contentott' in query['sql']])
+
+    def test_conditional_get(self):
+        """Repeat detail requests get a 304 without rendering until the content's reviews change"""
+        content = self.contents[5]
+        url = reverse('recommendox:content_detail', args=[content.id])
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.client.force_login(self.users['regular'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.client.logout()
+        Review.objects.create(user=self.users['regular'], content=content, comment='Changed my mind', is_approved=True)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_api_page_size(self):
+        """An API page with nested relations costs as many queries at 100 rows as at 5"""
+        url = reverse('recommendox:api_content_list') + '?include=ott_platforms,seasons.episodes&limit='
+        counts = []
+        for limit in (5, 100):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url + str(limit))
+            self.assertEqual(len(response.json()['results']), min(limit, self.CONTENT_COUNT))
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        with self.assertNumQueries(1):
+            self.client.get(url + '100')
+
+    def test_query_budgets(self):
+        for pattern in urls.urlpatterns:
+            url = reverse(f'recommendox:{pattern.name}', kwargs=self.route_kwargs(pattern))
+            if pattern.name in QUERY_STRINGS:
+                url += '?' + QUERY_STRINGS[pattern.name]
+            budget = QUERY_BUDGETS[pattern.name]
+            for role in ROLES:
+                limit = budget.get(role, budget['*']) if isinstance(budget, dict) else budget
+                with self.subTest(route=pattern.name, role=role):
+                    response, count = self.measure(pattern.name, role, url)
+                    self.assertLess(response.status_code, 500)
+                    self.assertLessEqual(count, limit, f'{pattern.name} as {role} ran {count} queries (budget {limit})')
+
+    def test_post_budgets(self):
+        content = self.contents[1]
+        posts = {
+            'rate_content': ([content.id], {'rating': 4}),
+            'add_review': ([content.id], {'comment': 'Better the second time'}),
+            'manage_watchlist': ([], {'content_id': content.id, 'action': 'add'}),
+        }
+        self.assertEqual(sorted(posts), sorted(POST_BUDGETS))
+        for name, (args, data) in posts.items():
+            url = reverse(f'recommendox:{name}', args=args)
+            for role in ROLES:
+                limit = POST_BUDGETS[name].get(role, POST_BUDGETS[name]['*'])
+                with self.subTest(route=name, role=role):
+                    response, count = self.measure(f'POST {name}', role, url, data)
+                    self.assertEqual(response.status_code, 302)
+                    self.assertLessEqual(count, limit, f'POST {name} as {role} ran {count} queries (budget {limit})')
+
+
+def make_content(title, **fields):
+    defaults = {
+        'description': f'{title} story', 'genre': 'Drama', 'language': 'English',
+        'release_date': datetime.date(2020, 1, 1),
+    }
+    return Content.objects.create(title=title, **{**defaults, **fields})
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ContentSimilarityTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(RECOMMENDER_MODEL_DIR=directory.name))
+        heist = 'A crew of thieves plans an impossible bank heist'
+        self.a = make_content('A', description=heist, cast='Tom Hanks, Meryl Streep', genre='Thriller')
+        self.b = make_content('B', description=heist, cast='Tom Hanks', genre='Thriller')
+        self.c = make_content('C', description='Two friends open a bakery in Paris', cast='Audrey Tautou',
+                              genre='Comedy', language='French')
+        self.d = make_content('D', description='A dragon guards a mountain of gold', cast='Ian McKellen',
+                              genre='Fantasy')
+        build_content_neighbors(top_n=1)
+
+    def neighbors(self, content):
+        return similar_content_ids(content.id)
+
+    def test_refresh_updates_both_directions(self):
+        self.assertEqual(self.neighbors(self.a), [self.b.id])
+        Content.objects.filter(id=self.d.id).update(
+            description=self.a.description, cast=self.a.cast, genre='Thriller',
+        )
+        refresh_content_neighbors(self.d.id, top_n=1)
+        self.assertEqual(self.neighbors(self.d), [self.a.id])
+        # D now scores higher than B for A and takes its only slot
+        self.assertEqual(self.neighbors(self.a), [self.d.id])
+
+        Content.objects.filter(id=self.d.id).update(description='Penguins march across the ice', cast='',
+                                                    genre='Documentary', language='Other')
+        refresh_content_neighbors(self.d.id, top_n=1)
+        self.assertNotIn(self.d.id, self.neighbors(self.a))
+
+    def test_saves_are_refreshed_by_the_batch(self):
+        self.assertFalse(NeighborRefresh.objects.exists())
+        before = self.neighbors(self.d)
+        self.d.description, self.d.cast, self.d.genre = self.a.description, self.a.cast, 'Thriller'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.d.save()
+        # The save only marks the title; the request does not touch the model
+        self.assertEqual(self.neighbors(self.d), before)
+        self.assertEqual(list(NeighborRefresh.objects.values_list('content_id', flat=True)), [self.d.id])
+        self.assertEqual(refresh_marked_neighbors(top_n=1), 1)
+        self.assertEqual(self.neighbors(self.d), [self.a.id])
+        self.assertFalse(NeighborRefresh.objects.exists())
+        self.c.save(update_fields=['description'])
+        build_content_neighbors(top_n=1)
+        self.assertFalse(NeighborRefresh.objects.exists())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class EmbeddingStoreTests(TestCase):
+    def setUp(self):
+        self.enterContext(override_settings(RECOMMENDER_MODEL_DIR=self.enterContext(tempfile.TemporaryDirectory())))
+        self.contents = [make_content(f'Title {i}') for i in range(3)]
+
+    def publish(self, version, vectors):
+        """Write a build by hand, as encode_catalog would, without loading the encoder"""
+        directory = os.path.join(_root(), version)
+        os.makedirs(directory)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors.tofile(os.path.join(directory, VECTORS_FILENAME))
+        np.save(os.path.join(directory, IDS_FILENAME), np.array([c.id for c in self.contents], dtype=np.int64))
+        with open(os.path.join(directory, META_FILENAME), 'w') as handle:
+            json.dump({'model': 'test', 'dtype': 'float32', 'dim': vectors.shape[1], 'count': len(vectors)}, handle)
+        _publish(version)
+
+    def test_builds_are_swapped_whole(self):
+        a, b, c = (content.id for content in self.contents)
+        self.assertEqual(more_like_this(a), [])
+        self.publish('1', [[1, 0], [0.9, 0.1], [0, 1]])
+        self.assertEqual([cid for cid, _ in more_like_this(a)], [b, c])
+        self.publish('2', [[1, 0], [0, 1], [0.9, 0.1]])
+        self.assertEqual([cid for cid, _ in more_like_this(a)], [c, b])
+        self.assertEqual(get_store().meta['count'], 3)
+        with self.assertRaises(ValueError):
+            more_like_this(a, limit=0)
+
+    def test_endpoint(self):
+        a, b, _ = (content.id for content in self.contents)
+        self.publish('1', [[1, 0], [0.9, 0.1], [0, 1]])
+        url = reverse('recommendox:more_like_this', args=[a])
+        results = self.client.get(url, {'limit': 1}).json()['results']
+        self.assertEqual([(r['id'], r['title']) for r in results], [(b, 'Title 1')])
+        self.assertEqual(self.client.get(url, {'limit': 0}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('recommendox:semantic_search'), {'q': 'x', 'limit': -3}).status_code, 400)
+
+    def test_search_falls_back_to_keywords_until_the_encoder_is_loaded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            heist = make_content('Bank Heist')
+        self.publish('1', [[1, 0], [0.9, 0.1], [0, 1]])
+        url = reverse('recommendox:semantic_search')
+        encoder = mock.Mock()
+        encoder.encode.return_value = np.array([[0, 1]], dtype=np.float32)
+        with mock.patch('recommendox.embeddings.preload_encoder') as preload, \
+                mock.patch.dict('recommendox.embeddings._encoder', model=None):
+            data = self.client.get(url, {'q': 'heist'}).json()
+            preload.assert_called_once()
+            self.assertEqual((data['mode'], [r['id'] for r in data['results']]), ('keyword', [heist.id]))
+            with mock.patch('recommendox.views.search_content_ids', return_value=None):
+                response = self.client.get(url, {'q': 'heist'})
+            self.assertEqual((response.status_code, response['Retry-After']), (503, '30'))
+        with mock.patch.dict('recommendox.embeddings._encoder', model=encoder):
+            data = self.client.get(url, {'q': 'heist', 'limit': 1}).json()
+        self.assertEqual((data['mode'], [r['id'] for r in data['results']]), ('semantic', [self.contents[2].id]))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PipelineTests(TestCase):
+    def test_slow_generator_is_benched(self):
+        user = User.objects.create_user('viewer')
+        titles = [make_content(f'Title {i}') for i in range(3)]
+        slow = CandidateGenerator('slow-test', lambda ctx: [(titles[0].id, 1.0)], weight=1.0, budget_ms=-1)
+        fast = CandidateGenerator('fast-test', lambda ctx: [(c.id, 0.5) for c in titles], weight=0.5, budget_ms=10 ** 6)
+        with self.assertLogs('recommendox.pipeline', 'WARNING') as logs:
+            for _ in range(SLOW_RUNS_TO_BENCH):
+                self.assertEqual(run_pipeline(user, limit=2, generators=[slow, fast]).skipped, [])
+        self.assertEqual(len(logs.records), 1)
+        result = run_pipeline(user, limit=2, generators=[slow, fast])
+        self.assertEqual(result.skipped, ['slow-test'])
+        self.assertEqual(len(result.content), 2)
+        self.assertTrue(generator_stats()['slow-test']['benched'])
+        self.assertEqual(generator_stats()['fast-test']['slow'], 0)
+
+
+class InlineExecutor:
+    """ProcessPoolExecutor stand-in that runs each task at submit, in the test's transaction"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PrecomputeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.enterContext(mock.patch('recommendox.precompute.ProcessPoolExecutor', InlineExecutor))
+        self.seen, self.fresh = make_content('Seen'), make_content('Fresh')
+        self.user = User.objects.create_user('viewer')
+        Watchlist.objects.create(user=self.user, content=self.seen)
+
+    def test_snapshot_is_activated_when_complete(self):
+        with mock.patch('recommendox.views.get_personalized_recommendations', return_value=[self.fresh]):
+            snapshot = run_precompute(chunk_size=1)
+        self.assertTrue(snapshot.is_active)
+        self.assertEqual(snapshot.user_count, 1)
+        self.assertEqual(get_precomputed_recommendations(self.user), [self.fresh])
+        # Activity after the snapshot sends the user back to the live path
+        cache.set(f'recs:activity:{self.user.id}', time.time() + 1)
+        self.assertIsNone(get_precomputed_recommendations(self.user))
+
+    def test_cleanup_spares_snapshots_still_being_filled(self):
+        with mock.patch('recommendox.views.get_personalized_recommendations', return_value=[self.fresh]):
+            first = run_precompute()
+            filling = RecommendationSnapshot.objects.create()
+            second = run_precompute()
+            third = run_precompute()
+        remaining = set(RecommendationSnapshot.objects.values_list('id', flat=True))
+        self.assertEqual(remaining, {filling.id, second.id, third.id})
+        self.assertNotIn(first.id, remaining)
+        RecommendationSnapshot.objects.filter(id=filling.id).update(created_at=timezone.now() - datetime.timedelta(days=2))
+        delete_stale_snapshots()
+        self.assertEqual(set(RecommendationSnapshot.objects.values_list('id', flat=True)), {second.id, third.id})
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ColdStartTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_lists_come_only_from_builds(self):
+        loved = make_content('Loved', genre='Action', rating_sum=40, rating_count=10)
+        liked = make_content('Liked', genre='Action', rating_sum=6, rating_count=2)
+        other = make_content('Other', genre='Comedy', language='Hindi', rating_sum=45, rating_count=9)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_top_lists([bucket_key()]), {bucket_key(): []})
+        build_top_lists()
+        with self.assertNumQueries(0):
+            ranked = cold_start_recommendations('Action', 'English', limit=3)
+        # Preferred bucket first, then the catalog-wide list at half weight
+        self.assertEqual([cid for cid, _ in ranked], [loved.id, liked.id, other.id])
+        self.assertEqual([cid for cid, _ in cold_start_recommendations('Action', 'English', exclude_ids={loved.id})][:1],
+                         [liked.id])
+
+        Content.objects.filter(id=liked.id).update(rating_sum=100, rating_count=20)
+        self.assertEqual(get_top_lists([bucket_key('Action')])[bucket_key('Action')][0][0], loved.id)
+        build_top_lists()
+        self.assertEqual(get_top_lists([bucket_key('Action')])[bucket_key('Action')][0][0], liked.id)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.content = make_content('Rated')
+        self.users = [User.objects.create_user(f'rater{i}') for i in range(3)]
+
+    def aggregates(self):
+        self.content.refresh_from_db()
+        return [getattr(self.content, field) for field in RATING_FIELDS]
+
+    def test_create_change_delete(self):
+        first = Rating.objects.create(user=self.users[0], content=self.content, rating_value=5)
+        Rating.objects.create(user=self.users[1], content=self.content, rating_value=2)
+        # count, sum, then the 1..5 histogram
+        self.assertEqual(self.aggregates(), [2, 7, 0, 1, 0, 0, 1])
+        first = Rating.objects.get(id=first.id)
+        first.rating_value = 3
+        first.save()
+        self.assertEqual(self.aggregates(), [2, 5, 0, 1, 1, 0, 0])
+        first.delete()
+        self.assertEqual(self.aggregates(), [1, 2, 0, 1, 0, 0, 0])
+        self.assertEqual(self.content.avg_rating, 2)
+        self.assertEqual(repair_rating_aggregates(), 0)
+
+    def test_content_edit_keeps_concurrent_ratings(self):
+        data = {field: getattr(self.content, field) for field in ContentForm.Meta.fields}
+        data.update(title='Renamed', duration='2h', poster_url='', trailer_url='', director='', cast='')
+        form = ContentForm(data, instance=Content.objects.get(id=self.content.id))
+        self.assertTrue(form.is_valid(), form.errors)
+        # A rating lands between loading the form's instance and saving it
+        Rating.objects.create(user=self.users[0], content=self.content, rating_value=4)
+        form.save()
+        self.assertEqual(self.aggregates(), [1, 4, 0, 0, 0, 1, 0])
+        self.assertEqual(self.content.title, 'Renamed')
+
+    def test_admin_edit_keeps_concurrent_counters(self):
+        model_admin = admin.site._registry[Content]
+        request = RequestFactory().post('/')
+        request.user = User.objects.create_superuser('editor')
+        instance = Content.objects.get(id=self.content.id)
+        form_class = model_admin.get_form(request, instance, change=True)
+        for field in (*RATING_FIELDS, 'popularity', 'views_count'):
+            self.assertNotIn(field, form_class.base_fields)
+        data = {field: getattr(instance, field) for field in form_class.base_fields}
+        data.update(title='Renamed', duration='', poster_url='', trailer_url='', director='', cast='')
+        form = form_class(data, instance=instance)
+        self.assertTrue(form.is_valid(), form.errors)
+        Rating.objects.create(user=self.users[0], content=self.content, rating_value=4)
+        Content.objects.filter(id=self.content.id).update(views_count=F('views_count') + 3)
+        model_admin.save_model(request, form.save(commit=False), form, change=True)
+        self.assertEqual(self.aggregates(), [1, 4, 0, 0, 0, 1, 0])
+        self.assertEqual((self.content.title, self.content.views_count), ('Renamed', 3))
+
+    def test_backfill_migration(self):
+        for user, value in zip(self.users, (1, 5, 5)):
+            Rating.objects.create(user=user, content=self.content, rating_value=value)
+        Content.objects.filter(id=self.content.id).update(**{field: 0 for field in RATING_FIELDS})
+        migration = importlib.import_module('recommendox.migrations.0010_content_rating_aggregates')
+        migration.backfill_rating_aggregates(django_apps, None)
+        self.assertEqual(self.aggregates(), [3, 11, 1, 0, 0, 0, 2])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TrendingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_decay_and_rebase(self):
+        old = make_content('Old', genre='Action')
+        new = make_content('New', genre='Comedy')
+        epoch = current_epoch()
+        half_life = datetime.timedelta(hours=HALF_LIFE_HOURS)
+        record_trending({old.id: 4}, 'view', at=epoch)
+        record_trending({new.id: 3}, 'view', at=epoch + half_life)
+        # Nothing is built from a request: the lists only exist once the job publishes them
+        self.assertEqual(get_trending(), [])
+        build_trending_lists(now=epoch + half_life)
+        ranked = get_trending()
+        # Four views a half-life ago now weigh less than three fresh ones
+        self.assertEqual([cid for cid, _ in ranked], [new.id, old.id])
+        self.assertAlmostEqual(ranked[0][1], 3.0)
+        self.assertAlmostEqual(ranked[1][1], 2.0)
+        self.assertEqual([cid for cid, _ in get_trending('Comedy')], [new.id])
+
+        # Rebasing rescales stored scores without changing the decayed ones
+        self.assertTrue(rebase(now=epoch + half_life))
+        self.assertEqual(TrendingEpoch.objects.count(), 1)
+        self.assertAlmostEqual(Analytics.objects.get(content=old).trending_score, 2.0)
+        build_trending_lists(now=epoch + 2 * half_life)
+        self.assertEqual([(cid, round(score, 6)) for cid, score in get_trending()], [(new.id, 1.5), (old.id, 1.0)])
+
+    def test_concurrent_rebase_applies_once(self):
+        content = make_content('Watched')
+        epoch = current_epoch()
+        record_trending({content.id: 4}, 'view', at=epoch)
+        later = epoch + datetime.timedelta(hours=HALF_LIFE_HOURS)
+        self.assertTrue(rebase(now=later))
+        # A second run that read the epoch before the first one moved it loses the compare-and-set
+        with mock.patch('recommendox.trending.current_epoch', return_value=epoch):
+            self.assertFalse(rebase(now=later))
+        self.assertAlmostEqual(Analytics.objects.get(content=content).trending_score, 2.0)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_filters_apply_inside_the_match(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            dramas = [make_content(f'Heist {i}', description='bank heist') for i in range(3)]
+            comedy = make_content('Heist Comedy', genre='Comedy', description='bank heist')
+            make_content('Unrelated', genre='Comedy')
+        comedies = Content.objects.filter(genre='Comedy')
+        self.assertEqual(search_content_ids('heist', within=comedies), [comedy.id])
+        self.assertEqual(list(comedies.filter(search_filter('heist')).values_list('id', flat=True)), [comedy.id])
+        self.assertEqual(sorted(search_content_ids('bank heist')), sorted([*(c.id for c in dramas), comedy.id]))
+        self.assertEqual(len(search_content_ids('heist', limit=2)), 2)
+
+        response = self.client.get(reverse('recommendox:content_list'), {'search': 'heist', 'genre': 'Comedy'})
+        page = next(context['content'] for context in response.context if 'sort_by' in context)
+        self.assertEqual([card.id for card in page], [comedy.id])
+
+    def test_relevance_pages_are_limited_in_the_ranking_query(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            matches = {make_content(f'Heist {i}').id for i in range(15)}
+        url = reverse('recommendox:content_list')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'search': 'heist'})
+        ranking = [query['sql'] for query in queries.captured_queries if 'bm25' in query['sql']]
+        self.assertEqual(len(ranking), 1)
+        self.assertIn('LIMIT 13 OFFSET 0', ranking[0])
+        first = next(context['content'] for context in response.context if 'sort_by' in context)
+        self.assertEqual((len(first), first.total, first.num_pages), (12, 15, 2))
+        response = self.client.get(url, {'search': 'heist', 'cursor': first.next_cursor})
+        second = next(context['content'] for context in response.context if 'sort_by' in context)
+        self.assertEqual(len(second), 3)
+        self.assertFalse(second.has_next())
+        self.assertEqual({card.id for card in first} | {card.id for card in second}, matches)
+
+    def test_rolled_back_delete_keeps_index_rows(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            content = make_content('Vault')
+        content_id = content.id
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                content.delete()
+                raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(search_content_ids('vault'), [content_id])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        make_content('Amélie', director='Jean-Pierre Jeunet', cast='Audrey Tautou', rating_count=5)
+        make_content('American Beauty', cast='Kevin Spacey')
+        autocomplete_index.build()
+
+    def labels(self, query):
+        with self.assertNumQueries(0):
+            return [item['label'] for item in suggest(query)]
+
+    def test_prefix_typo_and_accents(self):
+        self.assertEqual(self.labels('ame')[:2], ['Amélie', 'American Beauty'])
+        self.assertEqual(self.labels('audrey tau'), ['Audrey Tautou'])
+        self.assertIn('Kevin Spacey', self.labels('kevn'))
+
+    def test_signals_keep_the_index_current(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            content = make_content('Zodiac', director='David Fincher')
+        self.assertEqual(self.labels('zodi'), ['Zodiac'])
+        with self.captureOnCommitCallbacks(execute=True):
+            content.title = 'Zodiac Killer'
+            content.save(update_fields=['title'])
+        self.assertEqual(self.labels('zodi'), ['Zodiac Killer'])
+        with self.captureOnCommitCallbacks(execute=True):
+            content.delete()
+        self.assertEqual(self.labels('zodi'), [])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PaginationTests(TestCase):
+    KEYS = [('release_date', True), ('id', True)]
+
+    def setUp(self):
+        cache.clear()
+        # Two titles per date, so the id tie-breaker matters
+        self.contents = [
+            make_content(f'Title {i}', release_date=datetime.date(2020, 1, 1 + i // 2)) for i in range(7)
+        ]
+        self.newest = [content.id for content in sorted(
+            self.contents, key=lambda content: (content.release_date, content.id), reverse=True,
+        )]
+
+    def page(self, cursor=None, sort='newest'):
+        return keyset_paginate(Content.objects.all(), self.KEYS, sort, cursor, per_page=3, total=7)
+
+    def ids(self, page):
+        return [content.id for content in page]
+
+    def test_next_prev_and_last(self):
+        first = self.page()
+        self.assertEqual(self.ids(first), self.newest[:3])
+        self.assertFalse(first.has_previous())
+        second = self.page(first.next_cursor)
+        self.assertEqual((self.ids(second), second.number), (self.newest[3:6], 2))
+        third = self.page(second.next_cursor)
+        self.assertEqual((self.ids(third), third.number), (self.newest[6:], 3))
+        self.assertFalse(third.has_next())
+        self.assertEqual(self.ids(self.page(third.previous_cursor)), self.newest[3:6])
+        self.assertEqual(self.ids(self.page(second.previous_cursor)), self.newest[:3])
+        last = self.page(first.last_cursor)
+        self.assertEqual((self.ids(last), last.number), (self.newest[6:], 3))
+        self.assertEqual(self.ids(self.page(last.previous_cursor)), self.newest[3:6])
+
+    def test_forged_and_foreign_cursors_start_over(self):
+        cursor = self.page().next_cursor
+        forged = cursor[:-1] + ('A' if cursor[-1] != 'A' else 'B')
+        self.assertEqual(self.ids(self.page(forged)), self.newest[:3])
+        unsigned = encode_cursor('newest', 'next', ['1999-01-01', 0], 2).split(':')[0] + ':bad'
+        self.assertEqual(self.ids(self.page(unsigned)), self.newest[:3])
+        # A cursor from another sort order is ignored rather than applied to this one
+        self.assertEqual(self.ids(self.page(cursor, sort='oldest')), self.newest[:3])
+
+    def test_known_total_skips_the_count(self):
+        with self.assertNumQueries(1):
+            self.page()
+
+    def test_legacy_page_links_redirect_to_a_cursor(self):
+        for i in range(7, 15):
+            make_content(f'Title {i}', release_date=datetime.date(2021, 1, i))
+        url = reverse('recommendox:content_list')
+        response = self.client.get(url, {'page': 2, 'genre': 'Drama'})
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn('page=', response.url)
+        self.assertIn('genre=Drama', response.url)
+        response = self.client.get(response.url)
+        page = next(context['content'] for context in response.context if 'sort_by' in context)
+        self.assertEqual((page.number, page.total), (2, 15))
+        self.assertEqual(len(page), 3)
+        self.assertEqual(self.client.get(url, {'page': 'x'}).url, url)
+
+    def test_rating_sort_seeks_on_the_denormalized_popularity(self):
+        Content.objects.filter(id=self.contents[0].id).update(rating_sum=50, rating_count=10)
+        Content.objects.filter(id=self.contents[1].id).update(rating_sum=10, rating_count=10)
+        compute_popularity()
+        top = Content.objects.order_by('-popularity', '-id').first()
+        self.assertEqual(top.id, self.contents[0].id)
+        self.assertEqual(top.popularity, Analytics.objects.get(content=top).popularity_score)
+        response = self.client.get(reverse('recommendox:content_list'), {'sort': 'rating'})
+        page = next(context['content'] for context in response.context if 'sort_by' in context)
+        self.assertEqual(page.object_list[0].id, self.contents[0].id)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PopularityTests(TestCase):
+    def rated(self, title, rating_sum, rating_count, views=0):
+        content = make_content(title)
+        Content.objects.filter(id=content.id).update(rating_sum=rating_sum, rating_count=rating_count, views_count=views)
+        return content
+
+    def scores(self):
+        return dict(Analytics.objects.values_list('content_id', 'popularity_score'))
+
+    def test_many_good_ratings_outrank_one_perfect_rating(self):
+        one = self.rated('One perfect', 5, 1)
+        many = self.rated('Many good', 90, 20)
+        poor = self.rated('Many poor', 40, 20)
+        unrated = make_content('Unrated')
+        self.assertEqual(compute_popularity(view_weight=0), 4)
+        scores = self.scores()
+        self.assertGreater(scores[many.id], scores[one.id])
+        self.assertGreater(scores[one.id], scores[unrated.id])
+        self.assertGreater(scores[unrated.id], scores[poor.id])
+        # A title without ratings gets the catalog mean
+        self.assertAlmostEqual(scores[unrated.id], 135 / 41 / 5)
+        self.assertEqual(dict(Content.objects.values_list('id', 'popularity')), scores)
+
+    def test_views_break_rating_ties(self):
+        quiet = self.rated('Quiet', 20, 5, views=10)
+        watched = self.rated('Watched', 20, 5, views=1000)
+        compute_popularity()
+        self.assertGreater(self.scores()[watched.id], self.scores()[quiet.id])
+        # A rerun updates the same rows
+        compute_popularity(view_weight=0)
+        self.assertEqual(Analytics.objects.count(), 2)
+        self.assertAlmostEqual(self.scores()[watched.id], self.scores()[quiet.id])
+        self.assertEqual(Analytics.objects.get(content=watched).total_views, 1000)
+
+    def test_rating_listings_are_invalidated(self):
+        self.rated('Rated', 4, 1)
+        version = get_catalog_version()
+        compute_popularity()
+        self.assertNotEqual(get_catalog_version(), version)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecommendationCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.enterContext(mock.patch.dict(caching._stats, clear=True))
+        self.user, self.other = User.objects.create_user('viewer'), User.objects.create_user('other')
+        self.content = make_content('Watched')
+
+    def test_hits_until_the_users_signals_change(self):
+        compute = mock.Mock(side_effect=lambda user, limit: [self.content.id])
+        self.assertEqual(cached_recommendations(self.user, compute), [self.content.id])
+        cached_recommendations(self.user, compute)
+        self.assertEqual(compute.call_count, 1)
+        # Another user's rating leaves this user's entry alone; their own invalidates it
+        Rating.objects.create(user=self.other, content=self.content, rating_value=3)
+        cached_recommendations(self.user, compute)
+        self.assertEqual(compute.call_count, 1)
+        Watchlist.objects.create(user=self.user, content=self.content)
+        cached_recommendations(self.user, compute)
+        self.assertEqual(compute.call_count, 2)
+        self.assertEqual(recommendation_cache_stats(), {'hits': 2, 'misses': 2, 'hit_ratio': 0.5})
+
+    def test_publish_keeps_two_generations(self):
+        self.assertEqual(get_published('lists', ['a']), {})
+        first = publish('lists', {'a': 1, 'b': 2}, 60)
+        second = publish('lists', {'a': 3}, 60)
+        self.assertEqual(get_published('lists', ['a', 'b']), {'a': 3})
+        # The previous generation stays for readers that fetched the old pointer
+        self.assertEqual(cache.get(f'lists:{first}:a'), 1)
+        publish('lists', {'a': 5}, 60)
+        self.assertEqual(cache.get_many([f'lists:{first}:a', f'lists:{first}:b']), {})
+        self.assertEqual(cache.get(f'lists:{second}:a'), 3)
+        self.assertEqual(get_published('lists', ['a']), {'a': 5})
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.rated = make_content('Rated')
+        self.other = make_content('Other')
+        self.user = User.objects.create_user('rater')
+
+    def test_rating_only_invalidates_its_title(self):
+        catalog = get_catalog_version()
+        versions = get_content_versions([self.rated.id, self.other.id])
+        render_cards([self.rated, self.other])
+        self.assertEqual(serialized_contents([self.rated.id], set())[self.rated.id]['rating_count'], 0)
+
+        Rating.objects.create(user=self.user, content=self.rated, rating_value=4)
+        self.assertEqual(get_catalog_version(), catalog)
+        after = get_content_versions([self.rated.id, self.other.id])
+        self.assertNotEqual(after[self.rated.id], versions[self.rated.id])
+        self.assertEqual(after[self.other.id], versions[self.other.id])
+        # Only the rated card misses: one query for its OTT platforms
+        contents = list(Content.objects.filter(id__in=[self.rated.id, self.other.id]).order_by('id'))
+        with self.assertNumQueries(1):
+            render_cards(contents)
+        self.assertEqual(serialized_contents([self.rated.id], set())[self.rated.id]['rating_count'], 1)
+
+    def test_listing_writes_bump_the_catalog(self):
+        catalog = get_catalog_version()
+        self.other.description = 'Rewritten'
+        self.other.save(update_fields=['description'])
+        self.assertEqual(get_catalog_version(), catalog)
+        ContentOTT.objects.create(content=self.other, platform_name='Netflix', watch_url='https://example.com')
+        self.assertNotEqual(get_catalog_version(), catalog)
+
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.old = make_content('Old', release_date=datetime.date(2019, 1, 1))
+        self.series = make_content('Series', content_type='Web Series', release_date=datetime.date(2021, 1, 1))
+        self.new = make_content('New', release_date=datetime.date(2022, 1, 1))
+        ContentOTT.objects.create(content=self.series, platform_name='Netflix', watch_url='https://example.com')
+        season = Season.objects.create(content=self.series, season_number=1)
+        Episode.objects.create(season=season, episode_number=1, title='Pilot', duration=40)
+
+    def test_fields_and_include(self):
+        response = self.client.get(reverse('recommendox:api_content_detail', args=[self.series.id]),
+                                   {'fields': 'title', 'include': 'ott_platforms,seasons.episodes'})
+        data = response.json()
+        self.assertEqual(set(data), {'id', 'title', 'ott_platforms', 'seasons'})
+        self.assertEqual(data['ott_platforms'][0]['platform_name'], 'Netflix')
+        self.assertEqual(data['seasons'][0]['episodes'][0]['title'], 'Pilot')
+        response = self.client.get(reverse('recommendox:api_content_detail', args=[self.series.id]), {'fields': 'nope'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('recommendox:api_content_detail', args=[self.series.id]), {'include': 'nope'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_keeps_order_and_lists_missing(self):
+        response = self.client.get(reverse('recommendox:api_content_bulk'),
+                                   {'ids': f'{self.new.id},999,{self.old.id},{self.new.id}', 'fields': 'title'})
+        data = response.json()
+        self.assertEqual([item['title'] for item in data['results']], ['New', 'Old'])
+        self.assertEqual(data['missing'], [999])
+        self.assertEqual(self.client.get(reverse('recommendox:api_content_bulk'), {'ids': 'a,b'}).status_code, 400)
+
+    def test_unknown_ids_create_no_cache_keys(self):
+        self.client.get(reverse('recommendox:api_content_bulk'), {'ids': '998,999'})
+        self.assertEqual(self.client.get(reverse('recommendox:api_content_detail', args=[997])).status_code, 404)
+        self.assertEqual(cache.get_many([f'content:version:{content_id}' for content_id in (997, 998, 999)]), {})
+        # A real row gets its version on first use, e.g. after the key was evicted
+        cache.delete(f'content:version:{self.old.id}')
+        self.assertIsNone(get_content_versions([self.old.id], create=False)[self.old.id])
+        self.assertIn(self.old.id, serialized_contents([self.old.id], set()))
+        self.assertIsNotNone(get_content_versions([self.old.id], create=False)[self.old.id])
+
+    def test_cursor_pages_newest_first(self):
+        url = reverse('recommendox:api_content_list')
+        first = self.client.get(url, {'limit': 2, 'fields': 'title'}).json()
+        self.assertEqual(first['count'], 3)
+        self.assertEqual([item['title'] for item in first['results']], ['New', 'Series'])
+        second = self.client.get(first['next']).json()
+        self.assertEqual([item['title'] for item in second['results']], ['Old'])
+        self.assertIsNone(second['next'])
+        back = self.client.get(second['previous']).json()
+        self.assertEqual([item['title'] for item in back['results']], ['New', 'Series'])
+        # A cursor that does not verify starts over at the first page
+        forged = self.client.get(url, {'limit': 2, 'cursor': 'forged', 'fields': 'title'}).json()
+        self.assertEqual([item['title'] for item in forged['results']], ['New', 'Series'])
+
+
+TIERED_CACHES = {
+    **TEST_CACHES,
+    'tiered': {
+        'BACKEND': 'recommendox.tiered_cache.TieredCache',
+        'LOCATION': 'recommendox-tests-tiered',
+        'OPTIONS': {'SHARED': 'tiered-shared'},
+    },
+    'tiered-shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'recommendox-tests-tiered-shared'},
+}
+
+
+@override_settings(CACHES=TIERED_CACHES)
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        self.cache = caches['tiered']
+        self.cache.clear()
+        self.enterContext(mock.patch.object(tiered_cache, 'FLIGHT_WAIT', 0.1))
+
+    def test_foreign_lease_is_left_alone(self):
+        # Another process is recomputing and holds the lease
+        self.cache.shared.add('k:lease', 'theirs', 30)
+        self.assertEqual(self.cache.get_or_set('k', lambda: 'mine', 60), 'mine')
+        self.assertEqual(self.cache.shared.get('k:lease'), 'theirs')
+
+    def test_own_lease_is_released(self):
+        self.assertEqual(self.cache.get_or_set('k', lambda: 'value', 60), 'value')
+        self.assertIsNone(self.cache.shared.get('k:lease'))
+
+    def test_cold_miss_does_not_queue_forever_behind_a_slow_thread(self):
+        flight = self.cache._flights[hash(self.cache._local_key('k', None)) % tiered_cache.FLIGHT_LOCKS]
+        flight.acquire()
+        try:
+            result = []
+            worker = threading.Thread(target=lambda: result.append(self.cache.get_or_set('k', lambda: 'value', 60)))
+            worker.start()
+            worker.join(5)
+            self.assertFalse(worker.is_alive())
+            self.assertEqual(result, ['value'])
+        finally:
+            flight.release()
+
+    def test_deploy_check_requires_an_atomic_shared_backend(self):
+        self.assertEqual([warning.id for warning in tiered_cache.check_shared_backend(None)], ['recommendox.W001'])
+        atomic = dict(TIERED_CACHES, **{'tiered-shared': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}})
+        with override_settings(CACHES=atomic):
+            self.assertEqual(tiered_cache.check_shared_backend(None), [])
+        sqlite = dict(TIERED_CACHES, **{'tiered-shared': {'BACKEND': 'recommendox.sqlite_cache.SQLiteCache'}})
+        with override_settings(CACHES=sqlite):
+            self.assertEqual(tiered_cache.check_shared_backend(None), [])
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'shared.sqlite3')
+        self.cache = SQLiteCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 10}})
+
+    def test_get_set_and_expiry(self):
+        self.cache.set_many({'a': {'x': 1}, 'b': [2]}, 60)
+        self.cache.set('gone', 1, 60)
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'a': {'x': 1}, 'b': [2]})
+        with mock.patch('time.time', return_value=time.time() + 120):
+            self.assertIsNone(self.cache.get('gone'))
+            self.assertFalse(self.cache.has_key('a'))
+        self.assertTrue(self.cache.delete('gone'))
+        self.assertIsNone(self.cache.get('gone'))
+
+    def test_add_only_replaces_an_expired_row(self):
+        self.assertTrue(self.cache.add('lease', 'first', 60))
+        self.assertFalse(self.cache.add('lease', 'second', 60))
+        self.assertEqual(self.cache.get('lease'), 'first')
+        with mock.patch('time.time', return_value=time.time() + 120):
+            self.assertTrue(self.cache.add('lease', 'third', 60))
+        self.assertTrue(self.cache.add('forever', 1, None))
+        self.assertFalse(self.cache.add('forever', 2, None))
+
+    def test_incr_is_atomic_across_connections(self):
+        self.cache.set('counter', 0, None)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+        def bump():
+            # Each thread is its own backend instance, as in separate workers
+            other = SQLiteCache(self.path, {})
+            for _ in range(50):
+                other.incr('counter')
+        workers = [threading.Thread(target=bump) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_cull_keeps_keys_without_a_timeout(self):
+        self.cache.set('version', 7, None)
+        with mock.patch('recommendox.sqlite_cache.CULL_EVERY', 1):
+            for i in range(20):
+                self.cache.set(f'page:{i}', i, 60 + i)
+        self.assertEqual(self.cache.get('version'), 7)
+        self.assertIsNone(self.cache.get('page:0'))
+        self.assertEqual(self.cache.get('page:19'), 19)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CollaborativeFilteringTests(TestCase):
+    def setUp(self):
+        self.a, self.b, self.c = (make_content(title) for title in 'ABC')
+        # A and B are liked together, C by nobody who likes them
+        for i, values in enumerate([(5, 5, 1), (4, 4, 2), (5, 4, 1)]):
+            user = User.objects.create_user(f'fan{i}')
+            for content, value in zip((self.a, self.b, self.c), values):
+                Rating.objects.create(user=user, content=content, rating_value=value)
+
+    def test_neighbors_and_scoring(self):
+        self.assertGreater(build_item_neighbors(top_n=2), 0)
+        neighbors = list(ItemNeighbor.objects.filter(kind='cf', content=self.a).values_list('neighbor_id', flat=True))
+        self.assertEqual(neighbors, [self.b.id])
+        with self.assertNumQueries(1):
+            ranked = score_items_for_user({self.a.id: 5}, set())
+        self.assertEqual([cid for cid, _ in ranked], [self.b.id])
+        self.assertEqual(score_items_for_user({self.a.id: 5}, set(), exclude_ids={self.b.id}), [])
+        # A neutral rating carries no signal either way
+        self.assertEqual(score_items_for_user({self.a.id: 3}, set()), [])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class FactorizationTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'factors.npz')
+        self.x1, self.x2, self.y1, self.y2 = (make_content(title) for title in ('X1', 'X2', 'Y1', 'Y2'))
+        for group, liked in enumerate([(self.x1, self.x2), (self.y1, self.y2)]):
+            for i in range(4):
+                user = User.objects.create_user(f'group{group}-{i}')
+                for content in liked:
+                    Rating.objects.create(user=user, content=content, rating_value=5)
+        self.user = User.objects.create_user('target')
+        Rating.objects.create(user=self.user, content=self.x1, rating_value=5)
+        Rating.objects.create(user=self.user, content=self.y1, rating_value=1)
+
+    def test_train_recommend_and_fold_in(self):
+        model = train_factors(factors=4, iterations=15, path=self.path)
+        seen = {self.x1.id, self.y1.id}
+        self.assertEqual(model.recommend(self.user.id, limit=1, exclude_ids=seen)[0][0], self.x2.id)
+        # A user the model was not trained on is folded in from their history
+        folded = model.recommend(-1, limit=1, exclude_ids=seen, ratings={self.x1.id: 5, self.y1.id: 1})
+        self.assertEqual(folded[0][0], self.x2.id)
+        self.assertEqual(model.recommend(-1), [])
+
+        loaded = load_model(self.path)
+        np.testing.assert_array_equal(loaded.item_ids, model.item_ids)
+        self.assertIs(load_model(self.path), loaded)
+        # Warm start: a retrain with no sweeps keeps the saved factors
+        again = train_factors(factors=4, iterations=0, path=self.path)
+        np.testing.assert_allclose(again.item_factors, loaded.item_factors)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class EvaluationTests(TestCase):
+    def test_ndcg(self):
+        self.assertEqual(_ndcg([1, 2, 3], {1}, 3), 1.0)
+        self.assertAlmostEqual(_ndcg([1, 2, 3], {2}, 3), 1 / np.log2(3))
+        self.assertEqual(_ndcg([1, 2, 3], {4}, 3), 0.0)
+        # Only the top k count
+        self.assertEqual(_ndcg([1, 2, 3], {3}, 2), 0.0)
+
+    def test_time_split_holds_out_the_newest_ratings(self):
+        user = User.objects.create_user('rater')
+        now = timezone.now()
+        contents = []
+        for days_ago, value in [(4, 5), (3, 2), (2, 5), (1, 3)]:
+            content = make_content(f'{days_ago} days ago')
+            rating = Rating.objects.create(user=user, content=content, rating_value=value)
+            Rating.objects.filter(id=rating.id).update(rating_date=now - datetime.timedelta(days=days_ago))
+            contents.append(content)
+        # Only held-out ratings of RELEVANT_RATING or more count as relevant
+        self.assertEqual(time_split(test_fraction=0.5), {user.id: {contents[2].id}})
+        self.assertEqual(set(Rating.objects.values_list('content_id', flat=True)), {contents[0].id, contents[1].id})
+
+    def test_evaluate_aggregates_quality_and_speed(self):
+        contents = [make_content(f'Title {i}') for i in range(5)]
+        recommended = {1: contents[:2], 2: contents[2:4]}
+        relevant = {1: {contents[0].id}, 2: {contents[0].id, contents[1].id}}
+
+        def pipeline(user, limit):
+            return PipelineResult(recommended[user.id], {}, {'rank': 2.0}, [])
+
+        with mock.patch('recommendox.evaluation.run_pipeline', side_effect=pipeline):
+            report = evaluate(relevant, k=2)
+        self.assertEqual(report['users_evaluated'], 2)
+        self.assertEqual(report['quality'], {
+            'precision@2': 0.25, 'recall@2': 0.5, 'ndcg@2': 0.5, 'catalog_coverage': 0.8,
+        })
+        self.assertEqual(report['queries'], {'mean': 0.0, 'max': 0})
+        self.assertEqual(report['stage_latency_ms']['rank']['p99'], 2.0)
+        self.assertEqual(set(report['latency_ms']), {'p50', 'p95', 'p99', 'mean'})
+        json.dumps(report)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class EngagementTests(TestCase):
+    def test_rollup_compacts_and_prunes(self):
+        content = make_content('Watched')
+        now = datetime.datetime(2026, 3, 10, 12, 30, tzinfo=datetime.timezone.utc)
+        old_day = now - datetime.timedelta(days=5)
+        yesterday = now - datetime.timedelta(days=1)
+        for at in (old_day.replace(hour=1), old_day.replace(hour=20), yesterday.replace(hour=3)):
+            record_event(content.id, 'view', count=2, at=at)
+        record_event(content.id, 'rating', at=now)
+
+        summary = rollup(now=now)
+        self.assertEqual(summary['daily_rows'], 2)
+        # Hourly rows older than the retention window are gone, their days are kept
+        self.assertEqual(summary['pruned_hourly'], 2)
+        series = {point['day'].date(): point['view'] for point in daily_series(content.id, days=7, now=now)}
+        self.assertEqual(series[old_day.date()], 4)
+        self.assertEqual(series[yesterday.date()], 2)
+        self.assertEqual(rollup(now=now)['daily_rows'], 1)
+        self.assertEqual(daily_series(content.id, days=7, now=now)[-2]['view'], 2)
+        self.assertEqual(recent_counts(content.id, hours=24, now=now)['rating'], 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ViewCounterTests(TestCase):
+    def setUp(self):
+        self.content = make_content('Viewed')
+        # No flush thread: the test drives the flushes
+        self.buffer = ViewCounterBuffer(60)
+        self.enterContext(mock.patch.object(self.buffer, '_ensure_thread'))
+
+    def views(self):
+        self.content.refresh_from_db()
+        return self.content.views_count
+
+    def test_views_are_buffered_until_flushed(self):
+        for _ in range(3):
+            self.buffer.increment(self.content.id)
+        self.assertEqual((self.views(), self.buffer.depth()), (0, 3))
+        Content.objects.filter(id=self.content.id).update(views_count=F('views_count') + 5)
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual((self.views(), self.buffer.depth()), (8, 0))
+        self.assertEqual(recent_counts(self.content.id)['view'], 3)
+        self.assertEqual(self.buffer.stats()['flushed_views'], 3)
+
+    def test_full_buffer_wakes_the_flush_thread(self):
+        other = make_content('Other')
+        with mock.patch('recommendox.counters.MAX_PENDING_CONTENT', 2):
+            self.buffer.increment(self.content.id)
+            self.assertFalse(self.buffer._wake.is_set())
+            self.buffer.increment(other.id)
+        # The request only signals; the write is left to the thread
+        self.assertTrue(self.buffer._wake.is_set())
+        self.assertEqual((self.views(), self.buffer.depth()), (0, 2))
+
+    def test_failed_flush_keeps_the_views(self):
+        self.buffer.increment(self.content.id, count=2)
+        with mock.patch.object(self.buffer, '_write', side_effect=DatabaseError), \
+                self.assertLogs('recommendox.counters', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.buffer.depth(), 2)
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(self.views(), 2)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class FacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        action = make_content('Action EN', genre='Action')
+        make_content('Action HI', genre='Action', language='Hindi')
+        comedy = make_content('Comedy EN', genre='Comedy')
+        ContentOTT.objects.create(content=action, platform_name='Netflix', watch_url='https://example.com/a')
+        ContentOTT.objects.create(content=comedy, platform_name='Netflix', watch_url='https://example.com/c')
+
+    def test_counts_skip_their_own_filter(self):
+        filters = {'genre': 'Action', 'language': 'English'}
+        counts = facet_counts(filters)
+        self.assertEqual(counts['genre'], [('Action', 1), ('Comedy', 1)])
+        self.assertEqual(counts['language'], [('English', 1), ('Hindi', 1)])
+        self.assertEqual(counts['platform'], [('Netflix', 1)])
+        self.assertEqual(matching_total(counts, filters), 1)
+        on_netflix = {'platform': 'Netflix'}
+        self.assertEqual(matching_total(facet_counts(on_netflix), on_netflix), 2)
+
+    def test_cached_until_the_catalog_changes(self):
+        facet_counts({})
+        with self.assertNumQueries(0):
+            self.assertEqual(matching_total(facet_counts({}), {}), 3)
+        make_content('Drama EN')
+        self.assertEqual(matching_total(facet_counts({}), {}), 4)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CreditTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.heist = make_content('Heist', director='Chris Nolan', cast='Tom Hanks, tom  hanks, Meryl Streep',
+                                      description='A caper produced by Emma Thomas and written by J. Nolan.')
+            self.other = make_content('Other', cast='Meryl Streep')
+
+    def test_extraction(self):
+        credits = extract_credits(self.heist)
+        self.assertEqual(sorted(role for _, role in credits), ['cast', 'cast', 'director', 'producer', 'writer'])
+        # The first spelling of a name is the one displayed
+        self.assertEqual(credits[('tom hanks', 'cast')], 'Tom Hanks')
+        self.assertEqual(credits[('emma thomas', 'producer')], 'Emma Thomas')
+        self.assertEqual(credits[('j. nolan', 'writer')], 'J. Nolan')
+
+    def test_filmography_follows_edits(self):
+        meryl = Person.objects.get(normalized_name='meryl streep')
+        self.assertEqual(set(filmography(meryl, ['cast'])), {self.heist, self.other})
+        nolan = Person.objects.get(normalized_name='chris nolan')
+        self.assertEqual(list(filmography(nolan, ['director'])), [self.heist])
+        self.assertEqual(list(filmography(nolan, ['cast'])), [])
+        self.assertFalse(filmography(None, ['cast']).exists())
+        self.other.cast = 'Tom Hanks'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.save()
+        self.assertEqual(list(filmography(meryl, ['cast'])), [self.heist])
+
+    def test_prune_keeps_credited_and_linked_people(self):
+        Person.objects.create(name='Nobody', normalized_name='nobody')
+        golden = GoldenUser.objects.create(
+            user_profile=UserProfile.objects.create(user=User.objects.create_user('linked')), profession='Actor',
+        )
+        Person.objects.create(name='Linked', normalized_name='linked', golden_user=golden)
+        self.assertEqual(prune_people(), 1)
+        self.assertFalse(Person.objects.filter(normalized_name='nobody').exists())
+        self.assertTrue(Person.objects.filter(normalized_name='linked').exists())
+        self.assertEqual(rebuild_credits(), (2, 6))
+
+    def test_sync_recreates_people_pruned_under_it(self):
+        bulk_create = Person.objects.bulk_create
+
+        def pruned_after_insert(people, **kwargs):
+            created = bulk_create(people, **kwargs)
+            if insert.call_count == 1:
+                # A prune that ran between the sync's insert and its lock
+                Person.objects.filter(normalized_name='meryl streep').delete()
+            return created
+
+        with mock.patch.object(Person.objects, 'bulk_create', side_effect=pruned_after_insert) as insert:
+            sync_credits([self.other])
+        self.assertEqual(insert.call_count, 2)
+        self.assertEqual(list(filmography(Person.objects.get(normalized_name='meryl streep'), ['cast'])), [self.other])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RoleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('member')
+        self.profile = UserProfile.objects.create(user=self.user)
+        self.client.force_login(User.objects.create_user('boss', is_staff=True))
+        self.session = {}
+
+    def roles(self, user=None, session=None):
+        request = RequestFactory().get('/')
+        request.user = user or self.user
+        request.session = self.session if session is None else session
+        return roles_for_request(request)
+
+    def test_resolved_in_one_query_and_kept_in_the_session(self):
+        Reviewer.objects.create(user_profile=self.profile, is_active=True)
+        GoldenUser.objects.create(user_profile=self.profile, profession='Director', verification_status='Verified')
+        with self.assertNumQueries(1):
+            roles = self.roles()
+        self.assertEqual(roles, Roles(True, False, 'Verified', 'Director'))
+        self.assertTrue(roles.is_verified_golden)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.roles(), roles)
+        # A session is only trusted for the user who stored it
+        self.assertEqual(self.roles(User.objects.create_user('other')), NO_ROLES)
+        self.assertEqual(self.roles(AnonymousUser(), {}), NO_ROLES)
+
+    def test_role_changes_reach_existing_sessions(self):
+        self.assertEqual(self.roles(), NO_ROLES)
+        self.client.get(reverse('recommendox:make_reviewer', args=[self.user.id]))
+        self.assertTrue(self.roles().is_reviewer)
+
+        ContentCreator.objects.create(user_profile=self.profile, is_active=True)
+        self.assertTrue(self.roles().is_creator)
+        self.client.get(reverse('recommendox:remove_creator', args=[self.user.id]))
+        self.assertFalse(self.roles().is_creator)
+
+        golden = GoldenUser.objects.create(user_profile=self.profile, profession='Critic')
+        self.assertEqual(self.roles().golden_status, 'Pending')
+        self.client.post(reverse('recommendox:verify_golden_users'), {'golden_id': golden.id, 'action': 'verify'})
+        self.assertTrue(self.roles().is_verified_golden)
+        # Profile counters are not role changes
+        golden.increment_content_views()
+        with self.assertNumQueries(0):
+            self.roles()
+        self.assertEqual(GoldenUser.objects.get(id=golden.id).total_content_views, 1)
+
+    def test_annotate_roles_for_a_whole_page(self):
+        Reviewer.objects.create(user_profile=self.profile, is_active=True)
+        with self.assertNumQueries(1):
+            users = {user.username: user for user in annotate_roles(User.objects.all())}
+        self.assertEqual((users['member'].is_reviewer, users['member'].is_creator), (True, False))
+        # Users without a profile get no roles rather than an error
+        self.assertEqual((users['boss'].is_reviewer, users['boss'].golden_status), (False, None))
@@ -0,0 +1,9 @@
+# recommendox/text.py
+"""Text helpers shared by the search, autocomplete and credits code."""
+import unicodedata
+
+
+def normalize(text):
+    """Lowercase and strip accents, so 'Amélie' matches 'amel'"""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
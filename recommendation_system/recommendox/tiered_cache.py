@@ -0,0 +1,349 @@
+# recommendox/tiered_cache.py
+"""
+Two-tier cache backend: a small per-process LRU in front of a shared cache.
+
+Reads are served from the process-local LRU for at most LOCAL_TIMEOUT
+seconds, then from the shared backend (another entry in CACHES). Writes,
+deletes and incr() go to the shared backend and drop the local copy, so a
+worker sees its own writes at once and other workers' writes within
+LOCAL_TIMEOUT seconds.
+
+get_or_set() with a callable is protected against stampedes:
+
+- probabilistic early expiration ("XFetch"): each read recomputes a little
+  ahead of expiry with a probability that grows as expiry approaches and
+  with how long the value took to compute, so one request refreshes a hot
+  key before it expires instead of all of them at once after;
+- single flight: one thread per process (a lock per key) and one process per
+  host (a short lease key in the shared cache) recomputes. Everyone else
+  keeps serving the previous value or, on a cold miss, waits up to
+  FLIGHT_WAIT seconds for the winner's value.
+
+Hits, misses and recomputes are counted per key prefix (the text before
+the first ':') for stats().
+
+The leases above and the version counters in caching.py rely on the shared
+backend's add() and incr() being atomic. The default, sqlite_cache.SQLiteCache,
+is for all the workers of one host; Redis and Memcached for several hosts.
+FileBasedCache (one file per key, read-modify-write) is not atomic, so two
+processes could both win a lease or lose an increment; `manage.py check
+--deploy` warns about it and any other shared backend (recommendox.W001).
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'recommendox.tiered_cache.TieredCache',
+            'OPTIONS': {'SHARED': 'shared', 'LOCAL_MAX_ENTRIES': 2000, 'LOCAL_TIMEOUT': 5},
+        },
+        'shared': {'BACKEND': 'recommendox.sqlite_cache.SQLiteCache', 'LOCATION': '.../shared.sqlite3'},
+    }
+"""
+import math
+import pickle
+import random
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, defaultdict, namedtuple
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+LOCAL_MAX_ENTRIES = 1000
+LOCAL_TIMEOUT = 5           # seconds a value may be served from process memory
+XFETCH_BETA = 1.0           # > 1 refreshes earlier, < 1 later
+FLIGHT_LEASE = 30           # seconds one process may hold a recompute lease
+FLIGHT_WAIT = 2.0           # seconds a cold miss waits for another process's value
+FLIGHT_POLL = 0.05
+FLIGHT_LOCKS = 64           # per-process locks, shared by keys with the same hash
+# Shared backends whose add() and incr() are atomic across processes
+ATOMIC_BACKENDS = {
+    'recommendox.sqlite_cache.SQLiteCache',
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+}
+
+# What get_or_set() stores: the value, how long it took to compute, and when it expires
+_Entry = namedtuple('_Entry', 'value delta expires')
+_MISSING = object()
+
+
+# Process-wide state per LOCATION. Django creates a backend instance per
+# thread, so the LRU, locks and counters live here to be shared by all of them,
+# as LocMemCache does.
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class _LocalTier:
+    def __init__(self):
+        self.entries = OrderedDict()        # local key -> (expires at, pickled value)
+        self.lock = threading.Lock()
+        self.flights = [threading.Lock() for _ in range(FLIGHT_LOCKS)]
+        self.stats = defaultdict(Counter)
+
+
+def _prefix(key):
+    return str(key).split(':', 1)[0]
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._max_entries = options.get('LOCAL_MAX_ENTRIES', LOCAL_MAX_ENTRIES)
+        self._local_timeout = options.get('LOCAL_TIMEOUT', LOCAL_TIMEOUT)
+        self._beta = options.get('XFETCH_BETA', XFETCH_BETA)
+        with _tiers_lock:
+            tier = _tiers.setdefault(location, _LocalTier())
+        self._local = tier.entries
+        self._lock = tier.lock
+        self._flights = tier.flights
+        self._stats = tier.stats
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    # Local tier
+
+    def _local_key(self, key, version):
+        return self.shared.make_key(key, version=version)
+
+    def _local_get(self, local_key):
+        with self._lock:
+            item = self._local.get(local_key)
+            if item is None:
+                return _MISSING
+            expires, data = item
+            if expires < time.monotonic():
+                del self._local[local_key]
+                return _MISSING
+            self._local.move_to_end(local_key)
+        return pickle.loads(data)
+
+    def _local_set(self, local_key, value, timeout):
+        ttl = self._local_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            ttl = min(ttl, timeout)
+        if ttl <= 0:
+            self._local_delete(local_key)
+            return
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[local_key] = (time.monotonic() + ttl, data)
+            self._local.move_to_end(local_key)
+            while len(self._local) > self._max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, local_key):
+        with self._lock:
+            self._local.pop(local_key, None)
+
+    def _count(self, key, stat, amount=1):
+        self._stats[_prefix(key)][stat] += amount
+
+    # Cache API
+
+    def _get_raw(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        value = self._local_get(local_key)
+        if value is not _MISSING:
+            self._count(key, 'local_hits')
+            return value
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            self._count(key, 'misses')
+            return default
+        self._count(key, 'shared_hits')
+        self._local_set(local_key, value, DEFAULT_TIMEOUT)
+        return value
+
+    def get(self, key, default=None, version=None):
+        value = self._get_raw(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        return value.value if isinstance(value, _Entry) else value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._local_set(self._local_key(key, version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        self._local_delete(self._local_key(key, version))
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local_delete(self._local_key(key, version))
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._local_delete(self._local_key(key, version))
+        return self.shared.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        return self._get_raw(key, _MISSING, version=version) is not _MISSING
+
+    def incr(self, key, delta=1, version=None):
+        self._local_delete(self._local_key(key, version))
+        return self.shared.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._local_delete(self._local_key(key, version))
+        return self.shared.decr(key, delta, version=version)
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remote = []
+        for key in keys:
+            value = self._local_get(self._local_key(key, version))
+            if value is _MISSING:
+                remote.append(key)
+            else:
+                self._count(key, 'local_hits')
+                found[key] = value
+        if remote:
+            fetched = self.shared.get_many(remote, version=version)
+            for key in remote:
+                if key in fetched:
+                    self._count(key, 'shared_hits')
+                    self._local_set(self._local_key(key, version), fetched[key], DEFAULT_TIMEOUT)
+                    found[key] = fetched[key]
+                else:
+                    self._count(key, 'misses')
+        return {key: value.value if isinstance(value, _Entry) else value for key, value in found.items()}
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            self._local_set(self._local_key(key, version), value, timeout)
+        return failed
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._local_delete(self._local_key(key, version))
+        self.shared.delete_many(keys, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+    # Stampede protection
+
+    def _stale(self, entry):
+        if entry.expires is None:
+            return False
+        return time.time() - entry.delta * self._beta * math.log(random.random()) >= entry.expires
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        entry = self._get_raw(key, version=version)
+        if entry is not None and not isinstance(entry, _Entry):
+            return entry
+        if entry is not None and not self._stale(entry):
+            return entry.value
+        if not callable(default):
+            if entry is None:
+                self.add(key, default, timeout, version=version)
+                return self.get(key, default, version=version)
+            return entry.value
+
+        flight = self._flights[hash(self._local_key(key, version)) % FLIGHT_LOCKS]
+        if entry is not None:
+            acquired = flight.acquire(blocking=False)
+        else:
+            acquired = flight.acquire(timeout=FLIGHT_WAIT)
+        if not acquired:
+            if entry is not None:
+                # Another thread of this process is already refreshing it
+                self._count(key, 'served_stale')
+                return entry.value
+            fresh = self.shared.get(key, version=version)
+            if isinstance(fresh, _Entry):
+                self._count(key, 'coalesced')
+                return fresh.value
+            # The thread holding the lock is slow; compute without it rather than queue behind it
+            return self._recompute(key, default, timeout, version, entry)
+        try:
+            # It may have been filled while this thread waited for the lock
+            fresh = self.shared.get(key, version=version)
+            if isinstance(fresh, _Entry) and (entry is None or fresh.expires != entry.expires):
+                self._count(key, 'coalesced')
+                return fresh.value
+            lease = f'{key}:lease'
+            token = uuid.uuid4().hex
+            held = self.shared.add(lease, token, FLIGHT_LEASE, version=version)
+            if not held:
+                if entry is not None:
+                    self._count(key, 'served_stale')
+                    return entry.value
+                waited = self._wait_for(key, version)
+                if waited is not None:
+                    self._count(key, 'coalesced')
+                    return waited.value
+            try:
+                return self._recompute(key, default, timeout, version, entry)
+            finally:
+                # Only release our own lease: after a wait, or once ours expired, it belongs to another process
+                if held and self.shared.get(lease, version=version) == token:
+                    self.shared.delete(lease, version=version)
+        finally:
+            flight.release()
+
+    def _recompute(self, key, default, timeout, version, entry):
+        self._count(key, 'early_recomputes' if entry is not None else 'recomputes')
+        started = time.time()
+        value = default()
+        finished = time.time()
+        ttl = self._ttl(timeout)
+        expires = None if ttl is None else finished + ttl
+        self.set(key, _Entry(value, finished - started, expires), timeout, version=version)
+        return value
+
+    def _wait_for(self, key, version):
+        deadline = time.monotonic() + FLIGHT_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(FLIGHT_POLL)
+            entry = self.shared.get(key, version=version)
+            if isinstance(entry, _Entry):
+                return entry
+        return None
+
+    def _ttl(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return None if timeout is None else max(timeout, 0)
+
+    def stats(self):
+        """{prefix: counters and hit ratio} for this process"""
+        report = {}
+        for prefix, counts in sorted(self._stats.items()):
+            hits = counts['local_hits'] + counts['shared_hits']
+            lookups = hits + counts['misses']
+            report[prefix] = dict(counts, hit_ratio=hits / lookups if lookups else 0.0)
+        return report
+
+
+def check_shared_backend(app_configs, **kwargs):
+    """Deploy check: the shared tier of every TieredCache needs atomic add() and incr()"""
+    warnings = []
+    for alias, config in settings.CACHES.items():
+        if config.get('BACKEND') != 'recommendox.tiered_cache.TieredCache':
+            continue
+        shared = config.get('OPTIONS', {}).get('SHARED', 'shared')
+        backend = settings.CACHES.get(shared, {}).get('BACKEND')
+        if backend not in ATOMIC_BACKENDS:
+            warnings.append(checks.Warning(
+                f"The shared tier of cache '{alias}' uses {backend}, whose add() and incr() are not atomic "
+                f"across processes: recompute leases and version counters can race.",
+                hint='Use recommendox.sqlite_cache.SQLiteCache on one host, Redis or Memcached across hosts.',
+                id='recommendox.W001',
+            ))
+    return warnings
@@ -0,0 +1,125 @@
+# recommendox/trending.py
+"""
+Exponentially decayed trending scores.
+
+A title's trending score is sum(w * exp(-lambda * (now - t))) over its
+engagement events. Multiplying through by exp(lambda * (now - t0)) for a fixed
+epoch t0 turns that into sum(w * exp(lambda * (t - t0))): each event adds a
+constant that never has to be decayed again, so recording one is a single
+`trending_score = trending_score + x` UPDATE and the stored values of all
+titles stay directly comparable. Because the addend grows over time,
+rebase() moves the epoch forward and rescales every score. Writers read the
+epoch right before their UPDATE, so only events recorded in the middle of a
+rebase can be mis-scaled.
+
+The epoch is a single TrendingEpoch row. rebase() moves it with a
+compare-and-set UPDATE before rescaling, so when two rebases race only one
+of them applies the decay.
+
+build_trending_lists materializes the global and per-genre top lists and
+publishes them with caching.publish; the home page only ever reads those.
+Both run from the refresh_trending command (schedule it every few minutes),
+never inside a request.
+"""
+import datetime
+import math
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .caching import get_published, publish
+from .models import Analytics, Content, TrendingEpoch
+
+HALF_LIFE_HOURS = 48
+DECAY_RATE = math.log(2) / (HALF_LIFE_HOURS * 3600)   # lambda, per second
+EVENT_WEIGHTS = {'view': 1.0, 'watchlist': 3.0, 'rating': 3.0, 'review': 5.0}
+REBASE_AFTER_DAYS = 1
+MIN_SCORE = 0.05                # decayed scores below this are not trending
+TRENDING_LIST_SIZE = 50
+TRENDING_LIST_TTL = 60 * 60 * 6    # longer than the interval between refresh_trending runs
+LISTS_NAME = 'trending'
+ANY = '*'
+
+
+def trending_key(genre=ANY):
+    return genre.replace(' ', '_')
+
+
+def current_epoch():
+    epoch, _ = TrendingEpoch.objects.get_or_create(
+        name=TrendingEpoch.CURRENT, defaults={'started_at': timezone.now()},
+    )
+    return epoch.started_at
+
+
+def _scaled(weight, at, epoch):
+    return weight * math.exp(DECAY_RATE * (at - epoch).total_seconds())
+
+
+def record_trending(counts, event, at=None):
+    """Add {content_id: count} events of one type to the stored scores"""
+    weight = EVENT_WEIGHTS.get(event)
+    if not weight:
+        return
+    at = at or timezone.now()
+    epoch = current_epoch()
+    for content_id, count in counts.items():
+        amount = _scaled(weight * count, at, epoch)
+        if Analytics.objects.filter(content_id=content_id).update(trending_score=F('trending_score') + amount):
+            continue
+        try:
+            with transaction.atomic():
+                Analytics.objects.create(content_id=content_id, trending_score=amount)
+        except IntegrityError:
+            Analytics.objects.filter(content_id=content_id).update(trending_score=F('trending_score') + amount)
+
+
+def rebase_due(now=None):
+    return (now or timezone.now()) - current_epoch() > datetime.timedelta(days=REBASE_AFTER_DAYS)
+
+
+def rebase(now=None):
+    """Move the epoch to now and rescale every stored score. Returns False if another rebase got there first"""
+    now = now or timezone.now()
+    old = current_epoch()
+    with transaction.atomic():
+        # Compare-and-set: the UPDATE also takes the row lock that orders concurrent rebases
+        if not TrendingEpoch.objects.filter(name=TrendingEpoch.CURRENT, started_at=old).update(started_at=now):
+            return False
+        factor = math.exp(-DECAY_RATE * (now - old).total_seconds())
+        Analytics.objects.filter(trending_score__gt=0).update(trending_score=F('trending_score') * factor)
+        # Fully decayed titles drop out of the index's hot range
+        Analytics.objects.filter(trending_score__gt=0, trending_score__lt=MIN_SCORE).update(trending_score=0)
+    return True
+
+
+def build_trending_lists(size=TRENDING_LIST_SIZE, now=None):
+    """Recompute and publish the global and per-genre top lists. Returns the number of trending titles"""
+    now = now or timezone.now()
+    epoch = current_epoch()
+    # Scores are stored relative to the epoch; decay them to "now" for display
+    scale = math.exp(-DECAY_RATE * (now - epoch).total_seconds())
+    rows = Analytics.objects.filter(
+        trending_score__gte=MIN_SCORE / scale
+    ).order_by('-trending_score').values_list('content_id', 'content__genre', 'trending_score')
+
+    lists = {trending_key(genre): [] for genre, _ in Content.GENRE_CHOICES}
+    lists[trending_key()] = []
+    count = 0
+    for content_id, genre, score in rows.iterator():
+        count += 1
+        item = (content_id, score * scale)
+        if len(lists[trending_key()]) < size:
+            lists[trending_key()].append(item)
+        genre_list = lists.setdefault(trending_key(genre), [])
+        if len(genre_list) < size:
+            genre_list.append(item)
+    publish(LISTS_NAME, lists, TRENDING_LIST_TTL)
+    return count
+
+
+def get_trending(genre=ANY, limit=10):
+    """[(content_id, decayed score), ...] from the last published lists; empty before the first build"""
+    key = trending_key(genre)
+    return get_published(LISTS_NAME, [key]).get(key, [])[:limit]
@@ -1,13 +1,16 @@
 # recommendox/urls.py
 from django.urls import path 
-from . import views
+from . import api, views
 
 app_name = 'recommendox'
 
 urlpatterns = [
     path('', views.home, name='home'), 
     path('browse/', views.content_list, name='content_list'),
+    path('browse/autocomplete/', views.autocomplete, name='autocomplete'),
+    path('browse/semantic/', views.semantic_search_results, name='semantic_search'),
     path('content/<int:content_id>/', views.content_detail, name='content_detail'),
+    path('content/<int:content_id>/more-like-this/', views.more_like_this_results, name='more_like_this'),
     path('register/', views.register, name='register'),
     path('login/', views.user_login, name='login'),
     path('logout/', views.user_logout, name='logout'),
@@ -47,4 +50,9 @@ urlpatterns = [
     path('golden/dashboard/', views.golden_dashboard, name='golden_dashboard'),
     path('golden/analytics/<int:content_id>/', views.golden_content_analytics, name='golden_content_analytics'),
 
+    # Catalog API (read-only)
+    path('api/content/', api.content_list, name='api_content_list'),
+    path('api/content/bulk/', api.content_bulk, name='api_content_bulk'),
+    path('api/content/<int:content_id>/', api.content_detail, name='api_content_detail'),
+
 ]
\ No newline at end of file
@@ -1,11 +1,15 @@
 # recommendox/views.py
 from django.shortcuts import render, get_object_or_404, redirect
+from django.http import HttpResponse, JsonResponse
+from django.core.cache import cache
+from django.urls import reverse
+from urllib.parse import urlencode
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.models import User
-from django.db.models import Q, Count, Avg, F
-from django.core.paginator import Paginator
+from django.db.models import Q, Count, Avg, F, Sum
+from django.db.models.functions import NullIf
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from django import forms
@@ -16,26 +20,25 @@ from .models import (
     Content, UserProfile, GoldenUser, Watchlist, 
     Rating, Review, Analytics, Message, Reviewer, ContentOTT, ContentCreator
 )
+from .pipeline import generator_stats, recommend
+from .content_similarity import similar_content_ids
+from .caching import cache_stats, cached_recommendations, recommendation_cache_stats
+from .precompute import get_precomputed_recommendations
+from .aggregates import average_rating_expression
+from .counters import view_counter
+from .engagement import daily_series, recent_counts
+from .trending import get_trending
+from .search import search_content_ids, search_filter
+from .autocomplete import suggest
+from .embeddings import more_like_this, semantic_search
+from .facets import facet_counts, matching_total
+from .credits import PROFESSION_ROLES, filmography, person_for_golden
+from .pagination import PER_PAGE, encode_cursor, keyset_paginate, offset_paginate, page_cursor
+from .fragments import PAGE_TTL, page_key, render_cards
+from .roles import annotate_roles
+from .conditional import catalog_validators, conditional_page, content_detail_validators, home_validators
 
 #HELPER FUNCTIONS 
-def is_reviewer(user):
-    """Check if user has reviewer role"""
-    if not user.is_authenticated:
-        return False
-    try:
-        return hasattr(user.profile, 'reviewer_profile') and user.profile.reviewer_profile.is_active
-    except:
-        return False
-
-def is_content_creator(user):
-    """Check if user has content creator role"""
-    if not user.is_authenticated:
-        return False
-    try:
-        return hasattr(user.profile, 'creator_profile') and user.profile.creator_profile.is_active
-    except:
-        return False
-
 def content_creator_required(view_func):
     """Decorator to check if user is content creator"""
     def wrapper(request, *args, **kwargs):
@@ -45,71 +48,44 @@ def content_creator_required(view_func):
         if request.user.is_staff:  
             return view_func(request, *args, **kwargs)
         
-        if is_content_creator(request.user):
+        if request.roles.is_creator:
             return view_func(request, *args, **kwargs)
         
         messages.error(request, 'You need to be a verified content creator to access this page.')
         return redirect('recommendox:user_dashboard')
     return wrapper
 
-def get_personalized_recommendations(user):
+def get_personalized_recommendations(user, limit=6):
     """Generate personalized recommendations based on user activity"""
-    recommendations = []
-    seen_ids = set()  
-   
-    user_ratings = Rating.objects.filter(user=user)
-    if user_ratings.exists():
-        from collections import Counter
-        genre_counter = Counter()
-        
-        for rating in user_ratings:
-            if rating.rating_value >= 4: 
-                genre_counter[rating.content.genre] += rating.rating_value
-        
-        if genre_counter:
-            top_genres = [genre for genre, count in genre_counter.most_common(2)]
-           
-            for genre in top_genres:
-                genre_content = Content.objects.filter(
-                    genre=genre
-                ).exclude(
-                    id__in=user_ratings.values_list('content_id', flat=True)
-                ).order_by('-ratings__rating_value')[:3]
-                
-                for content in genre_content:
-                    if content.id not in seen_ids: 
-                        recommendations.append(content)
-                        seen_ids.add(content.id)
-   
-    if len(recommendations) < 6:
-        additional = Content.objects.exclude(
-            id__in=seen_ids 
-        ).order_by('-ratings__rating_value')[:6-len(recommendations)]
-        
-        for content in additional:
-            if content.id not in seen_ids:
-                recommendations.append(content)
-                seen_ids.add(content.id)
-    
-    return recommendations[:6] 
+    return recommend(user, limit=limit)
+
+def get_dashboard_recommendations(user, limit=6):
+    """Precomputed snapshot first, live recommendations for users missing from it"""
+    return get_precomputed_recommendations(user, limit) or get_personalized_recommendations(user, limit)
 
 #PUBLIC VIEWS
+@conditional_page(home_validators)
 def home(request):
     """Public home page"""
+    # Anonymous visitors all see the same page; messages are per visitor, so skip the cache then
+    if not request.user.is_authenticated and not len(messages.get_messages(request)):
+        html = cache.get_or_set(page_key('home'), lambda: _render_home(request).content.decode(), PAGE_TTL)
+        return HttpResponse(html)
+    return _render_home(request)
+
+
+def _render_home(request):
     from django.db.models import Avg, Count
     from datetime import datetime
     
     current_year = datetime.now().year
-    newest_content = Content.objects.order_by('-release_date')[:8]
-    newest_ids = [content.id for content in newest_content]
-    trending_content = Content.objects.filter(
-        id__in=newest_ids
-    ).annotate(
-        average_rating=Avg('ratings__rating_value')
-    ).order_by('-average_rating', '-release_date')
-    
-    for content in trending_content:
-        content.is_new_release = (content.release_date.year == current_year)
+    trending_ids = [content_id for content_id, _ in get_trending(limit=8)]
+    if trending_ids:
+        by_id = Content.objects.in_bulk(trending_ids)
+        trending_content = [by_id[content_id] for content_id in trending_ids if content_id in by_id]
+    else:
+        # No engagement recorded yet: fall back to the newest releases
+        trending_content = Content.objects.order_by('-release_date')[:8]
 
     recent_content = Content.objects.order_by('-created_at')[:6]
     
@@ -118,8 +94,8 @@ def home(request):
     ).order_by('-count')[:5]
     
     context = {
-        'trending_content': trending_content,
-        'recent_content': recent_content,
+        'trending_content': render_cards(trending_content),
+        'recent_content': render_cards(recent_content),
         'popular_genres': popular_genres,
         'total_content': Content.objects.count(),
         'current_year': current_year,
@@ -127,6 +103,30 @@ def home(request):
     return render(request, 'recommendox/home.html', context)
 
 
+def _legacy_page_redirect(request, make_cursor):
+    """Send an old ?page=N link to the same page of the cursor pager"""
+    try:
+        number = int(request.GET['page'])
+    except ValueError:
+        number = 1
+    query = request.GET.copy()
+    del query['page']
+    cursor = make_cursor(number) if number > 1 else None
+    if cursor:
+        query['cursor'] = cursor
+    return redirect(f'{request.path}?{query.urlencode()}' if query else request.path)
+
+
+BROWSE_SORT_KEYS = {
+    'newest': [('release_date', True), ('id', True)],
+    'oldest': [('release_date', False), ('id', False)],
+    'rating': [('popularity', True), ('id', True)],
+    'title_asc': [('title', False), ('id', False)],
+    'title_desc': [('title', True), ('id', True)],
+}
+
+
+@conditional_page(catalog_validators)
 def content_list(request):
     """Browse all content with filters"""
     from django.db.models import Avg, Q
@@ -134,61 +134,144 @@ def content_list(request):
     genre = request.GET.get('genre')
     language = request.GET.get('language')
     content_type = request.GET.get('content_type')
+    platform = request.GET.get('platform')
     search = request.GET.get('search')
-    sort_by = request.GET.get('sort', 'newest') 
+    match = search_filter(search) if search else None
+    sort_by = request.GET.get('sort') or ('relevance' if match is not None else 'newest')
   
-    content_ids = Content.objects.all().values_list('id', flat=True)
+    content_list = Content.objects.all()
    
     if genre:
-        content_ids = content_ids.filter(genre=genre)
+        content_list = content_list.filter(genre=genre)
     if language:
-        content_ids = content_ids.filter(language=language)
+        content_list = content_list.filter(language=language)
     if content_type:
-        content_ids = content_ids.filter(content_type=content_type)
+        content_list = content_list.filter(content_type=content_type)
+    if platform:
+        content_list = content_list.filter(ott_platforms__platform_name=platform)
    
-    if search:
-        content_ids = content_ids.filter(
+    if match is not None:
+        content_list = content_list.filter(match)
+    elif search:
+        # No full-text index on this database
+        content_list = content_list.filter(
             Q(title__icontains=search) |
             Q(description__icontains=search) |
             Q(director__icontains=search) |
             Q(cast__icontains=search)
         )
     
-    content_ids = content_ids.distinct()
-    content_list = Content.objects.filter(id__in=content_ids)
-    if sort_by == 'rating':
-        content_list = content_list.annotate(
-            rating_avg=Avg('ratings__rating_value')
-        ).order_by('-rating_avg', '-release_date')
-    elif sort_by == 'oldest':
-        content_list = content_list.order_by('release_date')
-    elif sort_by == 'title_asc':
-        content_list = content_list.order_by('title')
-    elif sort_by == 'title_desc':
-        content_list = content_list.order_by('-title')
-    else:  
-        content_list = content_list.order_by('-release_date')
-    
-    paginator = Paginator(content_list, 12)
-    page = request.GET.get('page')
-    content = paginator.get_page(page)
-    
-    genres = Content.objects.values_list('genre', flat=True).distinct()
-    languages = Content.objects.values_list('language', flat=True).distinct()
+    cursor = request.GET.get('cursor')
+    relevance = sort_by == 'relevance' and match is not None
+    keys = BROWSE_SORT_KEYS.get(sort_by, BROWSE_SORT_KEYS['newest'])
+    if request.GET.get('page') and not cursor:
+        return _legacy_page_redirect(request, lambda number: (
+            encode_cursor(sort_by, 'next', (number - 1) * PER_PAGE, number) if relevance
+            else page_cursor(content_list, keys, sort_by, number)
+        ))
+
+    filters = {'genre': genre, 'language': language, 'content_type': content_type, 'platform': platform}
+    facets = facet_counts(
+        filters, content_ids=Content.objects.filter(match).values('id') if match is not None else None,
+    )
+    # Without the full-text index the facets do not see the search, so the pager counts for itself
+    total = None if search and match is None else matching_total(facets, filters)
+
+    if relevance:
+        # Keep the search ranking: the ranking query returns one page of ids, the facets give the total
+        content = offset_paginate(
+            lambda offset, limit: search_content_ids(search, within=content_list, limit=limit, offset=offset),
+            total, sort_by, cursor,
+        )
+        by_id = Content.objects.in_bulk(content.object_list)
+        content.object_list = [by_id[cid] for cid in content.object_list if cid in by_id]
+    else:
+        content = keyset_paginate(content_list, keys, sort_by, cursor, total=total)
+    render_cards(content)
     
     context = {
         'content': content,
-        'genres': genres,
-        'languages': languages,
+        'genres': facets['genre'],
+        'languages': facets['language'],
+        'content_types': facets['content_type'],
+        'platforms': facets['platform'],
         'selected_genre': genre,
         'selected_language': language,
         'selected_type': content_type,
+        'selected_platform': platform,
         'search_query': search,
         'sort_by': sort_by,
     }
     return render(request, 'recommendox/content_list.html', context)
 
 
+def autocomplete(request):
+    """JSON suggestions for the browse search box"""
+    query = request.GET.get('q', '')[:100]
+    suggestions = []
+    for item in suggest(query) if len(query.strip()) >= 2 else []:
+        if item['content_id']:
+            url = reverse('recommendox:content_detail', args=[item['content_id']])
+        else:
+            url = f"{reverse('recommendox:content_list')}?{urlencode({'search': item['label']})}"
+        suggestions.append({'label': item['label'], 'kind': item['kind'], 'url': url})
+    return JsonResponse({'query': query, 'suggestions': suggestions})
+
+
+SEMANTIC_LIMIT = 10
+SEMANTIC_MAX_LIMIT = 50
+
+
+def _semantic_limit(request):
+    """?limit= as a number from 1 to SEMANTIC_MAX_LIMIT, or None when it is not one"""
+    try:
+        limit = int(request.GET.get('limit', SEMANTIC_LIMIT))
+    except ValueError:
+        return None
+    return limit if 0 < limit <= SEMANTIC_MAX_LIMIT else None
+
+
+def _semantic_results(hits):
+    titles = dict(Content.objects.filter(id__in=[cid for cid, _ in hits]).values_list('id', 'title')) if hits else {}
+    return [
+        {'id': cid, 'title': titles[cid], 'score': None if score is None else round(score, 4),
+         'url': reverse('recommendox:content_detail', args=[cid])}
+        for cid, score in hits if cid in titles
+    ]
+
+
+def semantic_search_results(request):
+    """JSON titles closest in meaning to ?q=, from the embedding store"""
+    query = request.GET.get('q', '')[:200].strip()
+    limit = _semantic_limit(request)
+    if limit is None:
+        return JsonResponse({'error': f'limit must be between 1 and {SEMANTIC_MAX_LIMIT}'}, status=400)
+    hits = semantic_search(query, limit=limit) if query else []
+    mode = 'semantic'
+    if hits is None:
+        # This worker is still loading the encoder: answer from the keyword index meanwhile
+        ids = search_content_ids(query, limit=limit)
+        if ids is None:
+            response = JsonResponse({'error': 'Semantic search is starting up, try again shortly'}, status=503)
+            response['Retry-After'] = '30'
+            return response
+        hits, mode = [(cid, None) for cid in ids], 'keyword'
+    return JsonResponse({'query': query, 'mode': mode, 'results': _semantic_results(hits)})
+
+
+def more_like_this_results(request, content_id):
+    """JSON titles closest in meaning to a content"""
+    limit = _semantic_limit(request)
+    if limit is None:
+        return JsonResponse({'error': f'limit must be between 1 and {SEMANTIC_MAX_LIMIT}'}, status=400)
+    return JsonResponse({'content_id': content_id, 'results': _semantic_results(more_like_this(content_id, limit=limit))})
+
+
+def _count_revisit(request, content_id):
+    view_counter.increment(content_id)
+
+
+@conditional_page(content_detail_validators, not_modified=_count_revisit)
 def content_detail(request, content_id):
     """Content detail page with prioritized reviews"""
     content = get_object_or_404(Content, id=content_id)
@@ -205,19 +288,23 @@ def content_detail(request, content_id):
         
         in_watchlist = Watchlist.objects.filter(user=request.user, content=content).exists()
   
-    similar_content = Content.objects.filter(
-        genre=content.genre
-    ).exclude(id=content_id).annotate(
-        rating_avg=Avg('ratings__rating_value')
-    ).order_by('-rating_avg')[:4]
-    
-    all_reviews = Review.objects.filter(content=content).select_related('user')
-    
-    reviewer_reviews = all_reviews.filter(is_verified=True).order_by('-review_date')
-    regular_reviews = all_reviews.filter(is_verified=False).order_by('-review_date')
-    
-    from itertools import chain
-    reviews = list(chain(reviewer_reviews, regular_reviews))
+    similar_ids = similar_content_ids(content.id, limit=4)
+    if similar_ids:
+        similar_by_id = Content.objects.filter(id__in=similar_ids).annotate(
+            rating_avg=average_rating_expression()
+        ).in_bulk()
+        similar_content = [similar_by_id[cid] for cid in similar_ids if cid in similar_by_id]
+    else:
+        similar_content = Content.objects.filter(
+            genre=content.genre
+        ).exclude(id=content_id).annotate(
+            rating_avg=average_rating_expression()
+        ).order_by(F('rating_avg').desc(nulls_last=True))[:4]
+    
+    # Reviewer reviews first, then the rest, newest first within each
+    reviews = list(
+        Review.objects.filter(content=content).select_related('user').order_by('-is_verified', '-review_date')
+    )
     
     context = {
         'content': content,
@@ -229,9 +316,9 @@ def content_detail(request, content_id):
     return render(request, 'recommendox/content_detail.html', context)
 
 def increment_content_views(content):
-    """Increment view count for content"""
+    """Count a view for content (buffered, written in batches by view_counter)"""
+    view_counter.increment(content.id)
     content.views_count += 1
-    content.save(update_fields=['views_count'])
     return content.views_count
 
 def register(request):
@@ -281,15 +368,14 @@ def user_dashboard(request):
     """User dashboard"""
     user = request.user
     profile, created = UserProfile.objects.get_or_create(user=user)  
-    user_is_reviewer = is_reviewer(user)
 
     watchlist = Content.objects.filter(
         id__in=Watchlist.objects.filter(user=user).values_list('content_id', flat=True)
     )[:6]
  
-    user_ratings = Rating.objects.filter(user=user).order_by('-rating_date')[:5]   
-    user_reviews = Review.objects.filter(user=user).order_by('-review_date')[:5]   
-    recommendations = get_personalized_recommendations(user)
+    user_ratings = Rating.objects.filter(user=user).select_related('content').order_by('-rating_date')[:5]
+    user_reviews = Review.objects.filter(user=user).select_related('content').order_by('-review_date')[:5]
+    recommendations = cached_recommendations(user, get_dashboard_recommendations)
     
     context = {
         'user': user,
@@ -298,7 +384,7 @@ def user_dashboard(request):
         'user_ratings': user_ratings,
         'user_reviews': user_reviews,
         'recommendations': recommendations,
-        'is_reviewer': user_is_reviewer,
+        'is_reviewer': request.roles.is_reviewer,
     }
     return render(request, 'recommendox/user_dashboard.html', context)
 
@@ -332,7 +418,7 @@ def rate_content(request, content_id):
             Rating.objects.update_or_create(
                 user=request.user,
                 content=content,
-                defaults={'rating_value': rating_value}
+                defaults={'rating_value': int(rating_value)}
             )
             messages.success(request, f'You rated "{content.title}" {rating_value}/5!')
     
@@ -346,18 +432,12 @@ def add_review(request, content_id):
     if request.method == 'POST':
         comment = request.POST.get('comment')
         if comment:
-            is_reviewer = False
-            try:
-                is_reviewer = hasattr(request.user.profile, 'reviewer_profile') and request.user.profile.reviewer_profile.is_active
-            except:
-                pass
-   
             review = Review.objects.create(
                 user=request.user,
                 content=content,
                 comment=comment,
                 is_approved=True,          
-                is_verified=is_reviewer      
+                is_verified=request.roles.is_reviewer
             )
           
             messages.success(request, 'Your review has been posted!')
@@ -379,14 +459,8 @@ def edit_review(request, review_id):
             review.comment = new_comment
           
             is_admin = request.user.is_staff or request.user.is_superuser
-            is_reviewer = False
             
-            try:
-                is_reviewer = hasattr(request.user.profile, 'reviewer_profile') and request.user.profile.reviewer_profile.is_active
-            except:
-                pass
-            
-            if not (is_admin or is_reviewer):
+            if not (is_admin or request.roles.is_reviewer):
                 review.is_approved = False
             
             review.save()
@@ -418,11 +492,7 @@ def creator_dashboard(request):
     """Content Creator Dashboard"""
     user = request.user
    
-    creator = None
-    try:
-        creator = user.profile.creator_profile
-    except:
-        pass
+    creator = ContentCreator.objects.filter(user_profile__user=user).first()
     recent_content = Content.objects.order_by('-created_at')[:10]
    
     total_content = Content.objects.count()
@@ -538,9 +608,15 @@ def admin_dashboard(request):
     pending_golden = GoldenUser.objects.filter(verification_status='Pending').count()
     
     recent_content = Content.objects.order_by('-created_at')[:5]
-    recent_reviews = Review.objects.order_by('-review_date')[:5]
+    recent_reviews = Review.objects.select_related('user', 'content').order_by('-review_date')[:5]
     
     context = {
+        'recommendation_cache': recommendation_cache_stats(),
+        'cache_stats': cache_stats(),
+        'generator_stats': generator_stats(),
+        'view_buffer': view_counter.stats(),
+        'engagement_24h': recent_counts(),
+        'engagement_series': daily_series(),
         'total_users': total_users,
         'total_content': total_content,
         'total_reviews': total_reviews,
@@ -566,6 +642,7 @@ def manage_users(request):
         ).order_by('-date_joined')
     else:
         users = User.objects.all().order_by('-date_joined')
+    users = annotate_roles(users)
     
     if request.method == 'POST':
         user_id = request.POST.get('user_id')
@@ -585,17 +662,6 @@ def manage_users(request):
             user.delete()
             messages.success(request, f'User "{username}" deleted.')
 
-    for user in users:
-        try:
-            user.is_reviewer = hasattr(user.profile, 'reviewer_profile') and user.profile.reviewer_profile.is_active
-        except:
-            user.is_reviewer = False
-        
-        try:
-            user.is_creator = hasattr(user.profile, 'creator_profile') and user.profile.creator_profile.is_active
-        except:
-            user.is_creator = False
-    
     context = {
         'users': users,
         'search_query': search_query,
@@ -660,15 +726,11 @@ def remove_reviewer(request, user_id):
     """Remove reviewer role from a user"""
     user = get_object_or_404(User, id=user_id)
     
-    try:
-        profile = user.profile
-        if hasattr(profile, 'reviewer_profile'):
-            profile.reviewer_profile.delete()
-            messages.success(request, f'Reviewer role removed from {user.username}.')
-        else:
-            messages.warning(request, f'{user.username} is not a reviewer.')
-    except:
-        messages.error(request, 'Error removing reviewer role.')
+    deleted, _ = Reviewer.objects.filter(user_profile__user=user).delete()
+    if deleted:
+        messages.success(request, f'Reviewer role removed from {user.username}.')
+    else:
+        messages.warning(request, f'{user.username} is not a reviewer.')
     
     return redirect('recommendox:manage_users')
 
@@ -677,15 +739,11 @@ def remove_creator(request, user_id):
     """Remove creator role from a user"""
     user = get_object_or_404(User, id=user_id)
     
-    try:
-        profile = user.profile
-        if hasattr(profile, 'creator_profile'):
-            profile.creator_profile.delete()
-            messages.success(request, f'Creator role removed from {user.username}.')
-        else:
-            messages.warning(request, f'{user.username} is not a creator.')
-    except:
-        messages.error(request, 'Error removing creator role.')
+    deleted, _ = ContentCreator.objects.filter(user_profile__user=user).delete()
+    if deleted:
+        messages.success(request, f'Creator role removed from {user.username}.')
+    else:
+        messages.warning(request, f'{user.username} is not a creator.')
     
     return redirect('recommendox:manage_users')
 
@@ -701,6 +759,7 @@ def admin_manage_reviews(request):
         reviews = Review.objects.filter(is_verified=False).order_by('-review_date')
     else:
         reviews = Review.objects.all().order_by('-review_date')
+    reviews = reviews.select_related('user', 'content')
     
     if request.method == 'POST':
         review_id = request.POST.get('review_id')
@@ -726,21 +785,25 @@ def admin_manage_reviews(request):
 
 
 #OTT VIEWS
+@conditional_page(catalog_validators)
 def ott_browse(request):
     """Browse content by OTT platform"""
     platform = request.GET.get('platform', '')
     free_only = request.GET.get('free_only') == 'True'
     
-    content_list = Content.objects.filter(ott_platforms__isnull=False).distinct()
-    
+    platforms = ContentOTT.objects.all()
     if platform:
-        content_list = content_list.filter(ott_platforms__platform_name=platform)
-    
+        platforms = platforms.filter(platform_name=platform)
     if free_only:
-        content_list = content_list.filter(ott_platforms__is_free=True)
-    paginator = Paginator(content_list, 12)
-    page = request.GET.get('page')
-    contents = paginator.get_page(page)
+        platforms = platforms.filter(is_free=True)
+    content_list = Content.objects.filter(id__in=platforms.values('content_id'))
+    cursor = request.GET.get('cursor')
+    if request.GET.get('page') and not cursor:
+        return _legacy_page_redirect(
+            request, lambda number: page_cursor(content_list, BROWSE_SORT_KEYS['newest'], 'newest', number),
+        )
+    contents = keyset_paginate(content_list, BROWSE_SORT_KEYS['newest'], 'newest', cursor)
+    render_cards(contents)
     
     context = {
         'page_obj': contents,
@@ -749,14 +812,10 @@ def ott_browse(request):
     }
     return render(request, 'recommendox/ott_browse.html', context)
 
-def is_golden_user(user):
-    """Check if user has golden user profile"""
-    if not user.is_authenticated:
-        return False
-    try:
-        return hasattr(user.profile, 'golden_profile')
-    except:
-        return False
+def _pooled_average(content_qs):
+    """Average of every rating across a set of content, from the denormalized sums"""
+    totals = content_qs.aggregate(total=Sum('rating_sum'), count=Sum('rating_count'))
+    return totals['total'] / totals['count'] if totals['count'] else 0
 
 def golden_user_required(view_func):
     """Decorator to check if user has golden user profile"""
@@ -767,7 +826,7 @@ def golden_user_required(view_func):
         if request.user.is_staff:
             return view_func(request, *args, **kwargs)
         
-        if is_golden_user(request.user):
+        if request.roles.is_golden:
             return view_func(request, *args, **kwargs)
         
         messages.error(request, 'This section is only for Golden Users.')
@@ -780,20 +839,15 @@ def become_golden_user(request):
     user = request.user
     
     # Check if user already has a golden profile
-    try:
-        if hasattr(user.profile, 'golden_profile'):
-            golden = user.profile.golden_profile
-            if golden.verification_status == 'Pending':
-                messages.info(request, 'Your Golden User application is pending verification.')
-                return redirect('recommendox:golden_pending.html')
-            elif golden.verification_status == 'Verified':
-                messages.success(request, 'You are already a verified Golden User!')
-                return redirect('recommendox:golden_dashboard')
-            elif golden.verification_status == 'Rejected':
-                messages.warning(request, 'Your previous application was rejected. You can apply again.')
-                golden.delete()
-    except:
-        pass
+    if request.roles.golden_status == 'Pending':
+        messages.info(request, 'Your Golden User application is pending verification.')
+        return redirect('recommendox:golden_dashboard')
+    elif request.roles.golden_status == 'Verified':
+        messages.success(request, 'You are already a verified Golden User!')
+        return redirect('recommendox:golden_dashboard')
+    elif request.roles.golden_status == 'Rejected':
+        messages.warning(request, 'Your previous application was rejected. You can apply again.')
+        GoldenUser.objects.filter(user_profile__user=user).delete()
     
     if request.method == 'POST':
        
@@ -863,7 +917,10 @@ def become_golden_user(request):
 def golden_dashboard(request):
     """Golden User Dashboard - New Design"""
     user = request.user
-    golden = user.profile.golden_profile
+    if not request.roles.is_golden:
+        messages.info(request, 'Staff accounts have no golden profile to show.')
+        return redirect('recommendox:admin_dashboard')
+    golden = GoldenUser.objects.get(user_profile__user=user)
   
     if golden.verification_status == 'Pending':
         return render(request, 'recommendox/golden_pending.html', {'golden': golden})
@@ -874,25 +931,13 @@ def golden_dashboard(request):
     profession = golden.profession
     user_name = user.get_full_name() or user.username
   
-    if profession in ['Actor', 'Actress']:
-        my_content = Content.objects.filter(cast__icontains=user_name)
-    elif profession == 'Director':
-        my_content = Content.objects.filter(director__icontains=user_name)
-    elif profession == 'Producer':
-        my_content = Content.objects.filter(
-            Q(director__icontains=user_name) |
-            Q(description__icontains=f"produced by {user_name}") |
-            Q(description__icontains=f"producer {user_name}")
-        )
-    elif profession == 'Writer':
-        my_content = Content.objects.filter(
-            Q(director__icontains=user_name) |
-            Q(description__icontains=f"written by {user_name}") |
-            Q(description__icontains=f"writer {user_name}")
-        )
-    elif profession in ['Critic', 'Journalist']:
+    if profession in ['Critic', 'Journalist']:
         my_content = None  
-        my_reviews = Review.objects.filter(user=user).order_by('-review_date')[:10]
+        my_reviews = Review.objects.filter(user=user).select_related('content').order_by('-review_date')[:10]
+    elif profession in PROFESSION_ROLES:
+        my_content = filmography(
+            person_for_golden(golden, user_name), PROFESSION_ROLES[profession]
+        ).prefetch_related('ott_platforms')
     else:
         my_content = Content.objects.none()
     
@@ -901,7 +946,7 @@ def golden_dashboard(request):
     my_stats = {
         'total_content': my_content.count() if my_content else 0,
         'total_reviews': Review.objects.filter(content__in=my_content_ids).count() if my_content_ids else 0,
-        'avg_rating': Rating.objects.filter(content__in=my_content_ids).aggregate(avg=Avg('rating_value'))['avg'] or 0,
+        'avg_rating': _pooled_average(Content.objects.filter(id__in=my_content_ids)) if my_content_ids else 0,
     }
    
     if profession in ['Critic', 'Journalist']:
@@ -917,16 +962,16 @@ def golden_dashboard(request):
     ).exclude(
         id__in=my_content_ids
     ).annotate(
-        rating_avg=Avg('ratings__rating_value')
-    ).order_by('-rating_avg')[:8]
+        rating_avg=average_rating_expression()
+    ).order_by(F('rating_avg').desc(nulls_last=True))[:8]
     
     genre_stats = Content.objects.values('genre').annotate(
-        avg_rating=Avg('ratings__rating_value')
+        avg_rating=Sum('rating_sum') * 1.0 / NullIf(Sum('rating_count'), 0)
     ).order_by('genre')
   
     ott_stats = ContentOTT.objects.values('platform_name').annotate(
-        avg_rating=Avg('content__ratings__rating_value')
-    ).order_by('-avg_rating')
+        avg_rating=Sum('content__rating_sum') * 1.0 / NullIf(Sum('content__rating_count'), 0)
+    ).order_by(F('avg_rating').desc(nulls_last=True))
     
     if my_content_ids:
         recent_feedback = Review.objects.filter(
@@ -953,14 +998,17 @@ def golden_content_analytics(request, content_id):
     """Detailed analytics for specific content"""
     content = get_object_or_404(Content, id=content_id)
    
-    golden = request.user.profile.golden_profile
-    golden.increment_content_views()
+    # Staff may open analytics without a golden profile of their own
+    golden = GoldenUser.objects.filter(user_profile__user=request.user).first() if request.roles.is_golden else None
+    if golden:
+        golden.increment_content_views()
     
     increment_content_views(content)
 
-    rating_stats = Rating.objects.filter(content=content).values('rating_value').annotate(
-        count=Count('id')
-    ).order_by('rating_value')
+    rating_stats = [
+        {'rating_value': stars, 'count': count}
+        for stars, count in content.rating_histogram if count
+    ]
     
     reviews = Review.objects.filter(content=content, is_approved=True).select_related('user')
     
@@ -971,11 +1019,13 @@ def golden_content_analytics(request, content_id):
     context = {
         'content': content,
         'rating_stats': rating_stats,
-        'total_ratings': Rating.objects.filter(content=content).count(),
+        'total_ratings': content.rating_count,
         'avg_rating': content.avg_rating,
         'reviews': reviews,
         'total_reviews': reviews.count(),
         'total_views': content.views_count,
+        'engagement_24h': recent_counts(content.id),
+        'engagement_series': daily_series(content.id),
         'ott_availability': ott_availability,
         'similar_content': similar_content,
         'golden': golden,